@@ -8,7 +8,14 @@ from streamlit_option_menu import option_menu
 from utils import sobre, dataframe, paines, marcadores
 from utils.totalizadores import total_acidentes,total_feridos,total_mortos,total_veiculos#, total_ilesos
 from utils.marcadores import divisor
-from utils.filtros import filtros_aplicados, filtro_mes_nome
+from utils.filtros import CHAVES_FILTROS, filtro_indexado, selecoes_sidebar
+from utils.carregamento import (carregar_arquivo_parquet, carregar_indice_bitmap, colunas_pagina, periodo_dados,
+                                anos_disponiveis, anos_leitura, versao_dataset)
+from utils.visao import Visao
+from utils.cubo import carregar_cubo, filtrar_cubo
+from utils.series_temporais import carregar_series, filtrar_series
+from utils.medicao import medir, marcar, painel_tempos
+from utils.exportacao import liberar_download
 # ----------------------------
 # Configuração da página. Fica sempre no início do projeto
 # ----------------------------
@@ -32,42 +39,12 @@ hoje = date.today()
 # ----------------------------
 filtros_iniciais = ['Ano', 'Mês', 'Região', 'Estado', 'Municipio', 'Grupo Via', 'Classificacao Acidente']
 for filtro in filtros_iniciais:
-    chave = f'main_filtro_{filtro}'
-    if chave not in st.session_state:
-        st.session_state[chave] = []
+    st.session_state.setdefault(f'main_filtro_{filtro}', [])
 
 # ----------------------------
-# Caminho do arquivo
-# ----------------------------
-CAMINHO_ARQUIVO = "Dados/PRF2023a2025.parquet"
-
-# ----------------------------
-# Função para carregar arquivo Parquet
-# ----------------------------
-@st.cache_data
-def carregar_arquivo_parquet():
-    try:
-        return pd.read_parquet(CAMINHO_ARQUIVO, engine='pyarrow')
-    except Exception as e:
-        st.error(f"Erro ao carregar arquivo: {e}")
-        return pd.DataFrame()  # retorna dataframe vazio para evitar crash
-
-df = carregar_arquivo_parquet()
-
-
-
-
-
-# ----------------------------
-# Cópia do DataFrame original
-# ----------------------------
-df_filtrado = df.copy()
-
 # Última e primeira data
-# Converte a coluna 'Data' para o formato datetime
-
-ultima_data = df['Data'].max().strftime("%d/%m/%Y") if not df.empty else None
-primeira_data = df['Data'].min().strftime("%d/%m/%Y") if not df.empty else None
+# ----------------------------
+primeira_data, ultima_data = periodo_dados()
 
 
 
@@ -107,8 +84,6 @@ def titulo_pagina(primeira_data, ultima_data, hoje):
 # Função principal de navegação e filtros
 # ----------------------------
 def criacao_navegacao_e_filtros():
-    df_filtrado = df.copy()
-
     with st.sidebar:
         selected = option_menu(
             menu_title="Navegue nas páginas",
@@ -118,37 +93,73 @@ def criacao_navegacao_e_filtros():
             default_index=0
         )
         st.markdown("<h1>Filtros</h1>", unsafe_allow_html=True)
-        
-        df_filtrado = filtros_aplicados(df_filtrado, 'Ano')
-        df_filtrado = filtro_mes_nome(df_filtrado)
-        df_filtrado = filtros_aplicados(df_filtrado, 'Região')
-        df_filtrado = filtros_aplicados(df_filtrado, 'Uf')
-        df_filtrado = filtros_aplicados(df_filtrado, 'Municipio')
-        
+        # Marcas dos tempos medidos neste rerun (utils/medicao.py); a aba é marcada no Painéis
+        marcar(pagina=selected, aba=None)
+
+        # Só as partições dos anos da janela padrão (ou dos anos escolhidos) são lidas;
+        # o valor do filtro de Ano já está na sessão antes do widget
+        anos = anos_leitura(st.session_state[CHAVES_FILTROS['Ano']])
+
+        # As opções em cascata saem do índice bitmap do DataFrame da página
+        with medir('carregamento', arquivo='indice'):
+            indice = carregar_indice_bitmap(colunas_pagina(selected), anos)
+
+        # O resultado de cada seleção fica memorizado (utils/filtros.py): reruns que não mudam
+        # a barra lateral reaproveitam o bitmap e as posições já calculados
+        with medir('filtros'):
+            # O filtro de Ano oferece todos os anos do dataset, não só os lidos
+            selecoes = filtro_indexado(indice, 'Ano', opcoes=anos_disponiveis())
+            if anos is not None and not selecoes['Ano']:
+                st.caption(f"Sem ano escolhido: {', '.join(map(str, anos))}.")
+            selecoes = filtro_indexado(indice, 'Mês', selecoes)
+            selecoes = filtro_indexado(indice, 'Região', selecoes)
+            selecoes = filtro_indexado(indice, 'Uf', selecoes)
+            selecoes = filtro_indexado(indice, 'Municipio', selecoes)
+
+    # Lê apenas as colunas que a página usa; o DataFrame é compartilhado entre sessões e
+    # os filtros ficam como seleção de linhas sobre ele, sem cópia
+    with medir('carregamento', arquivo='dados'):
+        df_filtrado = Visao(carregar_arquivo_parquet(colunas_pagina(selected), anos), indice, selecoes)
+
 
     c1, c2, c3, c4 = st.columns(4,gap="small")
 
-    with c1.container(border=True):
-        st.metric("🚨 Acidentes", total_acidentes(df_filtrado))
+    with medir('kpi'):
+        with c1.container(border=True):
+            st.metric("🚨 Acidentes", total_acidentes(df_filtrado))
 
-    with c2.container(border=True):   
-        st.metric("💀 Mortos", total_mortos(df_filtrado))
+        with c2.container(border=True):   
+            st.metric("💀 Mortos", total_mortos(df_filtrado))
 
-    with c3.container(border=True):
-        st.metric("🩹 Feridos", total_feridos(df_filtrado))
-            
-    with c4.container(border=True):
-        st.metric("🚗 Veiculos", total_veiculos(df_filtrado))
+        with c3.container(border=True):
+            st.metric("🩹 Feridos", total_feridos(df_filtrado))
+                
+        with c4.container(border=True):
+            st.metric("🚗 Veiculos", total_veiculos(df_filtrado))
 
    
 
+    # O download preparado na página Dataframe só fica em memória enquanto ela está na tela
+    if selected != "Dataframe":
+        liberar_download()
+
     # Conteúdo principal
     if selected == "Sobre":
         sobre.mainSobre()
 
     elif selected == "Painéis":
         #df_filtrado_linha['Ano'] = df_filtrado_linha['Ano'].astype(str)
-        paines.mainGraficos(df_filtrado)
+        with medir('filtros', arquivo='cubo'):
+            # Cubo de agregados com os mesmos filtros da barra lateral; sem ano escolhido,
+            # restrito aos anos lidos (o cubo tem todos)
+            selecoes_cubo = selecoes_sidebar()
+            if anos is not None and not selecoes_cubo['Ano']:
+                selecoes_cubo['Ano'] = list(anos)
+            # Cuboides e séries filtrados ficam memorizados por seleção (cache dos filtros): não alterar
+            cubo = filtrar_cubo(carregar_cubo(), selecoes_cubo, versao_dataset())
+            # Séries diária e horária da seleção, para os gráficos por período de Data
+            cubo = {**cubo, **filtrar_series(carregar_series(), selecoes_cubo)}
+        paines.mainGraficos(df_filtrado, cubo)
     else:
         dataframe.mainDataframe(df_filtrado)
 
@@ -157,8 +168,11 @@ def criacao_navegacao_e_filtros():
 # Função main
 # ----------------------------
 def main():
-    titulo_pagina(primeira_data, ultima_data, hoje)
-    criacao_navegacao_e_filtros()
+    with medir('rerun'):
+        titulo_pagina(primeira_data, ultima_data, hoje)
+        criacao_navegacao_e_filtros()
+    # Tempos por etapa (só com PRF_MEDICAO=1)
+    painel_tempos()
 
 # ----------------------------
 # Executa o app
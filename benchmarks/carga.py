@@ -0,0 +1,299 @@
+import os
+import sys
+import json
+import time
+import resource
+import argparse
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+import numpy as np
+import pandas as pd
+import streamlit as st
+import streamlit.logger
+import streamlit_option_menu
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1.util import patch_config_options
+from benchmarks.dados_sinteticos import PASTA_PADRAO, na_pasta, pasta_do_tamanho, gerar_dataset, numero_de_linhas
+from benchmarks.desempenho import PASTA_RESULTADOS, commit_atual
+
+
+
+# ----------------------------
+# Teste de carga com várias sessões simuladas (sem navegador e sem rede)
+#   python -m benchmarks.carga --tamanho 100k --gerar --sessoes 8 --repeticoes 3
+#   python -m benchmarks.carga --dados .          (dataset local em ./Dados)
+# ----------------------------
+# Cada sessão é um AppTest (streamlit.testing.v1) rodando o appPRF.py no mesmo processo, como as
+# sessões de um servidor Streamlit: os caches compartilhados (cache_resource, caches LRU) valem
+# para todas. As sessões rodam em threads, ao mesmo tempo, e repetem a JORNADA: filtros da barra
+# lateral, troca de página e de aba, slider de Top N e indicador/zoom do mapa de calor.
+# Relatório:
+# - latência de cada rerun (p50, p90, p99 e máximo) por passo da jornada e no total
+# - vazão (reruns por segundo) e erros (exceções do script)
+# - RSS do processo antes e depois e crescimento por sessão (depois de uma sessão de aquecimento,
+#   que carrega os dados e os índices compartilhados)
+# O resultado vai para benchmarks/resultados/carga-<data>-<commit>.json.
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT_APP = os.path.join(RAIZ, 'appPRF.py')
+
+SESSOES = 4
+REPETICOES = 2
+TEMPO_LIMITE = 300          # segundos por rerun
+INTERVALO_RSS = 0.5         # segundos entre amostras de memória
+
+# O menu de páginas (streamlit_option_menu) é um componente JavaScript, que o AppTest não aciona:
+# nas sessões simuladas ele devolve a página guardada nesta chave da sessão
+CHAVE_PAGINA = 'carga_pagina'
+
+
+def _menu_de_paginas(menu_title=None, options=None, *args, default_index=0, **kwargs):
+    return st.session_state.get(CHAVE_PAGINA, options[default_index])
+
+
+@contextmanager
+def _runtime_compartilhado():
+    """
+    Runtime simulado que vale durante todo o teste.
+    Cada AppTest.run() instala o próprio Runtime simulado e o apaga ao terminar (Runtime._instance = None),
+    o que derruba as outras sessões que ainda estão rodando ("Runtime hasn't been created!").
+    Aqui Runtime.instance()/exists() caem neste runtime quando não há outro, e global.appTest fica ligado
+    do começo ao fim (cada run restaura o valor que encontrou).
+    """
+    simulado = MagicMock(spec=Runtime)
+    simulado.media_file_mgr = MediaFileManager(MemoryMediaFileStorage('/mock/media'))
+    simulado.cache_storage_manager = MemoryCacheStorageManager()
+    instancia = classmethod(lambda cls: cls._instance or simulado)
+    existe = classmethod(lambda cls: True)
+    with patch.object(Runtime, 'instance', instancia), patch.object(Runtime, 'exists', existe), \
+            patch_config_options({'global.appTest': True}):
+        yield
+
+
+# ----------------------------
+# Passos da jornada: alteram os widgets de uma sessão; o rerun é medido depois de cada um
+# ----------------------------
+def _pagina(nome):
+    def passo(app, rng):
+        app.session_state[CHAVE_PAGINA] = nome
+    return passo
+
+
+def _filtro(chave):
+    def passo(app, rng):
+        widget = app.multiselect(key=chave)
+        quantidade = int(rng.integers(1, 3))
+        widget.set_value(list(rng.choice(widget.options, min(quantidade, len(widget.options)), replace=False)))
+    return passo
+
+
+def _limpar_filtros(app, rng):
+    for chave in ('main_filtro_Ano', 'main_filtro_Uf'):
+        app.multiselect(key=chave).set_value([])
+
+
+def _aba(nome=None):
+    def passo(app, rng):
+        radio = app.radio(key='painel_ativo')
+        radio.set_value(nome if nome else rng.choice(radio.options))
+    return passo
+
+
+def _categoria_top_n(app, rng):
+    app.selectbox(key='select_categoria_barra').set_value(rng.choice(['Municipio', 'Br']))
+
+
+def _slider_top_n(app, rng):
+    slider = next(s for s in app.slider if s.label.startswith('Top N'))
+    slider.set_value(int(rng.integers(slider.min, slider.max + 1)))
+
+
+def _indicador_mapa(app, rng):
+    radio = next(r for r in app.radio if r.label.startswith('Escolha o indicador'))
+    radio.set_value(rng.choice(radio.options))
+
+
+def _zoom_mapa(app, rng):
+    app.slider(key='zoom_mapa').set_value(int(rng.integers(3, 11)))
+
+
+JORNADA = [
+    ('filtro Ano', _filtro('main_filtro_Ano')),
+    ('filtro Uf', _filtro('main_filtro_Uf')),
+    ('aba aleatória', _aba()),
+    ('aba Distribuição Geográfica', _aba('🌍 Distribuição Geográfica')),
+    ('categoria Top N', _categoria_top_n),
+    ('slider Top N', _slider_top_n),
+    ('slider Top N (de novo)', _slider_top_n),
+    ('aba Mapas', _aba('🗺️ Mapas')),
+    ('indicador do mapa', _indicador_mapa),
+    ('zoom do mapa', _zoom_mapa),
+    ('página Dataframe', _pagina('Dataframe')),
+    ('página Painéis', _pagina('Painéis')),
+    ('limpar filtros', _limpar_filtros),
+]
+
+
+# ----------------------------
+# Sessões
+# ----------------------------
+def rss_mb():
+    """RSS atual do processo (Linux); nos outros sistemas, o pico (ru_maxrss)."""
+    try:
+        with open('/proc/self/status', encoding='ascii') as status:
+            for linha in status:
+                if linha.startswith('VmRSS:'):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 1024 ** 2 if sys.platform == 'darwin' else pico / 1024
+
+
+def _rodar(app, medicoes, sessao, passo):
+    inicio = time.perf_counter()
+    try:
+        app.run()
+    except RuntimeError as erro:
+        # Rerun que estourou o tempo limite
+        medicoes.append({'sessao': sessao, 'passo': passo, 'latencia_s': None, 'erro': str(erro)})
+        return
+    medicoes.append({'sessao': sessao, 'passo': passo, 'latencia_s': time.perf_counter() - inicio,
+                     'erro': '; '.join(str(e.value) for e in app.exception) or None})
+
+
+def sessao(numero, repeticoes, tempo_limite=TEMPO_LIMITE, semente=0):
+    """Roda a jornada `repeticoes` vezes numa sessão nova; devolve a lista de reruns medidos."""
+    rng = np.random.default_rng(semente + numero)
+    app = AppTest.from_file(SCRIPT_APP, default_timeout=tempo_limite)
+    app.session_state[CHAVE_PAGINA] = 'Painéis'
+    medicoes = []
+    _rodar(app, medicoes, numero, 'abrir')
+    for _ in range(repeticoes):
+        for nome, passo in JORNADA:
+            try:
+                passo(app, rng)
+            except (KeyError, StopIteration, ValueError) as erro:
+                # Widget ausente (ex.: exceção no rerun anterior): conta como erro e segue a jornada
+                medicoes.append({'sessao': numero, 'passo': nome, 'latencia_s': None, 'erro': repr(erro)})
+                continue
+            _rodar(app, medicoes, numero, nome)
+    return medicoes
+
+
+def teste_de_carga(sessoes=SESSOES, repeticoes=REPETICOES, tempo_limite=TEMPO_LIMITE, aquecer=True):
+    """
+    Roda `sessoes` sessões simultâneas (no diretório de trabalho atual, que deve ter Dados/).
+    Retorna (DataFrame dos reruns, resumo).
+    """
+    streamlit_option_menu.option_menu = _menu_de_paginas
+    with _runtime_compartilhado():
+        return _teste_de_carga(sessoes, repeticoes, tempo_limite, aquecer)
+
+
+def _teste_de_carga(sessoes, repeticoes, tempo_limite, aquecer):
+    if aquecer:
+        # Número fora das sessões medidas: outra sequência aleatória
+        sessao(sessoes, 1, tempo_limite)
+
+    amostras_rss = [rss_mb()]
+    terminou = threading.Event()
+
+    def monitorar():
+        while not terminou.wait(INTERVALO_RSS):
+            amostras_rss.append(rss_mb())
+
+    monitor = threading.Thread(target=monitorar, daemon=True)
+    monitor.start()
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessoes) as executor:
+        resultados = list(executor.map(lambda numero: sessao(numero, repeticoes, tempo_limite), range(sessoes)))
+    duracao = time.perf_counter() - inicio
+    terminou.set()
+    monitor.join()
+    amostras_rss.append(rss_mb())
+
+    reruns = pd.DataFrame([medicao for medicoes in resultados for medicao in medicoes])
+    latencias = reruns['latencia_s'].dropna()
+    resumo = {
+        'sessoes': sessoes,
+        'repeticoes': repeticoes,
+        'reruns': int(len(latencias)),
+        'erros': int(reruns['erro'].notna().sum()),
+        'duracao_s': round(duracao, 3),
+        'vazao_reruns_s': round(len(latencias) / duracao, 3),
+        **{f'p{p}_ms': round(float(np.percentile(latencias, p)) * 1000, 2) for p in (50, 90, 99)},
+        'max_ms': round(float(latencias.max()) * 1000, 2),
+        'rss_inicial_mb': round(amostras_rss[0], 1),
+        'rss_final_mb': round(amostras_rss[-1], 1),
+        'rss_pico_mb': round(max(amostras_rss), 1),
+        'rss_por_sessao_mb': round((amostras_rss[-1] - amostras_rss[0]) / sessoes, 2),
+    }
+    return reruns, resumo
+
+
+def latencias_por_passo(reruns):
+    """p50, p90, p99 e máximo (ms) de cada passo da jornada."""
+    por_passo = reruns.dropna(subset=['latencia_s']).groupby('passo', sort=False)['latencia_s']
+    tabela = pd.DataFrame({
+        'n': por_passo.size(),
+        'p50_ms': por_passo.quantile(0.5) * 1000,
+        'p90_ms': por_passo.quantile(0.9) * 1000,
+        'p99_ms': por_passo.quantile(0.99) * 1000,
+        'max_ms': por_passo.max() * 1000,
+    })
+    return tabela.round(1)
+
+
+def gravar_resultados(reruns, resumo, dados, destino=PASTA_RESULTADOS):
+    commit = commit_atual()
+    os.makedirs(destino, exist_ok=True)
+    caminho = os.path.join(destino, f"carga-{datetime.now():%Y%m%d-%H%M%S}-{commit}.json")
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump({
+            'commit': commit,
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'dados': dados,
+            'resumo': resumo,
+            'por_passo': latencias_por_passo(reruns).reset_index().to_dict('records'),
+            'erros': reruns.loc[reruns['erro'].notna(), ['sessao', 'passo', 'erro']].to_dict('records'),
+        }, arquivo, ensure_ascii=False, indent=1)
+    return caminho
+
+
+# ----------------------------
+# Linha de comando
+# ----------------------------
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Teste de carga do app com sessões simuladas (AppTest).')
+    origem = parser.add_mutually_exclusive_group()
+    origem.add_argument('--tamanho', default='100k', help='dataset sintético (benchmarks/dados_sinteticos.py)')
+    origem.add_argument('--dados', help='pasta com Dados/ (ex.: . para o dataset local)')
+    parser.add_argument('--gerar', action='store_true', help='gera o dataset sintético se ainda não existir')
+    parser.add_argument('--sessoes', type=int, default=SESSOES)
+    parser.add_argument('--repeticoes', type=int, default=REPETICOES, help='vezes que cada sessão repete a jornada')
+    parser.add_argument('--tempo-limite', type=float, default=TEMPO_LIMITE, help='segundos por rerun')
+    parser.add_argument('--sem-aquecimento', action='store_true')
+    args = parser.parse_args()
+
+    streamlit.logger.set_log_level('error')
+    pasta = os.path.abspath(args.dados) if args.dados else pasta_do_tamanho(args.tamanho)
+    if not os.path.exists(os.path.join(pasta, 'Dados')):
+        if args.dados or not args.gerar:
+            sys.exit(f"Não há Dados/ em {pasta}; use --gerar ou benchmarks/dados_sinteticos.py")
+        gerar_dataset(numero_de_linhas(args.tamanho), pasta)
+
+    with na_pasta(pasta):
+        reruns, resumo = teste_de_carga(args.sessoes, args.repeticoes, args.tempo_limite,
+                                        aquecer=not args.sem_aquecimento)
+    with pd.option_context('display.width', 200):
+        print(latencias_por_passo(reruns))
+    for nome, valor in resumo.items():
+        print(f"{nome:>18}: {valor}")
+    print(f"Resultados em {gravar_resultados(reruns, resumo, pasta)}")
@@ -0,0 +1,280 @@
+import os
+import json
+import argparse
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from utils.ingestao import derivar_colunas
+from utils.carregamento import CAMINHO_ARQUIVO, CAMINHO_VERSAO, particionar_arquivo
+from utils.cubo import gravar_cubo
+from utils.series_temporais import gravar_series
+
+
+
+# ----------------------------
+# Dataset sintético no formato da PRF
+#   python -m benchmarks.dados_sinteticos 100k 1m --destino benchmarks/dados
+# ----------------------------
+# Cada lote é gerado como as linhas do CSV datatran (mesmos nomes de coluna) e passa pelo
+# mesmo tratamento da ingestão (utils/ingestao.py: derivar_colunas). O resultado tem as colunas,
+# os tipos e as derivações do Parquet real. Depois são gerados o cubo, as séries e a versão,
+# como ao final de uma ingestão.
+# Distribuições assimétricas, parecidas com as reais:
+# - 27 UFs com pesos pela participação nos acidentes; ~5 mil municípios, concentrados (Zipf) em cada UF
+# - ~70 BRs (Zipf); Km dentro da extensão de cada BR; coordenadas em torno do centro da UF
+# - mais acidentes nos fins de semana, em dezembro/janeiro e no fim da tarde
+# - vítimas coerentes com a classificação do acidente
+# Cada tamanho fica em <destino>/<tamanho>/Dados, no layout que o app lê (rodar o app ou os
+# benchmarks com essa pasta como diretório de trabalho).
+
+TAMANHOS = {'100k': 100_000, '1m': 1_000_000, '10m': 10_000_000, '50m': 50_000_000}
+PASTA_PADRAO = os.environ.get('PRF_DIR_BENCHMARK', 'benchmarks/dados')
+
+LINHAS_POR_LOTE = 1_000_000
+PRIMEIRO_DIA = '2023-01-01'
+ULTIMO_DIA = '2025-09-30'
+
+# UF: (peso nos acidentes, municípios, latitude e longitude do centro)
+UFS = {
+    'MG': (13.0, 770, -18.5, -44.6), 'SC': (11.0, 265, -27.2, -50.5), 'PR': (10.0, 360, -24.6, -51.6),
+    'RS': (7.0, 450, -29.7, -53.2), 'SP': (6.0, 580, -22.2, -48.7), 'BA': (6.0, 375, -12.5, -41.7),
+    'GO': (5.0, 220, -15.9, -49.8), 'RJ': (5.0, 85, -22.3, -42.7), 'PE': (4.0, 165, -8.4, -37.9),
+    'ES': (4.0, 70, -19.6, -40.7), 'MT': (4.0, 125, -12.9, -55.9), 'MS': (3.0, 70, -20.5, -54.8),
+    'CE': (2.5, 165, -5.2, -39.5), 'PB': (2.5, 200, -7.1, -36.8), 'RN': (2.0, 150, -5.8, -36.6),
+    'PI': (2.0, 200, -7.7, -42.7), 'MA': (2.0, 195, -5.0, -45.3), 'RO': (2.0, 47, -10.9, -63.0),
+    'DF': (1.5, 1, -15.8, -47.9), 'PA': (1.5, 130, -4.0, -52.5), 'TO': (1.2, 125, -10.2, -48.3),
+    'SE': (1.0, 68, -10.6, -37.4), 'AL': (1.0, 92, -9.6, -36.6), 'AC': (0.5, 20, -9.0, -70.5),
+    'AM': (0.3, 56, -3.4, -65.0), 'RR': (0.4, 14, 2.1, -61.4), 'AP': (0.3, 15, 1.4, -51.8),
+}
+
+BRS = [116, 101, 381, 40, 153, 364, 163, 277, 470, 60, 50, 262, 232, 316, 70, 20, 10, 135, 222, 304,
+       386, 280, 369, 365, 267, 158, 290, 287, 242, 343, 407, 414, 428, 493, 104, 110, 226, 230, 324,
+       330, 342, 367, 376, 392, 401, 402, 408, 412, 423, 425, 451, 459, 460, 465, 467, 469, 471, 472,
+       480, 482, 487, 488, 494, 174, 319, 156, 421, 437, 448, 453]
+
+# Valor: peso
+TIPOS_ACIDENTE = {
+    'Colisão traseira': 19, 'Saída de leito carroçável': 14, 'Colisão transversal': 11,
+    'Colisão lateral mesmo sentido': 9, 'Queda de ocupante de veículo': 7, 'Colisão com objeto': 7,
+    'Tombamento': 5, 'Colisão frontal': 5, 'Atropelamento de Pedestre': 4, 'Engavetamento': 3,
+    'Colisão lateral sentido oposto': 3, 'Capotamento': 3, 'Atropelamento de Animal': 2,
+    'Sinistro pessoal de trânsito': 1, 'Incêndio': 1, 'Derramamento de carga': 0.5, 'Eventos atípicos': 0.5,
+}
+CAUSAS_ACIDENTE = [
+    'Reação tardia ou ineficiente do condutor', 'Ausência de reação do condutor',
+    'Acessar a via sem observar a presença dos outros veículos', 'Velocidade Incompatível',
+    'Condutor deixou de manter distância do veículo da frente', 'Manobra de mudança de faixa',
+    'Ingestão de álcool pelo condutor', 'Transitar na contramão', 'Condutor Dormindo', 'Pista Escorregadia',
+    'Chuva', 'Animais na Pista', 'Demais falhas mecânicas no veículo', 'Ultrapassagem Indevida',
+    'Desrespeitar a preferência no cruzamento', 'Pedestre andava na pista', 'Defeito na Via',
+    'Mal súbito do condutor', 'Curva acentuada', 'Avarias e/ou desgaste excessivo no pneu',
+    'Obstrução na via', 'Condutor usando celular', 'Sinalização mal posicionada', 'Neblina',
+    'Carga excessiva e/ou mal acondicionada',
+]
+CLASSIFICACOES = {'Com Vítimas Feridas': 75, 'Sem Vítimas': 18, 'Com Vítimas Fatais': 7}
+CONDICOES_METEREOLOGICAS = {
+    'Céu Claro': 60, 'Nublado': 15, 'Chuva': 10, 'Sol': 8, 'Garoa/Chuvisco': 4, 'Nevoeiro/Neblina': 1.5,
+    'Vento': 1, 'Ignorado': 0.5,
+}
+TIPOS_PISTA = {'Simples': 50, 'Dupla': 40, 'Múltipla': 10}
+TRACADOS_VIA = {
+    'Reta': 60, 'Curva': 15, 'Declive': 6, 'Interseção de vias': 6, 'Aclive': 5, 'Rotatória': 2,
+    'Viaduto': 2, 'Retorno Regulamentado': 2, 'Ponte': 1, 'Desvio Temporário': 1, 'Túnel': 0.2,
+}
+SENTIDOS_VIA = {'Crescente': 52, 'Decrescente': 47, 'Não Informado': 1}
+USOS_SOLO = {'Não': 60, 'Sim': 40}
+
+# Acidentes por hora do dia (pico no fim da tarde)
+PESOS_HORA = [2, 1.5, 1.2, 1, 1, 1.5, 3, 4.5, 5, 5, 5, 5, 5.5, 5.5, 5.5, 6, 6.5, 7.5, 7.5, 6, 5, 4, 3.5, 2.5]
+
+DIAS_SEMANA_CSV = ['segunda-feira', 'terça-feira', 'quarta-feira', 'quinta-feira', 'sexta-feira', 'sábado',
+                   'domingo']
+
+
+def _pesos(valores):
+    pesos = np.asarray(valores, dtype='float64')
+    return pesos / pesos.sum()
+
+
+def _zipf(n, expoente=1.1):
+    return _pesos(1 / np.arange(1, n + 1) ** expoente)
+
+
+def _sortear(rng, opcoes, n):
+    """Valores de {valor: peso} sorteados pelos pesos."""
+    return np.asarray(list(opcoes), dtype=object)[rng.choice(len(opcoes), n, p=_pesos(list(opcoes.values())))]
+
+
+class Gerador:
+    """
+    Gera lotes no formato do CSV datatran, com tabelas fixas (municípios, BRs) sorteadas uma vez pela semente.
+    """
+
+    def __init__(self, semente=0):
+        self.rng = np.random.default_rng(semente)
+        self.ufs = np.asarray(list(UFS), dtype=object)
+        self.peso_uf = _pesos([dados[0] for dados in UFS.values()])
+
+        # Municípios de cada UF, concentrados nos primeiros (Zipf)
+        self.municipios = {uf: np.asarray([f'MUNICIPIO {i + 1:03d}' for i in range(dados[1])], dtype=object)
+                           for uf, dados in UFS.items()}
+        self.peso_municipio = {uf: _zipf(len(nomes)) for uf, nomes in self.municipios.items()}
+
+        self.brs = np.asarray(BRS)
+        self.peso_br = _zipf(len(BRS), 0.9)
+        self.extensao_br = self.rng.uniform(150, 1200, len(BRS)).round()
+
+        dias = pd.date_range(PRIMEIRO_DIA, ULTIMO_DIA, freq='D')
+        peso_dia = np.where(dias.dayofweek >= 4, 1.25, 1.0) * np.where(dias.month.isin([1, 12]), 1.15, 1.0)
+        self.dias = dias.to_numpy()
+        self.peso_dia = _pesos(peso_dia)
+        self.minutos = np.asarray([f'{h:02d}:{m:02d}:00' for h in range(24) for m in range(60)], dtype=object)
+        self.proximo_id = 1
+
+    def lote(self, n):
+        """DataFrame de n linhas com as colunas do CSV datatran (antes de derivar_colunas)."""
+        rng = self.rng
+        uf_codigo = rng.choice(len(self.ufs), n, p=self.peso_uf)
+        uf = self.ufs[uf_codigo]
+
+        municipio = np.empty(n, dtype=object)
+        for i, sigla in enumerate(self.ufs):
+            linhas = np.flatnonzero(uf_codigo == i)
+            if len(linhas):
+                escolhidos = rng.choice(len(self.municipios[sigla]), len(linhas), p=self.peso_municipio[sigla])
+                municipio[linhas] = self.municipios[sigla][escolhidos]
+
+        br_codigo = rng.choice(len(self.brs), n, p=self.peso_br)
+        km = (rng.random(n) * self.extensao_br[br_codigo]).round(1)
+        centro = np.asarray([UFS[sigla][2:] for sigla in self.ufs])[uf_codigo]
+        latitude = (centro[:, 0] + rng.normal(0, 1.5, n)).round(6)
+        longitude = (centro[:, 1] + rng.normal(0, 1.5, n)).round(6)
+
+        data = self.dias[rng.choice(len(self.dias), n, p=self.peso_dia)]
+        hora = rng.choice(24, n, p=_pesos(PESOS_HORA))
+        horario = self.minutos[hora * 60 + rng.integers(0, 60, n)]
+        dia_semana = np.asarray(DIAS_SEMANA_CSV, dtype=object)[pd.DatetimeIndex(data).dayofweek]
+        fase_dia = np.select([(hora >= 6) & (hora <= 16), hora == 17, hora == 5],
+                             ['Pleno dia', 'Anoitecer', 'Amanhecer'], 'Plena Noite').astype(object)
+
+        # Vítimas coerentes com a classificação
+        classificacao = _sortear(rng, CLASSIFICACOES, n)
+        fatal = classificacao == 'Com Vítimas Fatais'
+        com_feridos = classificacao != 'Sem Vítimas'
+        mortos = np.where(fatal, 1 + rng.poisson(0.15, n), 0)
+        feridos = np.where(com_feridos, np.where(fatal, rng.poisson(0.8, n), 1 + rng.poisson(0.4, n)), 0)
+        feridos_graves = rng.binomial(feridos, 0.25)
+        veiculos = np.minimum(1 + rng.poisson(0.9, n), 10)
+        ilesos = rng.poisson(0.9, n) * (veiculos > 1)
+        ignorados = rng.poisson(0.05, n)
+
+        causa = np.asarray(CAUSAS_ACIDENTE, dtype=object)[rng.choice(len(CAUSAS_ACIDENTE), n,
+                                                                     p=_zipf(len(CAUSAS_ACIDENTE), 0.8))]
+        ids = np.arange(self.proximo_id, self.proximo_id + n)
+        self.proximo_id += n
+        return pd.DataFrame({
+            'id': ids,
+            'data_inversa': data,
+            'dia_semana': dia_semana,
+            'horario': horario,
+            'uf': uf,
+            'br': self.brs[br_codigo],
+            'km': km,
+            'municipio': municipio,
+            'causa_acidente': causa,
+            'tipo_acidente': _sortear(rng, TIPOS_ACIDENTE, n),
+            'classificacao_acidente': classificacao,
+            'fase_dia': fase_dia,
+            'sentido_via': _sortear(rng, SENTIDOS_VIA, n),
+            'condicao_metereologica': _sortear(rng, CONDICOES_METEREOLOGICAS, n),
+            'tipo_pista': _sortear(rng, TIPOS_PISTA, n),
+            'tracado_via': _sortear(rng, TRACADOS_VIA, n),
+            'uso_solo': _sortear(rng, USOS_SOLO, n),
+            'pessoas': mortos + feridos + ilesos + ignorados,
+            'mortos': mortos,
+            'feridos_leves': feridos - feridos_graves,
+            'feridos_graves': feridos_graves,
+            'ilesos': ilesos,
+            'ignorados': ignorados,
+            'veiculos': veiculos,
+            'latitude': latitude,
+            'longitude': longitude,
+        })
+
+
+@contextmanager
+def na_pasta(pasta):
+    """Diretório de trabalho temporário: os caminhos do app (Dados/...) são relativos a ele."""
+    anterior = os.getcwd()
+    os.chdir(pasta)
+    try:
+        yield
+    finally:
+        os.chdir(anterior)
+
+
+def pasta_do_tamanho(tamanho, destino=PASTA_PADRAO):
+    return os.path.abspath(os.path.join(destino, tamanho))
+
+
+def gerar_dataset(linhas, pasta, semente=0, linhas_por_lote=LINHAS_POR_LOTE, particionar=False):
+    """
+    Grava em <pasta>/Dados o Parquet principal, o cubo, as séries e a versão do dataset.
+    - particionar: também grava o dataset particionado por Ano/Uf (que o app prefere ao arquivo único)
+    Lote a lote: a memória depende de linhas_por_lote, não do total.
+    """
+    os.makedirs(os.path.join(pasta, 'Dados'), exist_ok=True)
+    with na_pasta(pasta):
+        gerador = Gerador(semente)
+        esquema, escritor = None, None
+        try:
+            for inicio in range(0, linhas, linhas_por_lote):
+                lote = derivar_colunas(gerador.lote(min(linhas_por_lote, linhas - inicio)))
+                tabela = pa.Table.from_pandas(lote, schema=esquema, preserve_index=False)
+                if escritor is None:
+                    esquema = tabela.schema.remove_metadata()
+                    escritor = pq.ParquetWriter(CAMINHO_ARQUIVO, esquema)
+                escritor.write_table(tabela.cast(esquema))
+        finally:
+            if escritor is not None:
+                escritor.close()
+
+        if particionar:
+            particionar_arquivo()
+        gravar_cubo()
+        gravar_series()
+        with open(CAMINHO_VERSAO, 'w', encoding='utf-8') as arquivo:
+            json.dump({'versao': 1, 'atualizado_em': datetime.now().isoformat(timespec='seconds'),
+                       'linhas_novas': linhas, 'linhas_alteradas': 0, 'sintetico': True},
+                      arquivo, ensure_ascii=False, indent=2)
+    return pasta
+
+
+def numero_de_linhas(tamanho):
+    """'100k', '1m', '2.5m' ou um número."""
+    tamanho = str(tamanho).lower()
+    if tamanho in TAMANHOS:
+        return TAMANHOS[tamanho]
+    multiplicador = {'k': 1_000, 'm': 1_000_000}.get(tamanho[-1:], 1)
+    return int(float(tamanho.rstrip('km')) * multiplicador)
+
+
+# ----------------------------
+# Linha de comando
+# ----------------------------
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gera datasets sintéticos no formato da PRF.')
+    parser.add_argument('tamanhos', nargs='*', default=['100k', '1m'], help=f'ex.: {" ".join(TAMANHOS)}')
+    parser.add_argument('--destino', default=PASTA_PADRAO)
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--lote', type=int, default=LINHAS_POR_LOTE, help='linhas geradas por vez')
+    parser.add_argument('--particionar', action='store_true', help='grava também o dataset particionado')
+    args = parser.parse_args()
+
+    for tamanho in args.tamanhos:
+        pasta = gerar_dataset(numero_de_linhas(tamanho), pasta_do_tamanho(tamanho, args.destino), args.semente,
+                              args.lote, args.particionar)
+        print(f"{tamanho}: {pasta}")
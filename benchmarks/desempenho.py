@@ -0,0 +1,291 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+import subprocess
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import streamlit as st
+import streamlit.logger
+from benchmarks.dados_sinteticos import (TAMANHOS, PASTA_PADRAO, na_pasta, pasta_do_tamanho, gerar_dataset,
+                                         numero_de_linhas)
+from utils.carregamento import (carregar_arquivo_parquet, carregar_indice_bitmap, carregar_piramide,
+                                carregar_indice_espacial, colunas_pagina, _montar_indice)
+from utils.filtros import cache_filtros, filtros_aplicados
+from utils.indice_bitmap import selecionar, posicoes
+from utils.visao import Visao
+from utils.totalizadores import total_acidentes, total_mortos, total_feridos, total_veiculos
+from utils.cubo import carregar_cubo, filtrar_cubo
+from utils.series_temporais import carregar_series, filtrar_series
+from utils.agregacao import Pedido, agregar, cruzar
+from utils.espacial import agregar_grade, nivel_do_zoom, consultar_raio
+from utils.graficos import figura_barra, figura_linha, figura_tabela_calor
+from utils.serializacao import compactar_figura
+
+
+
+# ----------------------------
+# Benchmarks dos caminhos de filtro e de agregação
+#   python -m benchmarks.desempenho 100k 1m --gerar
+#   python -m benchmarks.desempenho --comparar benchmarks/resultados/A.json benchmarks/resultados/B.json
+# ----------------------------
+# Cada caso roda sobre os datasets sintéticos (benchmarks/dados_sinteticos.py), em cada tamanho e
+# em cada seleção da barra lateral. Os caches do app são limpos antes de cada repetição: o tempo é
+# o do caminho frio, como na primeira vez que uma sessão pede aquela seleção.
+# - tempo: menor e mediana de N repetições (time.perf_counter)
+# - pico: memória máxima alocada durante uma repetição extra sob tracemalloc (Python e numpy;
+#   buffers internos do Arrow não entram)
+# O resultado vai para benchmarks/resultados/<data>-<commit>.json, para comparar entre versões.
+PASTA_RESULTADOS = 'benchmarks/resultados'
+REPETICOES = 3
+
+PAGINA = 'Painéis'
+
+# Seleções da barra lateral (nome: selecoes)
+SELECOES = {
+    'sem filtro': {},
+    'uma uf': {'Uf': ['MG']},
+    'ano e regiao': {'Ano': [2024], 'Região': ['Sul']},
+}
+
+
+def _visao(contexto):
+    """Visão nova (sem agrupamentos memorizados) sobre a seleção do contexto."""
+    return Visao(contexto['df'], contexto['indice'], contexto['selecoes'])
+
+
+def _pedido(dimensao, top_n=None, freq=None, com_cubo=False):
+    def caso(contexto):
+        pedido = Pedido(dimensao, None, top_n, freq)
+        return len(agregar(_visao(contexto), [pedido], contexto['cubo'] if com_cubo else None)[pedido])
+    return caso
+
+
+def _cruzamento(linha, coluna, com_cubo=False):
+    def caso(contexto):
+        cruzamento = cruzar(_visao(contexto), linha, coluna, contexto['cubo'] if com_cubo else None)
+        return int(cruzamento.matrizes['Acidentes'].size)
+    return caso
+
+
+def _filtros_aplicados(contexto):
+    # Caminho antigo: isin sobre o DataFrame inteiro, filtro a filtro
+    df = contexto['df']
+    for coluna in ['Ano', 'Mês', 'Região', 'Uf', 'Municipio']:
+        st.session_state[f'main_filtro_{coluna}'] = list(contexto['selecoes'].get(coluna, []))
+        df = filtros_aplicados(df, coluna)
+    return len(df)
+
+
+def _filtro_indexado(contexto):
+    selecao = selecionar(contexto['indice'], contexto['selecoes']) if contexto['selecoes'] else None
+    return len(contexto['df']) if selecao is None else len(posicoes(contexto['indice'], selecao))
+
+
+def _totalizadores(contexto):
+    visao = _visao(contexto)
+    return len([total(visao) for total in (total_acidentes, total_mortos, total_feridos, total_veiculos)])
+
+
+def _figura_linha_diaria(contexto):
+    pedido = Pedido('Data', None, None, 'D')
+    total = agregar(_visao(contexto), [pedido], contexto['cubo'])[pedido]
+    return len(compactar_figura(figura_linha(total, 'Data', freq='D')).data[0].x)
+
+
+def _figura_barra_municipios(contexto):
+    pedido = Pedido('Municipio', None, 30)
+    total = agregar(_visao(contexto), [pedido], contexto['cubo'])[pedido]
+    return len(compactar_figura(figura_barra(total, 'Municipio')).data[0].x)
+
+
+def _figura_tabela_calor(contexto):
+    cruzamento = cruzar(_visao(contexto), 'Municipio', 'Hora')
+    return len(compactar_figura(figura_tabela_calor(cruzamento)).data[0].y)
+
+
+def _grade(zoom):
+    def caso(contexto):
+        visao = _visao(contexto)
+        celulas, _ = agregar_grade(contexto['piramide'], nivel_do_zoom(zoom), visao.posicoes)
+        return len(celulas)
+    return caso
+
+
+def _raio(contexto):
+    visao = _visao(contexto)
+    encontradas, _ = consultar_raio(contexto['indice_espacial'], -19.9, -43.9, 50, visao.selecao)
+    return len(encontradas)
+
+
+# Casos: nome -> função(contexto) que devolve um tamanho de resultado (para conferir entre versões)
+CASOS = {
+    'filtros_aplicados (pandas isin)': _filtros_aplicados,
+    'filtro indexado (bitmap)': _filtro_indexado,
+    'totalizadores': _totalizadores,
+    'agrupar Região (linhas)': _pedido('Região'),
+    'agrupar Uf (linhas)': _pedido('Uf'),
+    'top 10 Municipio (linhas)': _pedido('Municipio', 10),
+    'top 10 Municipio (cubo)': _pedido('Municipio', 10, com_cubo=True),
+    'top 10 Br (linhas)': _pedido('Br', 10),
+    'agrupar Tipo Acidente (cubo)': _pedido('Tipo Acidente', com_cubo=True),
+    'Data por mês (linhas)': _pedido('Data', freq='MS'),
+    'Data por dia (séries)': _pedido('Data', freq='D', com_cubo=True),
+    'Data por hora (linhas)': _pedido('Data', freq='h'),
+    'Data por hora (séries)': _pedido('Data', freq='h', com_cubo=True),
+    'cruzar Causa Grupo x Tipo Acidente (linhas)': _cruzamento('Causa Grupo', 'Tipo Acidente'),
+    'cruzar Municipio x Hora (linhas)': _cruzamento('Municipio', 'Hora'),
+    'figura linha diária': _figura_linha_diaria,
+    'figura barra top 30 Municipio': _figura_barra_municipios,
+    'figura tabela de calor Municipio x Hora': _figura_tabela_calor,
+    'grade do heatmap (zoom 4)': _grade(4),
+    'grade do heatmap (zoom 10)': _grade(10),
+    'pontos num raio de 50 km': _raio,
+}
+
+
+def _limpar_caches():
+    st.cache_resource.clear()
+    st.cache_data.clear()
+
+
+def _medir(funcao, repeticoes, antes=None):
+    """(menor tempo, mediana, pico em MB, resultado) de funcao(); antes() roda fora da medição."""
+    tempos = []
+    for _ in range(repeticoes):
+        if antes:
+            antes()
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+
+    if antes:
+        antes()
+    tracemalloc.start()
+    try:
+        funcao()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(tempos), float(np.median(tempos)), pico / 1024 ** 2, resultado
+
+
+def medir_tamanho(tamanho, pasta, repeticoes=REPETICOES, casos=None):
+    """Linhas de resultado de todos os casos em um dataset (pasta com Dados/)."""
+    resultados = []
+
+    def registrar(caso, selecao, medida):
+        menor, mediana, pico, resultado = medida
+        resultados.append({'tamanho': tamanho, 'caso': caso, 'selecao': selecao, 'tempo_min_s': round(menor, 6),
+                           'tempo_mediana_s': round(mediana, 6), 'pico_mb': round(pico, 3),
+                           'resultado': resultado})
+        print(f"{tamanho:>6} | {selecao:<13} | {caso:<45} | {mediana * 1000:10.2f} ms | {pico:9.1f} MB",
+              flush=True)
+
+    with na_pasta(pasta):
+        _limpar_caches()
+        colunas = colunas_pagina(PAGINA)
+        # Leitura e índices: sem cache, a cada repetição
+        registrar('carregar parquet', 'sem filtro',
+                  _medir(lambda: len(carregar_arquivo_parquet(colunas)), repeticoes, antes=_limpar_caches))
+        registrar('montar índice bitmap', 'sem filtro',
+                  _medir(lambda: len(carregar_indice_bitmap(colunas)['colunas']), repeticoes,
+                         antes=_montar_indice.clear))
+
+        contexto = {
+            'df': carregar_arquivo_parquet(colunas),
+            'indice': carregar_indice_bitmap(colunas),
+            'piramide': carregar_piramide(colunas),
+            'indice_espacial': carregar_indice_espacial(colunas),
+        }
+        cubo_completo, series = carregar_cubo(), carregar_series()
+        for nome_selecao, selecoes in SELECOES.items():
+            contexto['selecoes'] = selecoes
+            for nome, caso in CASOS.items():
+                if casos and nome not in casos:
+                    continue
+
+                def preparar():
+                    cache_filtros().limpar()
+                    contexto['cubo'] = {**filtrar_cubo(cubo_completo, selecoes), **filtrar_series(series, selecoes)}
+
+                registrar(nome, nome_selecao, _medir(lambda: caso(contexto), repeticoes, antes=preparar))
+        _limpar_caches()
+    return resultados
+
+
+def commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'sem-git'
+
+
+def gravar_resultados(resultados, destino=PASTA_RESULTADOS):
+    commit = commit_atual()
+    os.makedirs(destino, exist_ok=True)
+    caminho = os.path.join(destino, f"{datetime.now():%Y%m%d-%H%M%S}-{commit}.json")
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump({
+            'commit': commit,
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'maquina': platform.platform(),
+            'processadores': os.cpu_count(),
+            'resultados': resultados,
+        }, arquivo, ensure_ascii=False, indent=1)
+    return caminho
+
+
+def comparar(base, novo):
+    """Tabela caso a caso: mediana e pico das duas execuções e a razão novo/base."""
+    def ler(caminho):
+        with open(caminho, encoding='utf-8') as arquivo:
+            dados = json.load(arquivo)
+        tabela = pd.DataFrame(dados['resultados']).set_index(['tamanho', 'selecao', 'caso'])
+        return dados['commit'], tabela[['tempo_mediana_s', 'pico_mb']]
+
+    commit_base, tabela_base = ler(base)
+    commit_novo, tabela_novo = ler(novo)
+    tabela = tabela_base.join(tabela_novo, how='outer', lsuffix=f' {commit_base}', rsuffix=f' {commit_novo}')
+    tabela['tempo novo/base'] = (tabela[f'tempo_mediana_s {commit_novo}']
+                                 / tabela[f'tempo_mediana_s {commit_base}']).round(2)
+    tabela['pico novo/base'] = (tabela[f'pico_mb {commit_novo}'] / tabela[f'pico_mb {commit_base}']).round(2)
+    return tabela
+
+
+# ----------------------------
+# Linha de comando
+# ----------------------------
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks de filtros e agregações nos datasets sintéticos.')
+    parser.add_argument('tamanhos', nargs='*', default=['100k', '1m'], help=f'ex.: {" ".join(TAMANHOS)}')
+    parser.add_argument('--dados', default=PASTA_PADRAO, help='pasta dos datasets sintéticos')
+    parser.add_argument('--gerar', action='store_true', help='gera os tamanhos que ainda não existem')
+    parser.add_argument('--repeticoes', type=int, default=REPETICOES)
+    parser.add_argument('--caso', action='append', help='roda só os casos com esse nome (pode repetir)')
+    parser.add_argument('--comparar', nargs=2, metavar=('BASE', 'NOVO'), help='compara dois resultados gravados')
+    args = parser.parse_args()
+
+    streamlit.logger.set_log_level('error')
+    if args.comparar:
+        with pd.option_context('display.max_rows', None, 'display.width', 200):
+            print(comparar(*args.comparar))
+        sys.exit(0)
+
+    todos = []
+    for tamanho in args.tamanhos:
+        pasta = pasta_do_tamanho(tamanho, args.dados)
+        if not os.path.exists(os.path.join(pasta, 'Dados')):
+            if not args.gerar:
+                sys.exit(f"Dataset {tamanho} não existe em {pasta}; use --gerar ou benchmarks/dados_sinteticos.py")
+            gerar_dataset(numero_de_linhas(tamanho), pasta)
+        todos.extend(medir_tamanho(tamanho, pasta, args.repeticoes, args.caso))
+    print(f"Resultados em {gravar_resultados(todos)}")
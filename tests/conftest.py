@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils.esquema import MESES, DIAS_SEMANA, compactar_tipos
+
+
+
+# ----------------------------
+# Acidentes sintéticos com as colunas do dataset da PRF
+# ----------------------------
+# Poucas UFs e municípios (alguns raros, um nome repetido entre UFs), chaves e coordenadas
+# com vazios, para comparar as estruturas pré-calculadas com o pandas sobre as mesmas linhas.
+UFS = {'SP': 'Sudeste', 'MG': 'Sudeste', 'RJ': 'Sudeste', 'BA': 'Nordeste', 'PE': 'Nordeste', 'RS': 'Sul'}
+TIPOS_ACIDENTE = ['Colisão traseira', 'Saída de leito carroçável', 'Tombamento', 'Atropelamento de Pedestre']
+
+
+def gerar(n, semente=0, inicio_id=0):
+    rng = np.random.default_rng(semente)
+    ufs = rng.choice(list(UFS), n, p=[0.35, 0.25, 0.15, 0.1, 0.1, 0.05])
+    # Municípios com frequências bem diferentes; 'Centro' existe em todas as UFs
+    numeros = np.minimum(rng.geometric(0.15, n), 40)
+    municipios = np.where(numeros == 1, 'Centro', np.char.add(np.char.add('Cidade ', ufs), numeros.astype(str)))
+    datas = pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 731, n), unit='D')
+    horas = rng.integers(0, 24, n)
+    tipos = rng.choice(TIPOS_ACIDENTE, n).astype(object)
+    tipos[rng.random(n) < 0.03] = None
+    latitude = rng.uniform(-33.7, 5.2, n)
+    longitude = rng.uniform(-73.9, -34.8, n)
+    sem_coordenada = rng.random(n) < 0.02
+    latitude[sem_coordenada] = np.nan
+    longitude[sem_coordenada] = np.nan
+
+    df = pd.DataFrame({
+        'Id': np.arange(inicio_id, inicio_id + n),
+        'Data': datas + pd.to_timedelta(horas, unit='h'),
+        'Ano': datas.year,
+        'Mês': np.asarray(MESES, dtype=object)[datas.month - 1],
+        'Dia Semana': np.asarray(DIAS_SEMANA, dtype=object)[(datas.dayofweek + 1) % 7],
+        'Hora': horas,
+        'Região': [UFS[uf] for uf in ufs],
+        'Uf': ufs,
+        'Municipio': municipios,
+        'Br': rng.choice([101, 116, 381, 40], n),
+        'Km': np.round(rng.uniform(0, 800, n), 1),
+        'Tipo Acidente': tipos,
+        'Mortos': rng.choice([0, 0, 0, 0, 1, 2], n),
+        'Feridos': rng.integers(0, 5, n),
+        'Veiculos': rng.integers(1, 5, n),
+        'Latitude': latitude,
+        'Longitude': longitude,
+    })
+    df, _ = compactar_tipos(df)
+    return df
+
+
+@pytest.fixture
+def acidentes():
+    return gerar(3000)
+
+
+@pytest.fixture
+def gerar_acidentes():
+    return gerar
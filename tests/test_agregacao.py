@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+from utils.agregacao import ROTULO_OUTROS, Pedido, agrupar, totalizar
+
+
+@pytest.fixture
+def grupo(acidentes):
+    return agrupar(acidentes, 'Municipio')
+
+
+@pytest.mark.parametrize('medida, top_n', [(None, None), (None, 5), ('Mortos', 3)])
+def test_totalizar_igual_ao_nlargest(acidentes, grupo, medida, top_n):
+    total = totalizar(grupo, Pedido('Municipio', medida, top_n))
+    if medida is None:
+        esperado = acidentes.groupby('Municipio', observed=True).size()
+    else:
+        esperado = acidentes.groupby('Municipio', observed=True)[medida].sum()
+    esperado = esperado.sort_values(ascending=False, kind='stable').iloc[:top_n]
+    assert total['Total'].tolist() == esperado.tolist()
+
+
+def test_percentual_sobre_as_linhas_devolvidas(grupo):
+    total = totalizar(grupo, Pedido('Municipio', None, 5))
+    assert total['Percentual'].sum() == pytest.approx(100, abs=0.5)
+
+    com_outros = totalizar(grupo, Pedido('Municipio', None, 5, outros=True))
+    assert com_outros['Municipio'].iloc[-1] == ROTULO_OUTROS
+    assert com_outros['Total'].sum() == grupo['Acidentes'].sum()
+
+
+def test_percentual_total_antes_do_top_n(acidentes, grupo):
+    # Como o gráfico de linha: a participação de cada categoria no total de todas elas
+    total = totalizar(grupo, Pedido('Municipio', None, 5, percentual_total=True))
+    contagem = acidentes['Municipio'].value_counts()
+    esperado = (contagem.iloc[:5] / len(acidentes) * 100).round(1)
+    assert total['Percentual'].tolist() == esperado.tolist()
+
+
+def test_percentual_total_serie_de_data(acidentes):
+    grupo = agrupar(acidentes, 'Data', freq='MS')
+    total = totalizar(grupo, Pedido('Data', None, 3, 'MS', percentual_total=True))
+    assert len(total) == 3
+    assert total['Data'].is_monotonic_increasing
+    esperado = (total['Total'] / len(acidentes) * 100).round(1)
+    pd.testing.assert_series_equal(total['Percentual'], esperado, check_names=False)
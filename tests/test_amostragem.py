@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils.amostragem import lttb
+
+
+@pytest.mark.parametrize('n, limite', [(10, 10), (10, 50), (100, 2), (0, 5)])
+def test_series_curtas_voltam_inteiras(n, limite):
+    np.testing.assert_array_equal(lttb(np.arange(n), np.ones(n), limite), np.arange(n))
+
+
+@pytest.mark.parametrize('limite', [3, 50, 999])
+def test_posicoes_ordenadas_com_as_pontas(limite):
+    rng = np.random.default_rng(0)
+    y = rng.normal(size=1000).cumsum()
+    escolhidos = lttb(np.arange(1000), y, limite)
+    assert len(escolhidos) == limite
+    assert escolhidos[0] == 0 and escolhidos[-1] == 999
+    assert (np.diff(escolhidos) > 0).all()
+
+
+def test_mantem_picos():
+    y = np.zeros(5000)
+    picos = [317, 1999, 4321]
+    y[picos] = [50, -80, 120]
+    escolhidos = lttb(np.arange(5000), y, 100)
+    assert set(picos) <= set(escolhidos)
+
+
+def test_aceita_datas_e_vazios():
+    datas = pd.date_range('2020-01-01', periods=2000, freq='D').to_numpy()
+    y = np.sin(np.arange(2000) / 50)
+    y[::7] = np.nan
+    escolhidos = lttb(datas, y, 200)
+    assert len(escolhidos) == 200 and (np.diff(escolhidos) > 0).all()
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+from utils.cache_lru import CacheLRU, tamanho_em_bytes
+
+
+def test_calcula_so_na_falha():
+    cache = CacheLRU(max_entradas=4, max_bytes=1_000)
+    chamadas = []
+    calcular = lambda: chamadas.append(1) or 'valor'
+    assert cache.obter('a', calcular) == 'valor'
+    assert cache.obter('a', calcular) == 'valor'
+    assert len(chamadas) == 1
+    estatisticas = cache.estatisticas()
+    assert (estatisticas['Acertos'], estatisticas['Falhas'], estatisticas['Taxa de Acerto']) == (1, 1, 50.0)
+
+
+def test_descarta_o_menos_usado_por_entradas():
+    cache = CacheLRU(max_entradas=2, max_bytes=1_000)
+    cache.guardar('a', 'x')
+    cache.guardar('b', 'y')
+    cache.obter('a', lambda: 'novo')     # 'a' passa a ser o mais recente
+    cache.guardar('c', 'z')
+    assert cache.obter('b', lambda: 'recalculado') == 'recalculado'
+    assert cache.obter('c', lambda: 'recalculado') == 'z'
+
+
+def test_descarta_por_bytes():
+    cache = CacheLRU(max_entradas=10, max_bytes=3_000)
+    for chave in 'abc':
+        cache.guardar(chave, np.zeros(1_000, dtype=np.uint8))
+    cache.guardar('d', np.zeros(1_500, dtype=np.uint8))
+    estatisticas = cache.estatisticas()
+    assert estatisticas['Bytes'] <= 3_000
+    assert estatisticas['Entradas'] == 2
+    assert cache.obter('c', lambda: None) is not None
+
+
+def test_nao_guarda_valor_maior_que_o_cache():
+    cache = CacheLRU(max_entradas=10, max_bytes=100)
+    cache.guardar('a', 'pequeno')
+    cache.guardar('b', np.zeros(1_000, dtype=np.uint8))
+    assert cache.estatisticas()['Entradas'] == 1
+
+
+def test_substituir_chave_atualiza_os_bytes():
+    cache = CacheLRU(max_entradas=10, max_bytes=10_000)
+    cache.guardar('a', np.zeros(1_000, dtype=np.uint8))
+    cache.guardar('a', np.zeros(10, dtype=np.uint8))
+    assert cache.estatisticas()['Bytes'] == 10
+    cache.limpar()
+    assert cache.estatisticas()['Entradas'] == cache.estatisticas()['Bytes'] == 0
+
+
+def test_tamanho_em_bytes():
+    posicoes = np.arange(100, dtype=np.int32)
+    df = pd.DataFrame({'a': np.arange(10, dtype=np.int64)})
+    assert tamanho_em_bytes(None) == 0
+    assert tamanho_em_bytes(posicoes) == 400
+    assert tamanho_em_bytes((posicoes, {'df': df})) == 400 + df.memory_usage(deep=True).sum()
@@ -0,0 +1,110 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pytest
+from utils.cubo import (COLUNA_CONTAGEM, CUBOIDE_BASE, DIMENSOES_BASE, MEDIDAS_CUBO, atualizar_cubo, blocos,
+                        construir_cubo, descontar, filtrar_cubo, gravar_cubo, ler_cubo, somar_parciais,
+                        totais_do_cubo)
+
+
+def _dataset(df):
+    return ds.dataset(pa.Table.from_pandas(df, preserve_index=False))
+
+
+def _agrupar(df, chaves, medidas=MEDIDAS_CUBO):
+    agregacoes = {COLUNA_CONTAGEM: (chaves[0], 'size')}
+    agregacoes.update({medida: (medida, 'sum') for medida in medidas})
+    return df.groupby(chaves, observed=True, dropna=False).agg(**agregacoes).reset_index()
+
+
+def _comparavel(df, chaves):
+    # Chaves como texto (categorias e NaN iguais dos dois lados), medidas como int64, mesma ordem
+    df = df.copy()
+    df[chaves] = df[chaves].astype(str)
+    valores = [c for c in df.columns if c not in chaves]
+    df[valores] = df[valores].astype('int64')
+    return df.sort_values(chaves).reset_index(drop=True)[chaves + sorted(valores)]
+
+
+def _assert_cubo_igual(cubo, df):
+    assert set(cubo) == {CUBOIDE_BASE, 'Municipio', 'Dia Semana', 'Hora', 'Br', 'Tipo Acidente'}
+    for nome, cuboide in cubo.items():
+        chaves = DIMENSOES_BASE + ([] if nome == CUBOIDE_BASE else [nome])
+        pd.testing.assert_frame_equal(_comparavel(cuboide, chaves), _comparavel(_agrupar(df, chaves), chaves))
+
+
+def test_blocos_juntam_lotes_pequenos(acidentes):
+    dataset = ds.dataset(pa.Table.from_pandas(acidentes, preserve_index=False).to_batches(max_chunksize=70))
+    tamanhos = [len(df) for df in blocos(dataset, ['Uf', 'Mortos'], linhas=1000)]
+    assert sum(tamanhos) == len(acidentes)
+    assert all(tamanho >= 1000 for tamanho in tamanhos[:-1])
+
+
+def test_cubo_igual_ao_groupby(acidentes):
+    _assert_cubo_igual(construir_cubo(_dataset(acidentes)), acidentes)
+
+
+def test_cubo_em_partes_igual_ao_inteiro(acidentes):
+    # Mesma soma que várias passadas de blocos: cubos de pedaços somados com somar_parciais
+    pedacos = [construir_cubo(_dataset(acidentes.iloc[i:i + 700])) for i in range(0, len(acidentes), 700)]
+    somado = {nome: somar_parciais([pedaco[nome] for pedaco in pedacos]) for nome in pedacos[0]}
+    _assert_cubo_igual(somado, acidentes)
+
+
+def test_descontar_desfaz_a_soma(acidentes):
+    cubo = construir_cubo(_dataset(acidentes))
+    parte = construir_cubo(_dataset(acidentes.iloc[:500]))
+    resto = {nome: somar_parciais([cubo[nome], descontar(parte)[nome]]) for nome in cubo}
+    _assert_cubo_igual(resto, acidentes.iloc[500:])
+
+
+def test_atualizar_cubo_igual_a_reconstruir(tmp_path, gerar_acidentes):
+    antigas = gerar_acidentes(2000, semente=1)
+    novas = gerar_acidentes(300, semente=2, inicio_id=2000)
+    # Ocorrências alteradas: a versão antiga sai e a nova entra com as linhas novas
+    alteradas = gerar_acidentes(100, semente=3)
+    removidas = antigas[antigas['Id'].isin(alteradas['Id'])]
+    final = pd.concat([antigas[~antigas['Id'].isin(alteradas['Id'])], alteradas, novas], ignore_index=True)
+
+    gravar_cubo(str(tmp_path), construir_cubo(_dataset(antigas)))
+    atualizar_cubo(_dataset(pd.concat([alteradas, novas], ignore_index=True)), _dataset(removidas),
+                   destino=str(tmp_path))
+    _assert_cubo_igual(ler_cubo(str(tmp_path)), final)
+
+
+@pytest.mark.parametrize('colunas, medidas', [
+    (['Uf'], None),
+    (['Ano', 'Mês'], ['Mortos', 'Feridos']),
+    (['Tipo Acidente', 'Região'], ['Veiculos']),
+    (['Municipio'], [COLUNA_CONTAGEM, 'Mortos']),
+])
+def test_totais_do_cubo(acidentes, colunas, medidas):
+    totais = totais_do_cubo(construir_cubo(_dataset(acidentes)), colunas, medidas)
+    esperado = _agrupar(acidentes, colunas).dropna(subset=colunas)[colunas + (medidas or [COLUNA_CONTAGEM])]
+    pd.testing.assert_frame_equal(_comparavel(totais, colunas), _comparavel(esperado, colunas))
+
+
+def test_totais_do_cubo_sem_cuboide(acidentes):
+    cubo = construir_cubo(_dataset(acidentes))
+    assert totais_do_cubo(cubo, ['Municipio', 'Hora']) is None
+    assert totais_do_cubo(cubo, ['Mortos']) is None
+    assert totais_do_cubo({}, ['Uf']) is None
+
+
+def test_filtrar_cubo(acidentes):
+    selecoes = {'Ano': [2021], 'Uf': ['SP', 'BA'], 'Municipio': ['Centro'], 'Mês': []}
+    filtrado = filtrar_cubo(construir_cubo(_dataset(acidentes)), selecoes)
+    # Só o cuboide de Municipio tem todas as colunas dos filtros
+    assert set(filtrado) == {'Municipio'}
+    linhas = acidentes[acidentes['Ano'].isin([2021]) & acidentes['Uf'].isin(['SP', 'BA'])
+                       & acidentes['Municipio'].isin(['Centro'])]
+    assert filtrado['Municipio'][COLUNA_CONTAGEM].sum() == len(linhas)
+    assert filtrado['Municipio']['Mortos'].sum() == linhas['Mortos'].sum()
+
+
+def test_filtrar_cubo_memorizado_por_versao(acidentes):
+    cubo = construir_cubo(_dataset(acidentes))
+    selecoes = {'Uf': ['SP'], 'Ano': [2020]}
+    primeiro = filtrar_cubo(cubo, selecoes, versao='teste-memorizado')
+    assert filtrar_cubo(cubo, {'Ano': [2020], 'Uf': ['SP']}, versao='teste-memorizado') is primeiro
+    assert filtrar_cubo(cubo, selecoes) is not primeiro
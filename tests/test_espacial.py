@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+from utils.espacial import (construir_indice_espacial, construir_indice_km, consultar_raio, consultar_retangulo,
+                            consultar_vizinhos, distancia_km, localizar_km)
+
+
+@pytest.fixture
+def indice(acidentes):
+    return construir_indice_espacial(acidentes)
+
+
+def _coordenadas(df):
+    # As mesmas float32 guardadas no índice; NaN nunca passa nos testes de distância/limites
+    return df['Latitude'].to_numpy(dtype='float32'), df['Longitude'].to_numpy(dtype='float32')
+
+
+@pytest.fixture
+def selecao(acidentes):
+    return np.flatnonzero(acidentes['Uf'].isin(['SP', 'BA']).to_numpy())
+
+
+@pytest.mark.parametrize('limites', [
+    (-25.0, -20.0, -50.0, -44.0),
+    (-33.7, 5.2, -73.9, -34.8),
+    (-10.123, -10.0, -40.5, -40.2),
+    (0.0, 1.0, -20.0, -10.0),
+])
+@pytest.mark.parametrize('com_selecao', [False, True])
+def test_retangulo_igual_a_mascara(acidentes, indice, selecao, limites, com_selecao):
+    lat_min, lat_max, lon_min, lon_max = limites
+    latitude, longitude = _coordenadas(acidentes)
+    mascara = (latitude >= lat_min) & (latitude <= lat_max) & (longitude >= lon_min) & (longitude <= lon_max)
+    if com_selecao:
+        mascara &= np.isin(np.arange(len(acidentes)), selecao)
+    obtido = consultar_retangulo(indice, *limites, selecao=selecao if com_selecao else None)
+    np.testing.assert_array_equal(obtido, np.flatnonzero(mascara))
+
+
+@pytest.mark.parametrize('ponto, raio_km', [
+    ((-23.55, -46.63), 150),
+    ((-12.97, -38.5), 400),
+    ((-30.0, -51.2), 5),
+    ((-15.0, -50.0), 3000),
+])
+@pytest.mark.parametrize('com_selecao', [False, True])
+def test_raio_igual_a_mascara(acidentes, indice, selecao, ponto, raio_km, com_selecao):
+    latitude, longitude = _coordenadas(acidentes)
+    distancias = distancia_km(*ponto, latitude, longitude)
+    mascara = distancias <= raio_km
+    if com_selecao:
+        mascara &= np.isin(np.arange(len(acidentes)), selecao)
+    posicoes, obtidas = consultar_raio(indice, *ponto, raio_km, selecao=selecao if com_selecao else None)
+    np.testing.assert_array_equal(posicoes, np.flatnonzero(mascara))
+    np.testing.assert_allclose(obtidas, distancias[mascara])
+
+
+@pytest.mark.parametrize('ponto', [(-23.55, -46.63), (-3.1, -60.0), (4.5, -35.0)])
+@pytest.mark.parametrize('k', [1, 10, 250])
+@pytest.mark.parametrize('com_selecao', [False, True])
+def test_vizinhos_iguais_a_ordenacao(acidentes, indice, selecao, ponto, k, com_selecao):
+    latitude, longitude = _coordenadas(acidentes)
+    distancias = distancia_km(*ponto, latitude, longitude)
+    candidatas = np.flatnonzero(~np.isnan(distancias))
+    if com_selecao:
+        candidatas = np.intersect1d(candidatas, selecao)
+    esperadas = np.sort(distancias[candidatas])[:k]
+
+    posicoes, obtidas = consultar_vizinhos(indice, *ponto, k, selecao=selecao if com_selecao else None)
+    np.testing.assert_allclose(obtidas, esperadas)
+    np.testing.assert_allclose(distancias[posicoes], obtidas)
+
+
+def test_vizinhos_com_menos_linhas_que_k(acidentes, indice):
+    selecao = np.flatnonzero(acidentes['Municipio'].eq('Cidade SP30').to_numpy())
+    posicoes, _ = consultar_vizinhos(indice, -23.55, -46.63, 50, selecao=selecao)
+    validas = selecao[acidentes['Latitude'].notna().to_numpy()[selecao]]
+    np.testing.assert_array_equal(np.sort(posicoes), validas)
+
+
+def _localizar_varrendo(df, br, km, selecao):
+    # Varredura de todas as linhas: Km inteiro mais próximo (o menor no empate) e mediana das coordenadas
+    kms = np.floor(df['Km'].to_numpy(dtype='float64'))
+    latitude, longitude = df['Latitude'].to_numpy(dtype='float64'), df['Longitude'].to_numpy(dtype='float64')
+    mascara = (df['Br'].to_numpy() == br) & ~np.isnan(kms) & ~np.isnan(latitude)
+    if selecao is not None:
+        mascara &= np.isin(np.arange(len(df)), selecao)
+    if not mascara.any():
+        return None
+    distancias = np.abs(kms[mascara] - np.floor(km))
+    km_encontrado = kms[mascara][distancias == distancias.min()].min()
+    no_km = mascara & (kms == km_encontrado)
+    return float(np.median(latitude[no_km])), float(np.median(longitude[no_km])), float(km_encontrado)
+
+
+@pytest.mark.parametrize('br, km', [(101, 0), (116, 250.7), (381, 799), (40, 1500), (101, 433.2), (999, 10)])
+@pytest.mark.parametrize('com_selecao', [False, True])
+def test_localizar_km_igual_a_varredura(acidentes, selecao, br, km, com_selecao):
+    selecao = selecao if com_selecao else None
+    obtido = localizar_km(construir_indice_km(acidentes), br, km, selecao)
+    esperado = _localizar_varrendo(acidentes, br, km, selecao)
+    assert obtido == (pytest.approx(esperado) if esperado is not None else None)
+
+
+def test_localizar_km_fora_da_selecao(acidentes):
+    selecao = np.flatnonzero(acidentes['Br'].ne(116).to_numpy())
+    assert localizar_km(construir_indice_km(acidentes), 116, 100, selecao) is None
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+from utils.indice_bitmap import (construir_hierarquia, construir_indice, opcoes_hierarquia, posicoes,
+                                 selecionar, valores_presentes)
+
+COLUNAS = ['Ano', 'Mês', 'Região', 'Uf', 'Municipio', 'Tipo Acidente', 'Br']
+
+
+def _mascara(df, selecoes):
+    mascara = np.ones(len(df), dtype=bool)
+    for coluna, valores in selecoes.items():
+        if valores:
+            mascara &= df[coluna].isin(valores).to_numpy()
+    return mascara
+
+
+def _em_ordem(df, coluna, mascara):
+    # Valores presentes na ordem do índice: categorias (calendário para Mês) ou ordenados
+    presentes = set(df.loc[mascara, coluna].dropna())
+    serie = df[coluna]
+    ordem = serie.cat.categories if hasattr(serie, 'cat') else sorted(serie.dropna().unique())
+    return [valor for valor in ordem if valor in presentes]
+
+
+SELECOES = [
+    {'Uf': ['SP']},
+    {'Ano': [2020], 'Mês': ['Janeiro', 'Julho']},
+    {'Região': ['Nordeste'], 'Tipo Acidente': ['Tombamento', 'Atropelamento de Pedestre']},
+    # Municípios raros ficam como listas de posições, não bitmaps
+    {'Municipio': ['Cidade SP30', 'Cidade RS12', 'Centro'], 'Br': [101, 116]},
+    {'Uf': ['RS'], 'Municipio': ['Cidade SP2']},
+    {'Uf': ['XX']},
+    {'Uf': [], 'Mês': []},
+]
+
+
+def test_indice_mistura_bitmaps_e_posicoes(acidentes):
+    por_valor = construir_indice(acidentes, COLUNAS)['colunas']['Municipio']
+    tipos = {bitmap.dtype for bitmap in por_valor.values()}
+    assert tipos == {np.dtype(np.uint8), np.dtype(np.int32)}
+
+
+@pytest.mark.parametrize('selecoes', SELECOES)
+def test_selecionar_igual_a_mascara(acidentes, selecoes):
+    indice = construir_indice(acidentes, COLUNAS)
+    selecao = selecionar(indice, selecoes)
+    if not any(selecoes.values()):
+        assert selecao is None
+        return
+    np.testing.assert_array_equal(posicoes(indice, selecao), np.flatnonzero(_mascara(acidentes, selecoes)))
+
+
+def test_selecionar_combina_com_selecao_anterior(acidentes):
+    indice = construir_indice(acidentes, COLUNAS)
+    anterior = selecionar(indice, {'Ano': [2021]})
+    selecao = selecionar(indice, {'Uf': ['MG', 'BA']}, anterior)
+    esperado = _mascara(acidentes, {'Ano': [2021], 'Uf': ['MG', 'BA']})
+    np.testing.assert_array_equal(posicoes(indice, selecao), np.flatnonzero(esperado))
+
+
+def test_vazios_ficam_fora_do_indice(acidentes):
+    indice = construir_indice(acidentes, COLUNAS)
+    contados = sum(len(posicoes(indice, selecionar(indice, {'Tipo Acidente': [valor]})))
+                   for valor in valores_presentes(indice, 'Tipo Acidente'))
+    assert contados == acidentes['Tipo Acidente'].notna().sum()
+
+
+@pytest.mark.parametrize('selecoes', SELECOES)
+@pytest.mark.parametrize('coluna', ['Mês', 'Uf', 'Municipio', 'Tipo Acidente'])
+def test_valores_presentes_igual_a_mascara(acidentes, selecoes, coluna):
+    indice = construir_indice(acidentes, COLUNAS)
+    selecao = selecionar(indice, selecoes)
+    mascara = _mascara(acidentes, selecoes)
+    assert valores_presentes(indice, coluna, selecao) == _em_ordem(acidentes, coluna, mascara)
+
+
+@pytest.mark.parametrize('selecoes', [
+    {},
+    {'Ano': [2021]},
+    {'Mês': ['Fevereiro']},
+    {'Ano': [2020, 2021], 'Região': ['Sul', 'Nordeste']},
+    {'Uf': ['PE'], 'Mês': ['Março', 'Abril']},
+    {'Região': ['Sul'], 'Uf': ['SP']},
+])
+def test_opcoes_hierarquia_igual_a_mascara(acidentes, selecoes):
+    niveis = ['Ano', 'Mês', 'Região', 'Uf', 'Municipio']
+    hierarquia = construir_hierarquia(acidentes, niveis)
+    for k, coluna in enumerate(niveis):
+        anteriores = {anterior: selecoes.get(anterior, []) for anterior in niveis[:k]}
+        assert opcoes_hierarquia(hierarquia, coluna, selecoes) == \
+            _em_ordem(acidentes, coluna, _mascara(acidentes, anteriores))
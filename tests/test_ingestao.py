@@ -0,0 +1,111 @@
+import json
+import pandas as pd
+import pyarrow as pa
+import pytest
+from benchmarks.dados_sinteticos import Gerador
+from utils.carregamento import (CAMINHO_ARROW, CHAVE_VERSAO_ARROW, abrir_fonte, materializar_arrow,
+                                versao_dataset)
+from utils.cubo import CAMINHO_CUBO, COLUNA_CONTAGEM, MEDIDAS_CUBO, construir_cubo, ler_cubo
+from utils.ingestao import derivar_colunas, ingerir
+from utils.series_temporais import CAMINHO_SERIES, MEDIDAS_SERIES, construir_series
+
+
+@pytest.fixture
+def pasta(tmp_path, monkeypatch):
+    # Os caminhos do app (Dados/...) são relativos ao diretório de trabalho
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'Dados').mkdir()
+    return tmp_path
+
+
+def _csv(caminho, bruto):
+    # Mesmo formato dos dados abertos: ';', latin-1 e a data como texto
+    bruto = bruto.copy()
+    bruto['data_inversa'] = pd.to_datetime(bruto['data_inversa']).dt.strftime('%Y-%m-%d')
+    bruto.to_csv(caminho, sep=';', index=False, encoding='latin-1')
+    return str(caminho)
+
+
+def _comparavel(df, medidas):
+    chaves = [c for c in df.columns if c not in medidas]
+    df = df.copy()
+    df[chaves] = df[chaves].astype(str)
+    df[medidas] = df[medidas].astype('int64')
+    return df.sort_values(chaves).reset_index(drop=True)[chaves + medidas]
+
+
+def _assert_igual_a_reconstruir():
+    # Cubo e séries atualizados por partes iguais aos recalculados sobre o dataset inteiro
+    fonte = abrir_fonte()
+    gravado = ler_cubo(CAMINHO_CUBO)
+    reconstruido = construir_cubo(fonte)
+    assert set(gravado) == set(reconstruido)
+    medidas = [COLUNA_CONTAGEM] + MEDIDAS_CUBO
+    for nome, cuboide in reconstruido.items():
+        pd.testing.assert_frame_equal(_comparavel(gravado[nome], medidas), _comparavel(cuboide, medidas))
+    for nome, serie in construir_series(fonte).items():
+        gravada = pd.read_parquet(f'{CAMINHO_SERIES}/{nome}.parquet')
+        pd.testing.assert_frame_equal(_comparavel(gravada, MEDIDAS_SERIES), _comparavel(serie, MEDIDAS_SERIES))
+
+
+def test_ingerir_igual_a_reconstruir(pasta):
+    gerador = Gerador(7)
+    primeira = gerador.lote(4000)
+    assert ingerir([_csv(pasta / 'primeira.csv', primeira)], linhas_por_lote=1500) == (4000, 0, 0)
+
+    novas = gerador.lote(300)
+    # Mesmos Ids com outro conteúdo (alteradas pela PRF) e linhas repetidas sem mudança
+    outro = Gerador(8)
+    outro.proximo_id = 101
+    alteradas = outro.lote(49)
+    identicas = primeira.iloc[1000:1020]
+    segunda = pd.concat([novas, alteradas, identicas], ignore_index=True)
+    assert ingerir([_csv(pasta / 'segunda.csv', segunda)], linhas_por_lote=100) == (300, 49, 0)
+
+    assert versao_dataset() == 2
+    fonte = abrir_fonte()
+    assert fonte.count_rows() == 4300
+    ids = fonte.to_table(columns=['Id']).column('Id').to_pandas()
+    assert ids.is_unique
+    _assert_igual_a_reconstruir()
+
+
+def test_ingerir_lote_vazio_e_sem_data(pasta):
+    bruto = Gerador(3).lote(500)
+    bruto['id'] = bruto['id'].astype(object)
+    # Primeiro lote do CSV todo sem Id: vazio depois do tratamento
+    bruto.loc[:99, 'id'] = None
+    _csv(pasta / 'bruto.csv', bruto)
+    texto = (pasta / 'bruto.csv').read_text(encoding='latin-1').splitlines()
+    # Uma data inválida em outro lote
+    colunas = texto[200].split(';')
+    colunas[1] = 'sem data'
+    texto[200] = ';'.join(colunas)
+    (pasta / 'bruto.csv').write_text('\n'.join(texto) + '\n', encoding='latin-1')
+
+    assert ingerir([str(pasta / 'bruto.csv')], linhas_por_lote=100) == (399, 0, 1)
+    assert abrir_fonte().count_rows() == 399
+    _assert_igual_a_reconstruir()
+
+
+def test_derivar_colunas_data_dia_primeiro():
+    bruto = Gerador(4).lote(5)
+    bruto['data_inversa'] = pd.to_datetime(bruto['data_inversa']).dt.strftime('%d/%m/%Y')
+    bruto.loc[0, 'data_inversa'] = None
+    df = derivar_colunas(bruto)
+    assert df.attrs['sem_data'] == 1
+    pd.testing.assert_series_equal(df['Data'], pd.to_datetime(bruto['data_inversa'].iloc[1:], dayfirst=True)
+                                   .reset_index(drop=True), check_names=False)
+    assert derivar_colunas(bruto.iloc[:0]).empty
+
+
+def test_ingerir_regrava_arrow_com_a_versao(pasta):
+    ingerir([_csv(pasta / 'primeira.csv', Gerador(5).lote(300))])
+    materializar_arrow()
+    ingerir([_csv(pasta / 'segunda.csv', Gerador(6).lote(50).assign(id=lambda df: df['id'] + 1000))])
+    # O arquivo Arrow traz a própria versão: as leituras mapeadas não dependem de versao.json
+    tabela = pa.ipc.open_file(CAMINHO_ARROW).read_all()
+    assert tabela.num_rows == 350
+    assert int(tabela.schema.metadata[CHAVE_VERSAO_ARROW]) == versao_dataset() == 2
+    with open('Dados/versao.json', encoding='utf-8') as arquivo:
+        assert json.load(arquivo)['linhas_novas'] == 50
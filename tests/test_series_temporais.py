@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pytest
+import utils.series_temporais as series_temporais
+from utils.cubo import COLUNA_CONTAGEM
+from utils.series_temporais import (COLUNA_DATA, COLUNA_DATA_HORA, MEDIDAS_SERIES, SERIE_DIARIA, SERIE_HORARIA,
+                                    _filtrar_series, _montar_series, construir_series, gravar_series,
+                                    serie_do_cubo)
+
+
+def _agrupar(df, chaves):
+    agregacoes = {COLUNA_CONTAGEM: (chaves[0], 'size')}
+    agregacoes.update({medida: (medida, 'sum') for medida in MEDIDAS_SERIES[1:]})
+    return df.groupby(chaves, observed=True, dropna=False).agg(**agregacoes).reset_index()
+
+
+def _linhas(df, selecoes):
+    mascara = np.ones(len(df), dtype=bool)
+    for coluna, valores in selecoes.items():
+        if valores:
+            mascara &= df[coluna].isin(valores).to_numpy()
+    return df[mascara]
+
+
+def _esperado(linhas, coluna, freq):
+    # Agrupamento das linhas por período, com zero nos períodos vazios entre o primeiro e o último
+    tempos = linhas['Data'].dt.floor(freq).rename(coluna)
+    agrupado = _agrupar(linhas.assign(**{coluna: tempos}), [coluna]).set_index(coluna)
+    todos = pd.date_range(agrupado.index.min(), agrupado.index.max(), freq=freq, name=coluna)
+    return agrupado.reindex(todos, fill_value=0).reset_index()
+
+
+@pytest.fixture
+def series(acidentes, tmp_path, monkeypatch):
+    monkeypatch.setattr(series_temporais, 'CAMINHO_SERIES', str(tmp_path))
+    gravar_series(str(tmp_path), construir_series(ds.dataset(pa.Table.from_pandas(acidentes, preserve_index=False))))
+    # Versão única por teste: _montar_series fica em st.cache_resource
+    return _montar_series(str(tmp_path))
+
+
+def test_construir_series_igual_ao_groupby(acidentes):
+    construidas = construir_series(ds.dataset(pa.Table.from_pandas(acidentes, preserve_index=False)))
+    linhas = acidentes.assign(Data=acidentes['Data'].dt.normalize())
+    for nome, chaves in [('diaria', ['Região', 'Uf', 'Municipio', 'Data']),
+                         ('horaria', ['Região', 'Uf', 'Data', 'Hora'])]:
+        obtida = construidas[nome].astype({c: str for c in chaves[:-1]}).sort_values(chaves)
+        esperada = _agrupar(linhas, chaves).astype({c: str for c in chaves[:-1]}).sort_values(chaves)
+        pd.testing.assert_frame_equal(obtida.reset_index(drop=True), esperada.reset_index(drop=True),
+                                      check_dtype=False, check_categorical=False)
+
+
+@pytest.mark.parametrize('selecoes', [
+    {},
+    {'Ano': [2021]},
+    {'Mês': ['Março', 'Dezembro'], 'Região': ['Sudeste']},
+    {'Uf': ['SP', 'PE']},
+    {'Municipio': ['Centro']},
+    {'Uf': ['MG'], 'Municipio': ['Centro', 'Cidade MG3']},
+    {'Ano': [2020], 'Municipio': ['Cidade SP2', 'Cidade RS5']},
+])
+def test_filtrar_series_igual_ao_groupby(series, acidentes, selecoes):
+    filtradas = _filtrar_series(series, selecoes)
+    linhas = _linhas(acidentes, selecoes)
+
+    esperada = _esperado(linhas, COLUNA_DATA, 'D')
+    pd.testing.assert_frame_equal(filtradas[SERIE_DIARIA], esperada, check_dtype=False, check_freq=False)
+    if not selecoes.get('Municipio'):
+        esperada = _esperado(linhas, COLUNA_DATA_HORA, 'h')
+        pd.testing.assert_frame_equal(filtradas[SERIE_HORARIA], esperada, check_dtype=False, check_freq=False)
+
+
+def test_filtro_sem_acidentes(series):
+    filtradas = _filtrar_series(series, {'Uf': ['RS'], 'Municipio': ['Cidade SP2']})
+    assert filtradas[SERIE_DIARIA].empty
+
+
+@pytest.mark.parametrize('freq', ['W', 'MS', 'QS', '6h'])
+def test_serie_do_cubo_reamostrada(series, acidentes, freq):
+    selecoes = {'Uf': ['SP', 'RJ']}
+    obtida = serie_do_cubo(_filtrar_series(series, selecoes), COLUNA_DATA, freq)
+    linhas = _linhas(acidentes, selecoes)
+    esperada = (linhas.set_index('Data')[MEDIDAS_SERIES[1:]].assign(**{COLUNA_CONTAGEM: 1})
+                .resample(freq).sum().rename_axis(COLUNA_DATA).reset_index())
+    # resample alinha os períodos do mesmo jeito; só os vazios das pontas podem diferir
+    esperada = esperada[esperada[COLUNA_CONTAGEM] > 0]
+    obtida = obtida[obtida[COLUNA_CONTAGEM] > 0]
+    pd.testing.assert_frame_equal(obtida[esperada.columns].reset_index(drop=True), esperada.reset_index(drop=True),
+                                  check_dtype=False, check_freq=False)
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils.totalizadores import formatar_milhar
+
+
+def _esperado(valor):
+    return f"{int(valor):,}".replace(',', '.')
+
+
+VALORES = [0, 7, 999, 1_000, 9_999, 10_000, 123_456, 1_000_000, 987_654_321_012, -5, -12_345, 3.9, -1_234.7]
+
+
+@pytest.mark.parametrize('valor', VALORES)
+def test_escalar_igual_ao_format(valor):
+    assert formatar_milhar(valor) == _esperado(valor)
+
+
+def test_vetor_igual_ao_escalar():
+    rng = np.random.default_rng(0)
+    numeros = np.concatenate([rng.integers(-10**12, 10**12, 2_000), rng.integers(0, 20_000, 2_000), VALORES])
+    assert formatar_milhar(numeros) == [_esperado(v) for v in numeros]
+    assert formatar_milhar(pd.Series(VALORES)) == [_esperado(v) for v in VALORES]
+
+
+def test_vazios_viram_zero():
+    assert formatar_milhar(np.nan) == 0
+    assert formatar_milhar([1_500, None, np.nan]) == ['1.500', 0, 0]
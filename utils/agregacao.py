@@ -0,0 +1,275 @@
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from utils.cubo import totais_do_cubo, COLUNA_CONTAGEM, MEDIDAS_CUBO
+from utils.totalizadores import formatar_milhar
+from utils.visao import Visao, projetar
+from utils.filtros import cache_filtros
+from utils.medicao import medir
+from utils.series_temporais import serie_do_cubo, sub_diaria, COLUNA_DATA, COLUNA_HORA
+
+
+
+# ----------------------------
+# Motor de agregação dos gráficos (sem Streamlit)
+# ----------------------------
+# Cada gráfico pede (dimensão, medida, top_n). Uma dimensão é agrupada uma única vez,
+# já com a contagem e a soma de todas as medidas; pedidos com a mesma dimensão
+# (outra medida, outro top_n) reaproveitam o agrupamento. Com uma Visao o agrupamento
+# fica guardado nela e vale para todos os gráficos do rerun; com a assinatura da seleção
+# ele também fica no cache dos filtros, junto com a ordem decrescente de cada medida,
+# e vale para os próximos reruns e as outras sessões (mover um slider de top N só corta a ordem).
+
+# Pedido de um gráfico:
+# - dimensao: coluna do eixo/categoria
+# - medida: coluna somada (Mortos, Feridos, Veiculos) ou None para contar acidentes
+# - top_n: mantém só as N categorias de maior total
+# - freq: para colunas de data, frequência do agrupamento ('MS', 'D', 'h'...)
+# - outros: com top_n, soma as demais categorias em uma linha ROTULO_OUTROS
+# - percentual_total: Percentual sobre o total de todas as categorias, calculado antes do top_n
+#   (gráfico de linha); sem ele, sobre as linhas devolvidas
+Pedido = namedtuple('Pedido', ['dimensao', 'medida', 'top_n', 'freq', 'outros', 'percentual_total'],
+                    defaults=(None, None, None, False, False))
+
+ROTULO_OUTROS = 'Outros'
+
+
+def agrupar(df, dimensao, cubo=None, freq=None, memo=None):
+    """
+    Contagem de acidentes e soma das medidas por valor da dimensão, em uma passada.
+    - df: DataFrame ou Visao (utils/visao.py)
+    - cubo: cubo de agregados filtrado; responde sem passar pelas linhas quando tem a dimensão
+      (Data por período: séries temporais do cubo, utils/series_temporais.py)
+    - freq: agrupa uma coluna de data por período e preenche os períodos vazios com zero
+    - memo: dicionário {(dimensao, freq): (agrupamento, ordens)} compartilhado entre chamadas
+    Retorna DataFrame com [dimensao, 'Acidentes', medidas...] (compartilhado: não alterar).
+    """
+    return _agrupamento(df, dimensao, cubo, freq, memo)[0]
+
+
+def _agrupamento(df, dimensao, cubo=None, freq=None, memo=None):
+    """
+    (agrupamento, ordens) da dimensão. Com a assinatura da Visao o par vem do cache dos filtros
+    e ordens = {coluna: posições em ordem decrescente}; sem ela (ou com freq), ordens = None.
+    """
+    if memo is None and isinstance(df, Visao):
+        memo = df.agrupamentos
+    chave = (dimensao, freq)
+    if memo is not None and chave in memo:
+        return memo[chave]
+
+    assinatura = df.assinatura if isinstance(df, Visao) else None
+    if assinatura is None:
+        with medir('agrupamento', dimensao=dimensao):
+            resultado = (_agrupar(df, dimensao, cubo, freq), None)
+    else:
+        def calcular():
+            with medir('agrupamento', dimensao=dimensao):
+                grupo = _agrupar(df, dimensao, cubo, freq)
+                # A ordem fica no mesmo item do cache que o agrupamento: as posições sempre batem
+                ordens = None if freq else {coluna: ordenar(grupo[coluna].to_numpy())
+                                            for coluna in grupo.columns if coluna != dimensao}
+            return grupo, ordens
+        resultado = cache_filtros().obter(('agrupamento', assinatura, dimensao, freq), calcular)
+
+    if memo is not None:
+        memo[chave] = resultado
+    return resultado
+
+
+def _agrupar(df, dimensao, cubo, freq):
+    medidas = [medida for medida in MEDIDAS_CUBO if medida in df.columns]
+    grupo = None
+    if freq is None:
+        grupo = totais_do_cubo(cubo, [dimensao], [COLUNA_CONTAGEM] + medidas)
+    else:
+        grupo = serie_do_cubo(cubo, dimensao, freq)
+
+    if grupo is None:
+        # Data só guarda o dia: em frequências de hora a coluna Hora completa o horário
+        com_hora = freq is not None and dimensao == COLUNA_DATA and COLUNA_HORA in df.columns and sub_diaria(freq)
+        linhas = projetar(df, [dimensao] + medidas + ([COLUNA_HORA] if com_hora else []))
+        if com_hora:
+            linhas[dimensao] = linhas[dimensao] + pd.to_timedelta(linhas.pop(COLUNA_HORA), unit='h')
+        agrupado = linhas.groupby(pd.Grouper(key=dimensao, freq=freq) if freq else dimensao, observed=True)
+        grupo = agrupado[medidas].sum()
+        grupo.insert(0, COLUNA_CONTAGEM, agrupado.size())
+        if freq and not grupo.empty:
+            # Preenche todos os períodos do eixo
+            periodos = pd.date_range(start=grupo.index.min(), end=grupo.index.max(), freq=freq)
+            grupo = grupo.reindex(periodos, fill_value=0).rename_axis(dimensao)
+        grupo = grupo.reset_index()
+    return grupo
+
+
+# ----------------------------
+# Ranking (top N)
+# ----------------------------
+def ordenar(valores):
+    """Posições em ordem decrescente de valor (empates na ordem original)."""
+    return np.argsort(-np.asarray(valores, dtype='float64'), kind='stable')
+
+
+def maiores(valores, n=None, ordem=None):
+    """
+    Posições dos n maiores valores, em ordem decrescente (n=None: todos), como ordenar(valores)[:n].
+    - ordem: ordenação completa já calculada (ver _agrupamento); sem ela, seleção parcial:
+      só os n escolhidos são ordenados
+    """
+    if ordem is not None:
+        return ordem[:n]
+    valores = np.asarray(valores, dtype='float64')
+    if n is None or n >= len(valores):
+        return ordenar(valores)
+    if n <= 0:
+        return np.empty(0, dtype=np.intp)
+    # O n-ésimo maior valor separa os escolhidos; dos empatados com ele, entram os primeiros
+    limiar = np.partition(valores, len(valores) - n)[len(valores) - n]
+    acima = np.flatnonzero(valores > limiar)
+    empatados = np.flatnonzero(valores == limiar)[:n - len(acima)]
+    escolhidos = np.sort(np.concatenate([acima, empatados]))
+    return escolhidos[ordenar(valores[escolhidos])]
+
+
+def totalizar(grupo, pedido, ordens=None):
+    """
+    Recorta o agrupamento para um pedido.
+    - ordens: {coluna: ordem decrescente} do agrupamento, quando já calculadas
+    Retorna DataFrame com [dimensao, 'Total', 'Percentual', 'Total_str']:
+    - ordem decrescente de Total (séries de data ficam na ordem das datas)
+    - com pedido.outros, uma última linha ROTULO_OUTROS soma as categorias fora do top_n
+      (a dimensão vira texto)
+    - Percentual sobre as linhas devolvidas (depois do top_n, com Outros) ou, com pedido.percentual_total,
+      sobre todas as categorias do agrupamento
+    """
+    coluna = pedido.medida or COLUNA_CONTAGEM
+    valores = grupo[coluna].to_numpy()
+    if pedido.freq is None:
+        posicoes = maiores(valores, pedido.top_n, (ordens or {}).get(coluna))
+    elif pedido.top_n is not None:
+        posicoes = np.sort(maiores(valores, pedido.top_n))
+    else:
+        posicoes = slice(None)
+    total = grupo[[pedido.dimensao, coluna]].iloc[posicoes].rename(columns={coluna: 'Total'})
+    total = total.reset_index(drop=True)
+
+    if pedido.outros and pedido.freq is None and len(total) < len(grupo):
+        restante = valores.sum() - total['Total'].sum()
+        total[pedido.dimensao] = total[pedido.dimensao].astype(str)
+        outros = pd.DataFrame({pedido.dimensao: [ROTULO_OUTROS], 'Total': [restante]})
+        total = pd.concat([total, outros.astype(total.dtypes.to_dict())], ignore_index=True)
+
+    soma = valores.sum() if pedido.percentual_total else total['Total'].sum()
+    total['Percentual'] = (total['Total'] / soma * 100).round(1) if soma else 0
+    total['Total_str'] = formatar_milhar(total['Total'])
+    return total
+
+
+def agregar(df, pedidos, cubo=None):
+    """
+    Resolve uma lista de pedidos (Pedido ou tuplas na mesma ordem dos campos).
+    Cada dimensão é agrupada uma vez e compartilhada entre os pedidos.
+    Retorna {Pedido: DataFrame de totalizar}.
+    """
+    memo = df.agrupamentos if isinstance(df, Visao) else {}
+    resultados = {}
+    for pedido in pedidos:
+        pedido = Pedido(*pedido)
+        grupo, ordens = _agrupamento(df, pedido.dimensao, cubo, pedido.freq, memo)
+        resultados[pedido] = totalizar(grupo, pedido, ordens)
+    return resultados
+
+
+# ----------------------------
+# Tabela de contingência entre duas dimensões
+# ----------------------------
+# As duas colunas viram códigos inteiros (os códigos do Categorical ou um factorize ordenado) e
+# cada linha cai na célula linha * n_colunas + coluna: um np.bincount por medida preenche a
+# matriz inteira em uma passada, sem groupby. O tamanho da matriz é o produto das cardinalidades
+# (Municipio x Hora: alguns milhares x 24), não o número de acidentes.
+
+# Resultado de cruzar:
+# - linha, coluna: nomes das dimensões
+# - rotulos_linha, rotulos_coluna: valores de cada linha/coluna da matriz
+# - matrizes: {'Acidentes' e cada medida: ndarray [len(rotulos_linha), len(rotulos_coluna)]}
+Cruzamento = namedtuple('Cruzamento', ['linha', 'coluna', 'rotulos_linha', 'rotulos_coluna', 'matrizes'])
+
+
+def _codigos(serie):
+    """Códigos inteiros (-1 = vazio) e rótulos de cada código, na ordem da coluna."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy(), serie.cat.categories
+    return pd.factorize(serie, sort=True)
+
+
+def _contingencia(df, linha, coluna, pesos):
+    """
+    Matrizes densas de linha x coluna.
+    - pesos: {nome da matriz: coluna somada, ou None para contar linhas}
+    """
+    codigos_linha, rotulos_linha = _codigos(df[linha])
+    codigos_coluna, rotulos_coluna = _codigos(df[coluna])
+    n_linhas, n_colunas = len(rotulos_linha), len(rotulos_coluna)
+
+    validos = (codigos_linha >= 0) & (codigos_coluna >= 0)
+    celulas = codigos_linha[validos].astype(np.int64) * n_colunas + codigos_coluna[validos]
+
+    matrizes = {}
+    for nome, peso in pesos.items():
+        valores = None if peso is None else df[peso].to_numpy(dtype='float64', na_value=0)[validos]
+        contagem = np.bincount(celulas, weights=valores, minlength=n_linhas * n_colunas)
+        matrizes[nome] = contagem.astype(np.int64).reshape(n_linhas, n_colunas)
+
+    # Só valores que ocorreram (como observed=True)
+    presentes = matrizes[COLUNA_CONTAGEM]
+    linhas_presentes, colunas_presentes = presentes.any(axis=1), presentes.any(axis=0)
+    matrizes = {nome: matriz[linhas_presentes][:, colunas_presentes] for nome, matriz in matrizes.items()}
+    return Cruzamento(linha, coluna, pd.Index(rotulos_linha)[linhas_presentes],
+                      pd.Index(rotulos_coluna)[colunas_presentes], matrizes)
+
+
+def cruzar(df, linha, coluna, cubo=None, memo=None):
+    """
+    Contagem de acidentes e soma das medidas por par (linha, coluna), em matrizes densas.
+    - df: DataFrame ou Visao
+    - cubo: cubo de agregados filtrado; responde sem passar pelas linhas quando um cuboide tem as duas
+    - memo: como em agrupar (com uma Visao, o cruzamento fica guardado nela)
+    Retorna Cruzamento.
+    """
+    if memo is None and isinstance(df, Visao):
+        memo = df.agrupamentos
+    chave = ('cruzamento', linha, coluna)
+    if memo is not None and chave in memo:
+        return memo[chave]
+
+    medidas = [medida for medida in MEDIDAS_CUBO if medida in df.columns]
+    with medir('agrupamento', dimensao=f'{linha} x {coluna}'):
+        grupo = totais_do_cubo(cubo, [linha, coluna], [COLUNA_CONTAGEM] + medidas)
+        if grupo is not None:
+            # Cada linha do cuboide já traz a contagem: ela vira peso
+            cruzamento = _contingencia(grupo, linha, coluna, {nome: nome for nome in [COLUNA_CONTAGEM] + medidas})
+        else:
+            linhas = projetar(df, [linha, coluna] + medidas)
+            cruzamento = _contingencia(linhas, linha, coluna, {COLUNA_CONTAGEM: None, **{m: m for m in medidas}})
+
+    if memo is not None:
+        memo[chave] = cruzamento
+    return cruzamento
+
+
+def cruzamento_longo(cruzamento):
+    """
+    Cruzamento em formato longo: [linha, coluna, 'Acidentes', medidas...], uma linha por par
+    que ocorreu, na ordem das dimensões (medidas que são a própria linha/coluna ficam de fora).
+    """
+    contagem = cruzamento.matrizes[COLUNA_CONTAGEM]
+    i, j = np.nonzero(contagem)
+    longo = pd.DataFrame({
+        cruzamento.linha: cruzamento.rotulos_linha[i],
+        cruzamento.coluna: cruzamento.rotulos_coluna[j],
+    })
+    for nome, matriz in cruzamento.matrizes.items():
+        # Medida usada como dimensão (ex.: grupo 'Mortos' do radar) fica só como dimensão
+        if nome not in longo.columns:
+            longo[nome] = matriz[i, j]
+    return longo
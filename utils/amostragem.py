@@ -0,0 +1,49 @@
+import numpy as np
+
+
+
+# ----------------------------
+# Redução de séries longas para os gráficos de linha
+# ----------------------------
+# Largest-Triangle-Three-Buckets (LTTB): divide a série em baldes e, de cada balde, fica o ponto
+# que forma o maior triângulo com o ponto escolhido no balde anterior e a média do próximo.
+# Mantém o formato da curva e os picos com uma fração dos pontos; o primeiro e o último
+# pontos são sempre mantidos.
+
+
+def lttb(x, y, limite):
+    """
+    Posições dos pontos mantidos (ordenadas), no máximo `limite`.
+    - x: valores do eixo, crescentes (números ou datas)
+    - y: valores da série, mesmo tamanho de x
+    Séries com até `limite` pontos voltam inteiras.
+    """
+    n = len(y)
+    if limite >= n or limite < 3:
+        return np.arange(n)
+
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype('datetime64[ns]').astype(np.int64)
+    x = x.astype('float64')
+    y = np.nan_to_num(np.asarray(y, dtype='float64'))
+
+    # Baldes entre o primeiro e o último ponto
+    bordas = np.linspace(1, n - 1, limite - 1).astype(np.int64)
+    escolhidos = np.empty(limite, dtype=np.int64)
+    escolhidos[0], escolhidos[-1] = 0, n - 1
+
+    anterior = 0
+    for i in range(limite - 2):
+        inicio, fim = bordas[i], bordas[i + 1]
+        # Média do balde seguinte (o último ponto, no último balde)
+        proximo_fim = bordas[i + 2] if i + 2 < len(bordas) else n
+        media_x = x[fim:proximo_fim].mean()
+        media_y = y[fim:proximo_fim].mean()
+
+        # Área (dobrada) do triângulo anterior - candidato - média do próximo balde
+        areas = np.abs((x[anterior] - media_x) * (y[inicio:fim] - y[anterior])
+                       - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior]))
+        anterior = inicio + int(np.argmax(areas))
+        escolhidos[i + 1] = anterior
+    return escolhidos
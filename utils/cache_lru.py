@@ -0,0 +1,97 @@
+import sys
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+
+
+# ----------------------------
+# Cache LRU limitado por entradas e por bytes
+# ----------------------------
+# Uma instância fica em st.cache_resource e é compartilhada por todas as sessões do servidor,
+# por isso o acesso é protegido por lock.
+
+
+def tamanho_em_bytes(valor):
+    """
+    Estimativa do espaço ocupado por um valor guardado no cache.
+    """
+    if valor is None:
+        return 0
+    if isinstance(valor, np.ndarray):
+        return valor.nbytes
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(deep=True))
+    if isinstance(valor, (bytes, str)):
+        return len(valor)
+    if isinstance(valor, (tuple, list)):
+        return sum(tamanho_em_bytes(v) for v in valor)
+    if isinstance(valor, dict):
+        return sum(tamanho_em_bytes(v) for v in valor.values())
+    return sys.getsizeof(valor)
+
+
+class CacheLRU:
+    """
+    Guarda resultados por chave, descartando os menos usados recentemente.
+    - max_entradas: número máximo de chaves
+    - max_bytes: soma máxima de tamanho_em_bytes dos valores
+    Contadores de acertos e falhas em estatisticas().
+    """
+
+    def __init__(self, max_entradas, max_bytes):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._itens = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave, calcular):
+        """
+        Valor da chave; numa falha chama calcular() e guarda o resultado.
+        O cálculo é feito fora do lock (duas sessões podem calcular a mesma chave ao mesmo tempo).
+        """
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return self._itens[chave][0]
+            self.falhas += 1
+
+        valor = calcular()
+        self.guardar(chave, valor)
+        return valor
+
+    def guardar(self, chave, valor):
+        tamanho = tamanho_em_bytes(valor)
+        if tamanho > self.max_bytes:
+            return  # maior que o cache inteiro: não guarda
+        with self._lock:
+            if chave in self._itens:
+                self._bytes -= self._itens.pop(chave)[1]
+            self._itens[chave] = (valor, tamanho)
+            self._bytes += tamanho
+            while len(self._itens) > self.max_entradas or self._bytes > self.max_bytes:
+                _, (_, tamanho_antigo) = self._itens.popitem(last=False)
+                self._bytes -= tamanho_antigo
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self._bytes = 0
+
+    def estatisticas(self):
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                'Entradas': len(self._itens),
+                'Bytes': self._bytes,
+                'Acertos': self.acertos,
+                'Falhas': self.falhas,
+                'Taxa de Acerto': round(self.acertos / consultas * 100, 1) if consultas else 0.0,
+            }
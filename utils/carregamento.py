@@ -0,0 +1,405 @@
+import io
+import os
+import json
+import streamlit as st
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from utils.esquema import compactar_tipos
+from utils.indice_bitmap import construir_indice, construir_hierarquia
+from utils.espacial import construir_piramide, construir_indice_espacial, construir_indice_km
+
+
+
+# ----------------------------
+# Caminho do arquivo
+# ----------------------------
+CAMINHO_ARQUIVO = "Dados/PRF2023a2025.parquet"
+
+# Mesmo conteúdo, particionado por Ano e Uf (Dados/PRF_particionado/Ano=2024/Uf=PE/...)
+CAMINHO_DATASET = "Dados/PRF_particionado"
+COLUNAS_PARTICAO = ['Ano', 'Uf']
+
+# Versão do dataset, incrementada a cada ingestão (utils/ingestao.py); os caches de leitura usam essa versão
+# (ou a gravada no arquivo Arrow, com o memory-map: ver versao_leitura)
+CAMINHO_VERSAO = "Dados/versao.json"
+
+# Cópia Arrow IPC (Feather v2, sem compressão) para leitura por memory-map.
+# Com PRF_ARROW_MMAP=1 todos os processos do Streamlit no mesmo servidor mapeiam o mesmo arquivo,
+# e o cache de páginas do sistema guarda os dados uma única vez
+CAMINHO_ARROW = "Dados/PRF.arrow"
+USAR_ARROW_MMAP = os.environ.get('PRF_ARROW_MMAP') == '1'
+# Metadado do esquema do arquivo Arrow com o relatório da compactação feita ao gravá-lo
+CHAVE_RELATORIO_ARROW = b'prf_relatorio_memoria'
+# Metadado com a versão do dataset que o arquivo Arrow contém (ver versao_leitura)
+CHAVE_VERSAO_ARROW = b'prf_versao'
+
+# Anos lidos quando nenhum Ano está escolhido na barra lateral: os mais recentes (0 = todos).
+# Escolher anos fora dessa janela amplia a leitura só com as partições deles (ver anos_leitura)
+ANOS_PADRAO = int(os.environ.get('PRF_ANOS_PADRAO', '3'))
+
+
+# ----------------------------
+# Colunas usadas por cada parte do app
+# ----------------------------
+COLUNAS_CABECALHO = ['Data']
+COLUNAS_FILTROS = ['Ano', 'Mês', 'Região', 'Uf', 'Municipio']
+COLUNAS_TOTALIZADORES = ['Mortos', 'Feridos', 'Veiculos']
+
+# Filtros resolvidos pelo índice bitmap: barra lateral + filtros extras da Distribuição Geográfica
+COLUNAS_INDICE = COLUNAS_FILTROS + ['Classificacao Acidente', 'Fase Dia', 'Condicao Metereologica']
+
+# Colunas que os grafico_* de cada aba do Painéis podem receber (eixos, grupos e filtros extras)
+COLUNAS_ABAS = {
+    'Linha do Tempo': ['Data', 'Ano', 'Mês', 'Dia', 'Dia Semana', 'Hora'],
+    'Analise relacional': ['Grupo Via', 'Condicao Climatica Grupo', 'Tipo Acidente', 'Causa Grupo', 'Tipo Pista',
+                           'Dia Semana', 'Partes Dia', 'Ano', 'Mês', 'Dia', 'Hora'],
+    'Distribuição Geográfica': ['Classificacao Acidente', 'Fase Dia', 'Condicao Metereologica',
+                                'Região', 'Uf', 'Municipio', 'Br'],
+    'Características dos Acidentes': ['Tipo Pista', 'Condicao Climatica Grupo', 'Fase Dia', 'Partes Dia'],
+    'Fatores de Ocorrências': ['Condicao Metereologica', 'Fase Dia', 'Tipo Acidente', 'Classificacao Acidente',
+                               'Grupo Via', 'Região', 'Uf', 'Partes Dia', 'Causa Grupo', 'Condicao Climatica Grupo',
+                               'Ano', 'Mês', 'Dia Semana'],
+    'Mapas': ['Latitude', 'Longitude', 'Br', 'Km', 'Região', 'Uf', 'Municipio'],
+}
+
+
+# Relatório de memória (bytes por coluna antes/depois da compactação) de cada leitura
+RELATORIOS_MEMORIA = {}
+
+
+def colunas_pagina(pagina):
+    """
+    Retorna as colunas que a página precisa, já incluindo filtros e totalizadores.
+    - pagina: "Sobre", "Painéis" ou "Dataframe"
+    - None significa todas as colunas do arquivo (página Dataframe)
+    """
+    if pagina == "Dataframe":
+        return None
+
+    colunas = COLUNAS_FILTROS + COLUNAS_TOTALIZADORES
+    if pagina == "Painéis":
+        for colunas_aba in COLUNAS_ABAS.values():
+            colunas = colunas + colunas_aba
+    return colunas
+
+
+# ----------------------------
+# Dataset particionado
+# ----------------------------
+def versao_dataset():
+    try:
+        with open(CAMINHO_VERSAO, encoding='utf-8') as arquivo:
+            return json.load(arquivo)['versao']
+    except (FileNotFoundError, ValueError, KeyError):
+        return 0
+
+
+def versao_leitura():
+    """
+    Versão do conteúdo que as leituras do app veem, usada nas chaves dos caches de leitura.
+    Com o memory-map é a versão gravada no próprio arquivo Arrow (trocado de uma vez por materializar_arrow):
+    entre a troca do arquivo e a atualização de versao.json uma leitura não fica em cache com a versão anterior.
+    Arquivo sem a versão (gravado antes dela) usa a data de modificação.
+    """
+    if usando_arrow_mmap():
+        modificado_em = os.path.getmtime(CAMINHO_ARROW)
+        versao = (tabela_mapeada(modificado_em).schema.metadata or {}).get(CHAVE_VERSAO_ARROW)
+        return int(versao) if versao is not None else modificado_em
+    return versao_dataset()
+
+
+def usando_arrow_mmap():
+    return USAR_ARROW_MMAP and os.path.exists(CAMINHO_ARROW)
+
+
+def abrir_dataset():
+    """
+    Abre a fonte dos dados, na ordem de preferência:
+    - Arquivo Arrow mapeado em memória (se PRF_ARROW_MMAP=1 e o arquivo existir)
+    - Dataset particionado, quando existe
+    - Arquivo Parquet único
+    Em todos os casos a leitura aceita projeção de colunas (só as colunas pedidas saem do disco).
+    """
+    if usando_arrow_mmap():
+        return ds.dataset(tabela_mapeada(os.path.getmtime(CAMINHO_ARROW)))
+    return abrir_fonte()
+
+
+def abrir_fonte():
+    """
+    Dataset particionado, quando existe, ou o Parquet único; nunca o arquivo Arrow.
+    É a origem dos arquivos derivados (Arrow, cubo, séries): logo depois de uma ingestão
+    o arquivo Arrow ainda tem os dados anteriores.
+    """
+    if os.path.isdir(CAMINHO_DATASET):
+        return ds.dataset(CAMINHO_DATASET, format='parquet', partitioning='hive')
+    return ds.dataset(CAMINHO_ARQUIVO, format='parquet')
+
+
+def anos_disponiveis():
+    """
+    Todos os anos do dataset, em ordem (opções do filtro de Ano, inclusive dos anos não lidos).
+    No dataset particionado saem dos nomes das pastas (Ano=2024), sem ler arquivos.
+    """
+    return _anos(versao_leitura())
+
+
+@st.cache_data
+def _anos(versao):
+    if not usando_arrow_mmap() and os.path.isdir(CAMINHO_DATASET):
+        return sorted(int(nome.split('=', 1)[1]) for nome in os.listdir(CAMINHO_DATASET) if nome.startswith('Ano='))
+    try:
+        return sorted(int(ano) for ano in abrir_dataset().to_table(columns=['Ano']).column('Ano').unique().to_pylist()
+                      if ano is not None)
+    except Exception:
+        return []
+
+
+def anos_leitura(selecionados=None):
+    """
+    Anos que a leitura traz do disco para a escolha de Ano da barra lateral.
+    - Sem ano escolhido: os ANOS_PADRAO mais recentes
+    - Com anos escolhidos: a mesma janela mais os anos escolhidos fora dela
+      (escolhas dentro da janela reaproveitam o mesmo DataFrame; o Ano vira seleção sobre ele)
+    Retorna a tupla de anos, ou None quando são todos (leitura sem filtro).
+    """
+    disponiveis = anos_disponiveis()
+    janela = disponiveis[-ANOS_PADRAO:] if ANOS_PADRAO > 0 else disponiveis
+    anos = sorted(set(janela) | {int(ano) for ano in selecionados or []})
+    if not disponiveis or set(disponiveis) <= set(anos):
+        return None
+    return tuple(anos)
+
+
+def expressao_anos(anos):
+    """Filtro do pyarrow.dataset para os anos pedidos (None = sem filtro); no dataset particionado
+    as partições dos outros anos nem são abertas."""
+    return None if anos is None else ds.field('Ano').isin(list(anos))
+
+
+def particionar_arquivo(origem=CAMINHO_ARQUIVO, destino=CAMINHO_DATASET):
+    """
+    Regrava o Parquet único como dataset hive particionado por Ano e Uf.
+    A escrita é feita em streaming, sem carregar o arquivo inteiro na memória.
+    """
+    fonte = ds.dataset(origem, format='parquet')
+    esquema_particao = pa.schema([fonte.schema.field(c) for c in COLUNAS_PARTICAO])
+    ds.write_dataset(
+        fonte,
+        destino,
+        format='parquet',
+        partitioning=ds.partitioning(esquema_particao, flavor='hive'),
+        existing_data_behavior='delete_matching'
+    )
+
+
+# ----------------------------
+# Arquivo Arrow compartilhado (memory-map)
+# ----------------------------
+def materializar_arrow(destino=CAMINHO_ARROW, versao=None):
+    """
+    Grava o conjunto completo, já no esquema compacto, como Arrow IPC sem compressão.
+    O arquivo é escrito ao lado e trocado no final, para que processos que já
+    mapearam a versão anterior não leiam um arquivo pela metade.
+    - versao: versão do dataset gravada junto com os dados (padrão: a de versao.json)
+    """
+    df, relatorio = compactar_tipos(abrir_fonte().to_table().to_pandas())
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    # O relatório vai junto: a leitura mapeada não passa pela compactação (ver _relatorio_mapeado)
+    relatorio = {'linhas': len(df), 'colunas': json.loads(relatorio.to_json(orient='split'))}
+    tabela = tabela.replace_schema_metadata({**(tabela.schema.metadata or {}),
+                                             CHAVE_RELATORIO_ARROW: json.dumps(relatorio).encode(),
+                                             CHAVE_VERSAO_ARROW: str(versao_dataset() if versao is None
+                                                                     else versao).encode()})
+
+    temporario = destino + '.tmp'
+    with pa.OSFile(temporario, 'wb') as arquivo:
+        with pa.ipc.new_file(arquivo, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+    os.replace(temporario, destino)
+
+
+@st.cache_resource(max_entries=1)
+def tabela_mapeada(modificado_em):
+    """
+    Tabela Arrow apontando direto para o arquivo mapeado (sem cópia).
+    - modificado_em: data de modificação do arquivo; um arquivo novo gera um novo mapeamento
+      e o anterior sai do cache (as leituras já feitas dele saem pelo max_entries de cada cache)
+    - Pode ser usada diretamente com pyarrow.compute
+    """
+    return pa.ipc.open_file(pa.memory_map(CAMINHO_ARROW, 'r')).read_all()
+
+
+# ----------------------------
+# Função para carregar arquivo Parquet
+# ----------------------------
+def carregar_arquivo_parquet(colunas=None, anos=None):
+    """
+    Lê do Parquet apenas as colunas pedidas, nas partições dos anos pedidos.
+    - colunas: lista de colunas ou None para todas
+    - anos: anos lidos (ver anos_leitura) ou None para todos; o filtro vai para a leitura do dataset
+    - Cada combinação de colunas e anos fica em cache separado
+    - Os tipos já vêm compactados (ver utils/esquema.py)
+    - O DataFrame do cache é compartilhado entre sessões: não alterar (ver utils/visao.py).
+      Os demais filtros da barra lateral viram seleções sobre ele (utils/visao.py)
+    """
+    colunas, anos = _normalizar(colunas, anos)
+    if usando_arrow_mmap():
+        return _ler_colunas_mapeadas(colunas, anos, versao_leitura())
+    return _ler_colunas(colunas, anos, versao_leitura())
+
+
+def _normalizar(colunas, anos=None):
+    # Normaliza colunas e anos para que o mesmo pedido caia sempre na mesma entrada do cache
+    if colunas is not None:
+        colunas = tuple(sorted(set(colunas)))
+    if anos is not None:
+        anos = tuple(sorted({int(ano) for ano in anos}))
+    return colunas, anos
+
+
+def carregar_indice_bitmap(colunas=None, anos=None):
+    """
+    Índice bitmap (utils/indice_bitmap.py) das COLUNAS_INDICE do mesmo DataFrame que
+    carregar_arquivo_parquet(colunas, anos) devolve; as posições valem para ele.
+    Montado uma vez por leitura e compartilhado entre sessões.
+    """
+    return _montar_indice(*_normalizar(colunas, anos), versao_leitura(), usando_arrow_mmap())
+
+
+@st.cache_resource(max_entries=16)
+def _montar_indice(colunas, anos, versao, arrow_mmap):
+    df = carregar_arquivo_parquet(colunas, anos)
+    indice = construir_indice(df, COLUNAS_INDICE)
+    # Opções da cascata da barra lateral por prefixo (Ano, Mês, Região, Uf)
+    indice['hierarquia'] = construir_hierarquia(df, COLUNAS_FILTROS)
+    # Identifica o índice nas chaves do cache de filtros (utils/filtros.py)
+    indice['chave'] = (colunas, anos, versao, arrow_mmap)
+    # Anos da leitura: as estruturas montadas sobre o mesmo DataFrame (pirâmide, índice espacial) usam os mesmos
+    indice['anos'] = anos
+    return indice
+
+
+def carregar_piramide(colunas=None, anos=None):
+    """
+    Células da grade lat/lon (utils/espacial.py) de cada linha do DataFrame que
+    carregar_arquivo_parquet(colunas, anos) devolve. Montada uma vez por leitura.
+    """
+    return _montar_piramide(*_normalizar(colunas, anos), versao_leitura(), usando_arrow_mmap())
+
+
+@st.cache_resource(max_entries=16)
+def _montar_piramide(colunas, anos, versao, arrow_mmap):
+    return construir_piramide(carregar_arquivo_parquet(colunas, anos))
+
+
+def carregar_indice_espacial(colunas=None, anos=None):
+    """
+    Índice espacial (utils/espacial.py) das coordenadas do DataFrame que
+    carregar_arquivo_parquet(colunas, anos) devolve, para consultas por retângulo,
+    raio e vizinhos. Reaproveita as células da pirâmide; montado uma vez por leitura.
+    """
+    return _montar_indice_espacial(*_normalizar(colunas, anos), versao_leitura(), usando_arrow_mmap())
+
+
+@st.cache_resource(max_entries=16)
+def _montar_indice_espacial(colunas, anos, versao, arrow_mmap):
+    df = carregar_arquivo_parquet(colunas, anos)
+    return construir_indice_espacial(df, _montar_piramide(colunas, anos, versao, arrow_mmap))
+
+
+def carregar_indice_km(colunas=None, anos=None):
+    """
+    Ocorrências por (Br, Km) do DataFrame que carregar_arquivo_parquet(colunas, anos) devolve,
+    para localizar um Km de uma BR sem varrer a base (utils/espacial.py: localizar_km).
+    Montado uma vez por leitura, como o índice espacial.
+    """
+    return _montar_indice_km(*_normalizar(colunas, anos), versao_leitura(), usando_arrow_mmap())
+
+
+@st.cache_resource(max_entries=16)
+def _montar_indice_km(colunas, anos, versao, arrow_mmap):
+    return construir_indice_km(carregar_arquivo_parquet(colunas, anos))
+
+
+def _ler_tabela(colunas, anos):
+    dataset = abrir_dataset()
+    if colunas is not None:
+        # Ignora colunas que não existem no arquivo em vez de quebrar a leitura
+        colunas = [c for c in colunas if c in dataset.schema.names]
+    return dataset.to_table(columns=colunas, filter=expressao_anos(anos))
+
+
+@st.cache_resource(max_entries=16)
+def _ler_colunas(colunas, anos, versao):
+    # cache_resource devolve o mesmo objeto a cada acesso (cache_data desserializaria uma cópia por rerun)
+    try:
+        df, RELATORIOS_MEMORIA[colunas] = compactar_tipos(_ler_tabela(colunas, anos).to_pandas())
+        return df
+    except Exception as e:
+        st.error(f"Erro ao carregar arquivo: {e}")
+        return pd.DataFrame()  # retorna dataframe vazio para evitar crash
+
+
+@st.cache_resource(max_entries=16)
+def _ler_colunas_mapeadas(colunas, anos, versao):
+    # cache_resource não serializa o resultado a cada acesso (o DataFrame é compartilhado, não alterar).
+    # O arquivo Arrow já está no esquema compacto e split_blocks mantém as colunas
+    # numéricas como visões do memory-map, sem cópia (com filtro de anos, só as linhas filtradas são copiadas)
+    try:
+        tabela = _ler_tabela(colunas, anos)
+        df = tabela.to_pandas(split_blocks=True)
+        RELATORIOS_MEMORIA[colunas] = _relatorio_mapeado(df, tabela.schema.metadata)
+        return df
+    except Exception as e:
+        st.error(f"Erro ao carregar arquivo: {e}")
+        return pd.DataFrame()  # retorna dataframe vazio para evitar crash
+
+
+def _relatorio_mapeado(df, metadados):
+    """
+    Relatório de memória de uma leitura do arquivo Arrow, no formato de compactar_tipos.
+    Tipos e bytes antes da compactação vêm do relatório gravado no arquivo (materializar_arrow),
+    proporcionais às linhas lidas; sem ele (arquivo antigo) ficam vazios.
+    """
+    bytes_depois = df.memory_usage(deep=True, index=False)
+    relatorio = pd.DataFrame({'Tipo Antes': None, 'Tipo Depois': df.dtypes.astype(str),
+                              'Bytes Antes': float('nan'), 'Bytes Depois': bytes_depois})
+    gravado = (metadados or {}).get(CHAVE_RELATORIO_ARROW)
+    if gravado is not None:
+        gravado = json.loads(gravado)
+        antes = pd.read_json(io.StringIO(json.dumps(gravado['colunas'])), orient='split')
+        antes = antes.reindex(relatorio.index)
+        relatorio['Tipo Antes'] = antes['Tipo Antes']
+        relatorio['Bytes Antes'] = (antes['Bytes Antes'] * len(df) / max(gravado['linhas'], 1)).round()
+    relatorio['Bytes Economizados'] = relatorio['Bytes Antes'] - relatorio['Bytes Depois']
+    return relatorio.sort_values('Bytes Economizados', ascending=False)
+
+
+def periodo_dados():
+    """
+    Retorna a primeira e a última data do conjunto (dd/mm/aaaa), lendo só a coluna 'Data'.
+    """
+    return _periodo(versao_leitura())
+
+
+@st.cache_data
+def _periodo(versao):
+    df = carregar_arquivo_parquet(COLUNAS_CABECALHO)
+    if df.empty:
+        return None, None
+    return df['Data'].min().strftime("%d/%m/%Y"), df['Data'].max().strftime("%d/%m/%Y")
+
+
+# ----------------------------
+# Gera os arquivos derivados:
+#   python -m utils.carregamento            -> dataset particionado
+#   python -m utils.carregamento arrow      -> arquivo Arrow para memory-map
+# ----------------------------
+if __name__ == '__main__':
+    import sys
+    if 'arrow' in sys.argv[1:]:
+        materializar_arrow()
+    else:
+        particionar_arquivo()
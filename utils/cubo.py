@@ -0,0 +1,221 @@
+import os
+import glob
+import streamlit as st
+import pandas as pd
+import pyarrow as pa
+from utils.esquema import compactar_tipos
+from utils.carregamento import abrir_fonte, versao_dataset
+from utils.filtros import cache_filtros, chave_selecoes
+
+
+
+# ----------------------------
+# Cubo de agregados (contagem e somas por dimensão)
+# ----------------------------
+CAMINHO_CUBO = "Dados/cubo"
+
+# Chaves de todo cuboide: os filtros da barra lateral (menos Municipio, que tem cuboide próprio)
+DIMENSOES_BASE = ['Ano', 'Mês', 'Região', 'Uf']
+
+# Um cuboide por dimensão de análise usada nos gráficos
+DIMENSOES_ANALISE = ['Municipio', 'Dia Semana', 'Hora', 'Br', 'Causa Grupo', 'Tipo Acidente',
+                     'Condicao Climatica Grupo', 'Condicao Metereologica', 'Grupo Via', 'Tipo Pista',
+                     'Fase Dia', 'Partes Dia', 'Classificacao Acidente']
+
+MEDIDAS_CUBO = ['Mortos', 'Feridos', 'Veiculos']
+COLUNA_CONTAGEM = 'Acidentes'
+
+# Nome do cuboide só com as dimensões base (gráficos por Ano, Mês, Região ou Uf)
+CUBOIDE_BASE = 'Base'
+
+# Linhas agrupadas de cada vez. O dataset particionado devolve um lote por arquivo (dezenas de linhas
+# por Ano/Uf em cada ingestão): agrupar lote a lote custaria os groupbys inteiros por arquivo
+LINHAS_POR_PASSADA = 1_000_000
+
+
+def _agregar(df, chaves):
+    agregacoes = {COLUNA_CONTAGEM: (chaves[0], 'size')}
+    agregacoes.update({medida: (medida, 'sum') for medida in MEDIDAS_CUBO if medida in df.columns})
+    # dropna=False: linhas com alguma chave vazia continuam contando nas demais dimensões
+    return df.groupby(chaves, observed=True, dropna=False).agg(**agregacoes).reset_index()
+
+
+def blocos(dataset, colunas, linhas=LINHAS_POR_PASSADA):
+    """
+    DataFrames de ~`linhas` linhas com as colunas pedidas, juntando os lotes pequenos do dataset.
+    """
+    pendentes, acumuladas = [], 0
+    for lote in dataset.to_batches(columns=colunas):
+        pendentes.append(lote)
+        acumuladas += lote.num_rows
+        if acumuladas >= linhas:
+            yield pa.Table.from_batches(pendentes).to_pandas()
+            pendentes, acumuladas = [], 0
+    if acumuladas:
+        yield pa.Table.from_batches(pendentes).to_pandas()
+
+
+def construir_cubo(dataset=None):
+    """
+    Monta o cubo em uma única passada, em blocos de LINHAS_POR_PASSADA linhas, sobre o dataset.
+    - Cada cuboide tem as DIMENSOES_BASE + uma dimensão de análise
+    - Guarda apenas combinações que ocorreram (contagem e somas de Mortos, Feridos, Veiculos)
+    Retorna um dicionário {nome do cuboide: DataFrame}.
+    """
+    if dataset is None:
+        dataset = abrir_fonte()
+    nomes = set(dataset.schema.names)
+    base = [d for d in DIMENSOES_BASE if d in nomes]
+    analise = [d for d in DIMENSOES_ANALISE if d in nomes]
+    medidas = [m for m in MEDIDAS_CUBO if m in nomes]
+
+    chaves = {CUBOIDE_BASE: base}
+    chaves.update({dimensao: base + [dimensao] for dimensao in analise})
+
+    parciais = {nome: [] for nome in chaves}
+    for df in blocos(dataset, base + analise + medidas):
+        for nome, colunas in chaves.items():
+            parciais[nome].append(_agregar(df, colunas))
+
+    cubo = {}
+    for nome in chaves:
+        if parciais[nome]:
+            # Soma os parciais de cada bloco (a contagem também é somada)
+            cubo[nome], _ = compactar_tipos(somar_parciais(parciais[nome]))
+    return cubo
+
+
+def somar_parciais(parciais, medidas=MEDIDAS_CUBO):
+    """
+    Soma agregados com as mesmas chaves (colunas que não são medidas nem a contagem).
+    Contagens negativas descontam linhas; combinações que ficam com contagem zero saem.
+    """
+    juntos = pd.concat(parciais, ignore_index=True)
+    valores = [c for c in [COLUNA_CONTAGEM] + medidas if c in juntos.columns]
+    chaves = [c for c in juntos.columns if c not in valores]
+    somado = juntos.groupby(chaves, observed=True, dropna=False)[valores].sum().reset_index()
+    return somado[somado[COLUNA_CONTAGEM] != 0].reset_index(drop=True)
+
+
+def descontar(agregados):
+    """Os mesmos agregados com contagem e medidas negativas (para somar_parciais)."""
+    negativos = {}
+    for nome, df in agregados.items():
+        valores = [c for c in [COLUNA_CONTAGEM] + MEDIDAS_CUBO if c in df.columns]
+        df = df.copy()
+        df[valores] = -df[valores].astype('int64')
+        negativos[nome] = df
+    return negativos
+
+
+def gravar_cubo(destino=CAMINHO_CUBO, cubo=None):
+    """
+    Grava um Parquet por cuboide; sem `cubo`, recalcula a partir do dataset inteiro.
+    """
+    if cubo is None:
+        cubo = construir_cubo()
+    os.makedirs(destino, exist_ok=True)
+    for arquivo in glob.glob(os.path.join(destino, '*.parquet')):
+        os.remove(arquivo)
+    for nome, df in cubo.items():
+        df.to_parquet(os.path.join(destino, f'{nome}.parquet'), index=False)
+
+
+def atualizar_cubo(novas, removidas=None, destino=CAMINHO_CUBO):
+    """
+    Soma ao cubo gravado os agregados das linhas novas e desconta os das removidas
+    (versões antigas das ocorrências alteradas), sem reler o dataset.
+    - novas, removidas: datasets (pyarrow.dataset) só com essas linhas
+    Sem cubo gravado, ou se as linhas novas trazem uma dimensão que ele não tem, recalcula tudo.
+    Chamado ao final de cada ingestão (utils/ingestao.py).
+    """
+    gravado = ler_cubo(destino)
+    delta = construir_cubo(novas)
+    if not gravado or not set(delta).issubset(gravado):
+        gravar_cubo(destino)
+        return
+    partes = [gravado, delta]
+    if removidas is not None and removidas.count_rows():
+        partes.append(descontar(construir_cubo(removidas)))
+    cubo = {}
+    for nome in gravado:
+        cubo[nome], _ = compactar_tipos(somar_parciais([parte[nome] for parte in partes if nome in parte]))
+    gravar_cubo(destino, cubo)
+
+
+def carregar_cubo():
+    """
+    Retorna o cubo gravado ({} quando ainda não foi gerado).
+    O mesmo dicionário é compartilhado entre sessões e reruns: não alterar.
+    """
+    return _ler_cubo(versao_dataset())
+
+
+@st.cache_resource(max_entries=2)
+def _ler_cubo(versao):
+    # cache_resource devolve o mesmo objeto a cada acesso (cache_data desserializaria uma cópia por rerun)
+    return ler_cubo()
+
+
+def ler_cubo(origem=CAMINHO_CUBO):
+    if not os.path.isdir(origem):
+        return {}
+    cubo = {}
+    for arquivo in glob.glob(os.path.join(origem, '*.parquet')):
+        nome = os.path.splitext(os.path.basename(arquivo))[0]
+        cubo[nome], _ = compactar_tipos(pd.read_parquet(arquivo))
+    return cubo
+
+
+def filtrar_cubo(cubo, selecoes, versao=None):
+    """
+    Aplica as seleções da barra lateral a cada cuboide.
+    - Cuboides sem a coluna de algum filtro ativo são descartados (não dá para responder por eles)
+    - versao: versão do dataset do cubo (carregar_cubo); com ela o resultado fica memorizado
+      no cache dos filtros, compartilhado entre sessões (não alterar o dicionário devolvido)
+    """
+    if versao is None:
+        return _filtrar_cubo(cubo, selecoes)
+    chave = ('cubo', versao, chave_selecoes(selecoes))
+    return cache_filtros().obter(chave, lambda: _filtrar_cubo(cubo, selecoes))
+
+
+def _filtrar_cubo(cubo, selecoes):
+    filtrado = {}
+    for nome, df in cubo.items():
+        ativos = {coluna: valores for coluna, valores in selecoes.items() if valores}
+        if not set(ativos).issubset(df.columns):
+            continue
+        for coluna, valores in ativos.items():
+            df = df[df[coluna].isin(valores)]
+        filtrado[nome] = df
+    return filtrado
+
+
+def totais_do_cubo(cubo, colunas, medidas=None):
+    """
+    Responde um agrupamento pelo cubo, sem passar pelas linhas.
+    - colunas: dimensões do agrupamento (ex.: ['Uf'] ou ['Tipo Acidente', 'Ano'])
+    - medidas: lista de medidas; None = contagem de acidentes
+    Retorna DataFrame com as colunas e as medidas, ou None se nenhum cuboide atende.
+    """
+    if not cubo:
+        return None
+    # Nos cuboides as medidas são somas, não valores por acidente: não servem de dimensão
+    if set(colunas) & set(MEDIDAS_CUBO + [COLUNA_CONTAGEM]):
+        return None
+    medidas = medidas or [COLUNA_CONTAGEM]
+    candidatos = [df for df in cubo.values()
+                  if set(colunas).issubset(df.columns) and set(medidas).issubset(df.columns)]
+    if not candidatos:
+        return None
+    # O menor cuboide que atende é o mais barato de agrupar
+    df = min(candidatos, key=len)
+    return df.groupby(colunas, observed=True)[medidas].sum().reset_index()
+
+
+# ----------------------------
+# Recalcula o cubo a partir do dataset atual: python -m utils.cubo
+# ----------------------------
+if __name__ == '__main__':
+    gravar_cubo()
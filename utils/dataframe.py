@@ -1,5 +1,10 @@
 import streamlit as st
 from utils.marcadores import divisor
+from utils.carregamento import RELATORIOS_MEMORIA
+from utils.visao import projetar
+from utils.filtros import cache_filtros
+from utils.graficos import cache_figuras, registro_payload
+from utils.exportacao import painel_exportacao
 
 import pandas as pd
 
@@ -18,7 +23,7 @@ def dataframe(df_filtrado):
         
         
         # Seleção de colunas
-        with st.expander('Clique para selecionar as colunas  que deseja para download do seu arquivo .csv na seta'):
+        with st.expander('Clique para selecionar as colunas  que deseja para download do seu arquivo na seta'):
             colunas = st.multiselect(
                 'Selecione as Colunas',
                 options=list(df_filtrado.columns),
@@ -26,9 +31,8 @@ def dataframe(df_filtrado):
                 
             )
         
-        filtro_dados=df_filtrado.copy()
-        # Aplica seleção de colunas
-        filtro_dados = filtro_dados[colunas]
+        # Materializa só as colunas escolhidas, nas linhas filtradas
+        filtro_dados = projetar(df_filtrado, colunas)
 
         # CSS custom para o data editor
         st.markdown("""
@@ -59,15 +63,8 @@ def dataframe(df_filtrado):
         col1, col2, col3 = st.columns([3,1,1])
         
         with col1:
-            
-            csv = filtro_dados.to_csv(index=False, encoding='utf-8-sig').encode('utf-8-sig')
-            st.download_button(
-                label="⬇️ Baixar CSV",
-                data=csv,
-                file_name='unidades_ensino_recife.csv',
-                mime='text/csv',
-                
-            )
+            # Arquivo gerado só quando pedido, em lotes e fora do rerun (utils/exportacao.py)
+            painel_exportacao(df_filtrado, list(filtro_dados.columns))
         with col2:
             totalLinhas = filtro_dados.shape[0]
             st.metric("📄 Total de Linhas", value=totalLinhas, border=True)
@@ -75,8 +72,24 @@ def dataframe(df_filtrado):
         with col3:
             totalColunas = filtro_dados.shape[1]
             st.metric("📊 Total de Colunas", value=totalColunas, border=True)
+
+        # Relatório da compactação de tipos feita na leitura (todas as colunas)
+        relatorio = RELATORIOS_MEMORIA.get(None)
+        if relatorio is not None:
+            with st.expander('💾 Memória por coluna (antes e depois da compactação de tipos)'):
+                st.dataframe(relatorio, use_container_width=True)
+
+        # Acertos e falhas dos caches de filtros e de figuras (compartilhados entre sessões)
+        with st.expander('🗂️ Cache dos filtros e dos gráficos'):
+            estatisticas = pd.DataFrame([cache_filtros().estatisticas(), cache_figuras().estatisticas()],
+                                        index=['Filtros', 'Gráficos'])
+            st.dataframe(estatisticas, use_container_width=True)
+
+        # Tamanho do JSON de cada tipo de gráfico enviado ao navegador (todas as sessões)
+        with st.expander('📦 Bytes enviados por gráfico'):
+            st.dataframe(registro_payload().tabela(), hide_index=True, use_container_width=True)
     else:
-        st.dataframe(df_filtrado)
+        st.dataframe(projetar(df_filtrado, df_filtrado.columns))
 
 
 def mainDataframe(df):
@@ -0,0 +1,288 @@
+import numpy as np
+import pandas as pd
+
+
+
+# ----------------------------
+# Pirâmide de grades lat/lon para o mapa de calor
+# ----------------------------
+# Cada acidente recebe, uma vez por leitura, a célula da grade mais fina (quadtree sobre o globo:
+# no nível L as células têm 360 / 2**L graus de lado). A célula de um nível mais grosso sai
+# deslocando os bits (ix >> k, iy >> k), então todos os níveis ficam disponíveis sem recalcular.
+# O mapa recebe só as células não vazias do nível que combina com o zoom.
+
+NIVEL_MAXIMO = 16        # células de ~0,0055° (~600 m)
+MAX_CELULAS = 20_000     # acima disso o nível desce até caber (limita o tamanho enviado ao navegador)
+
+# Células de ~4 px na tela: um tile de 256 px cobre 360 / 2**zoom graus
+NIVEIS_ACIMA_DO_ZOOM = 6
+
+
+def construir_piramide(df):
+    """
+    Células do nível mais fino de cada linha.
+    Retorna {'ix', 'iy': uint16 por linha, 'validas': bool por linha (coordenada presente)}.
+    """
+    latitude = df['Latitude'].to_numpy(dtype='float64', na_value=np.nan)
+    longitude = df['Longitude'].to_numpy(dtype='float64', na_value=np.nan)
+    validas = ~(np.isnan(latitude) | np.isnan(longitude))
+
+    escala = 2 ** NIVEL_MAXIMO / 360
+    ix = np.clip(np.floor((np.nan_to_num(longitude) + 180) * escala), 0, 2 ** NIVEL_MAXIMO - 1)
+    iy = np.clip(np.floor((np.nan_to_num(latitude) + 90) * escala), 0, 2 ** NIVEL_MAXIMO - 1)
+    return {'ix': ix.astype(np.uint16), 'iy': iy.astype(np.uint16), 'validas': validas}
+
+
+def nivel_do_zoom(zoom):
+    return int(np.clip(round(zoom) + NIVEIS_ACIMA_DO_ZOOM, 0, NIVEL_MAXIMO))
+
+
+def _celulas(piramide, nivel, posicoes, pesos):
+    deslocamento = NIVEL_MAXIMO - nivel
+    ix = piramide['ix'][posicoes] >> deslocamento
+    iy = piramide['iy'][posicoes] >> deslocamento
+    codigos = (ix.astype(np.int64) << 16) | iy
+
+    unicos, inverso = np.unique(codigos, return_inverse=True)
+    lado = 360 / 2 ** nivel
+    return pd.DataFrame({
+        # Centro da célula
+        'Latitude': ((unicos & 0xFFFF) + 0.5) * lado - 90,
+        'Longitude': ((unicos >> 16) + 0.5) * lado - 180,
+        'Acidentes': np.bincount(inverso, minlength=len(unicos)),
+        'Peso': np.bincount(inverso, weights=pesos, minlength=len(unicos)),
+    })
+
+
+def agregar_grade(piramide, nivel, posicoes=None, pesos=None):
+    """
+    Soma os acidentes por célula do nível pedido.
+    - posicoes: linhas consideradas (None = todas)
+    - pesos: valor somado por linha, alinhado a posicoes (Mortos, Feridos, Veiculos); None = contagem
+    Se houver mais de MAX_CELULAS células não vazias, usa o nível de cima até caber.
+    Retorna DataFrame com Latitude, Longitude (centro da célula), Acidentes, Peso e o nível usado.
+    """
+    if posicoes is None:
+        posicoes = np.arange(len(piramide['ix']))
+    pesos = np.ones(len(posicoes)) if pesos is None else np.nan_to_num(np.asarray(pesos, dtype='float64'))
+
+    # Só linhas com coordenada
+    validas = piramide['validas'][posicoes]
+    posicoes, pesos = posicoes[validas], pesos[validas]
+
+    celulas = _celulas(piramide, nivel, posicoes, pesos)
+    while len(celulas) > MAX_CELULAS and nivel > 0:
+        nivel -= 1
+        celulas = _celulas(piramide, nivel, posicoes, pesos)
+    return celulas, nivel
+
+
+# ----------------------------
+# Índice espacial (grade uniforme em CSR)
+# ----------------------------
+# As linhas com coordenada ficam ordenadas pela célula do NIVEL_INDICE (código ix << 16 | iy).
+# Como o código cresce com iy dentro de cada coluna ix, as células de um retângulo formam,
+# para cada ix, um único trecho contíguo: uma busca binária por coluna acha as linhas candidatas,
+# e só elas passam pelo teste exato de coordenada/distância.
+# As consultas devolvem posições na base (ordenadas), as mesmas de Visao.posicoes.
+
+NIVEL_INDICE = 10        # células de ~0,35° (~39 km)
+RAIO_TERRA_KM = 6371.0
+KM_POR_GRAU = np.pi * RAIO_TERRA_KM / 180
+
+
+def construir_indice_espacial(df, piramide=None):
+    """
+    Índice das coordenadas do DataFrame (float32), agrupadas por célula.
+    - piramide: a de construir_piramide(df), se já existir (evita recalcular as células)
+    Retorna {'celulas': códigos ordenados, 'inicios': início de cada célula (+ fim),
+             'posicoes': posição na base de cada linha, 'latitude', 'longitude': na mesma ordem}.
+    """
+    if piramide is None:
+        piramide = construir_piramide(df)
+
+    deslocamento = NIVEL_MAXIMO - NIVEL_INDICE
+    validas = np.flatnonzero(piramide['validas'])
+    codigos = ((piramide['ix'][validas] >> deslocamento).astype(np.int64) << 16) | (piramide['iy'][validas] >> deslocamento)
+
+    ordem = np.argsort(codigos, kind='stable')
+    celulas, inicios = np.unique(codigos[ordem], return_index=True)
+    posicoes = validas[ordem].astype(np.int32)
+    return {
+        'celulas': celulas,
+        'inicios': np.append(inicios, len(posicoes)).astype(np.int64),
+        'posicoes': posicoes,
+        'latitude': df['Latitude'].to_numpy(dtype='float32', na_value=np.nan)[posicoes],
+        'longitude': df['Longitude'].to_numpy(dtype='float32', na_value=np.nan)[posicoes],
+    }
+
+
+def _celula(valor, origem):
+    lado = 360 / 2 ** NIVEL_INDICE
+    return int(np.clip(np.floor((valor + origem) / lado), 0, 2 ** NIVEL_INDICE - 1))
+
+
+def _candidatas(indice, lat_min, lat_max, lon_min, lon_max):
+    """Posições no índice (não na base) das linhas nas células que tocam o retângulo."""
+    ixs = np.arange(_celula(lon_min, 180), _celula(lon_max, 180) + 1, dtype=np.int64) << 16
+    iy_min, iy_max = _celula(lat_min, 90), _celula(lat_max, 90)
+
+    # Um trecho de células (e de linhas) por coluna ix
+    primeiras = np.searchsorted(indice['celulas'], ixs | iy_min, side='left')
+    ultimas = np.searchsorted(indice['celulas'], ixs | iy_max, side='right')
+    inicios, fins = indice['inicios'][primeiras], indice['inicios'][ultimas]
+
+    # Concatena os trechos [inicio, fim) sem laço em Python
+    tamanhos = fins - inicios
+    deslocamentos = np.repeat(inicios - (np.cumsum(tamanhos) - tamanhos), tamanhos)
+    return np.arange(tamanhos.sum(), dtype=np.int64) + deslocamentos
+
+
+def _na_selecao(posicoes, selecao):
+    """Máscara das posições que estão na seleção (posições ordenadas de Visao.posicoes; None = todas)."""
+    if selecao is None:
+        return np.ones(len(posicoes), dtype=bool)
+    if len(selecao) == 0:
+        return np.zeros(len(posicoes), dtype=bool)
+    lugar = np.minimum(np.searchsorted(selecao, posicoes), len(selecao) - 1)
+    return selecao[lugar] == posicoes
+
+
+def distancia_km(lat, lon, latitudes, longitudes):
+    """Distância de haversine (km) entre um ponto e arrays de coordenadas."""
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(latitudes.astype('float64')), np.radians(longitudes.astype('float64'))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RAIO_TERRA_KM * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+def consultar_retangulo(indice, lat_min, lat_max, lon_min, lon_max, selecao=None):
+    """
+    Linhas dentro do retângulo (limites inclusivos).
+    - selecao: restringe às posições já selecionadas (Visao.posicoes; None = todas)
+    Retorna as posições na base, ordenadas.
+    """
+    candidatas = _candidatas(indice, lat_min, lat_max, lon_min, lon_max)
+    latitude, longitude = indice['latitude'][candidatas], indice['longitude'][candidatas]
+    dentro = (latitude >= lat_min) & (latitude <= lat_max) & (longitude >= lon_min) & (longitude <= lon_max)
+
+    posicoes = indice['posicoes'][candidatas[dentro]]
+    return np.sort(posicoes[_na_selecao(posicoes, selecao)])
+
+
+def consultar_raio(indice, lat, lon, raio_km, selecao=None):
+    """
+    Linhas a até raio_km do ponto.
+    Retorna (posições na base ordenadas, distâncias em km na mesma ordem).
+    """
+    delta_lat = raio_km / KM_POR_GRAU
+    delta_lon = min(raio_km / (KM_POR_GRAU * max(np.cos(np.radians(lat)), 1e-6)), 180)
+    candidatas = _candidatas(indice, lat - delta_lat, lat + delta_lat, lon - delta_lon, lon + delta_lon)
+
+    posicoes = indice['posicoes'][candidatas]
+    distancias = distancia_km(lat, lon, indice['latitude'][candidatas], indice['longitude'][candidatas])
+    dentro = (distancias <= raio_km) & _na_selecao(posicoes, selecao)
+
+    posicoes, distancias = posicoes[dentro], distancias[dentro]
+    ordem = np.argsort(posicoes)
+    return posicoes[ordem], distancias[ordem]
+
+
+def consultar_vizinhos(indice, lat, lon, k, selecao=None):
+    """
+    As k linhas mais próximas do ponto (menos, se não houver k).
+    O raio começa em uma célula e dobra até conter k linhas: tudo a até r km está no resultado
+    de consultar_raio, então as k mais próximas dentro dele são as k mais próximas de todas.
+    Retorna (posições na base, distâncias em km), da mais próxima para a mais distante.
+    """
+    raio_km = 360 / 2 ** NIVEL_INDICE * KM_POR_GRAU
+    while True:
+        posicoes, distancias = consultar_raio(indice, lat, lon, raio_km, selecao)
+        if len(posicoes) >= k or raio_km >= np.pi * RAIO_TERRA_KM:
+            break
+        raio_km *= 2
+
+    if len(posicoes) > k:
+        menores = np.argpartition(distancias, k - 1)[:k]
+        posicoes, distancias = posicoes[menores], distancias[menores]
+    ordem = np.argsort(distancias, kind='stable')
+    return posicoes[ordem], distancias[ordem]
+
+
+# ----------------------------
+# Ocorrências por BR e Km (referência do "perto deste Km")
+# ----------------------------
+# Linhas com BR, Km e coordenada ordenadas por (Br, Km inteiro), com a mediana das coordenadas de
+# cada par já calculada: o Km mais próximo sai de uma busca binária no trecho da BR.
+
+
+def construir_indice_km(df):
+    """
+    Índice das ocorrências por (Br, Km inteiro).
+    Retorna {'grupo_br', 'grupo_km', 'grupo_latitude', 'grupo_longitude': um valor por par (Br, Km),
+             'grupo_inicio': início das linhas de cada par (+ fim),
+             'posicoes', 'km', 'latitude', 'longitude': uma linha por ocorrência, na ordem dos pares}.
+    """
+    br = df['Br'].to_numpy(dtype='float64', na_value=np.nan)
+    km = np.floor(df['Km'].to_numpy(dtype='float64', na_value=np.nan))
+    latitude = df['Latitude'].to_numpy(dtype='float64', na_value=np.nan)
+    longitude = df['Longitude'].to_numpy(dtype='float64', na_value=np.nan)
+
+    validas = np.flatnonzero(~(np.isnan(br) | np.isnan(km) | np.isnan(latitude) | np.isnan(longitude)))
+    ordem = validas[np.lexsort((km[validas], br[validas]))]
+    br, km, latitude, longitude = br[ordem], km[ordem], latitude[ordem], longitude[ordem]
+
+    novo = np.ones(len(ordem), dtype=bool)
+    novo[1:] = (br[1:] != br[:-1]) | (km[1:] != km[:-1])
+    inicios = np.flatnonzero(novo)
+    grupo = np.cumsum(novo) - 1
+    return {
+        'grupo_br': br[inicios],
+        'grupo_km': km[inicios],
+        'grupo_inicio': np.append(inicios, len(ordem)).astype(np.int64),
+        'grupo_latitude': _medianas(latitude, grupo, inicios, len(ordem)),
+        'grupo_longitude': _medianas(longitude, grupo, inicios, len(ordem)),
+        'posicoes': ordem.astype(np.int32),
+        'km': km,
+        'latitude': latitude.astype('float32'),
+        'longitude': longitude.astype('float32'),
+    }
+
+
+def _medianas(valores, grupo, inicios, total):
+    """Mediana de cada grupo (linhas contíguas a partir de inicios), sem laço por grupo."""
+    ordenados = valores[np.lexsort((valores, grupo))]
+    tamanhos = np.diff(np.append(inicios, total))
+    return (ordenados[inicios + (tamanhos - 1) // 2] + ordenados[inicios + tamanhos // 2]) / 2
+
+
+def localizar_km(indice_km, br, km, selecao=None):
+    """
+    Coordenada de referência de um Km de uma BR: mediana das ocorrências registradas
+    no Km inteiro mais próximo do pedido (o menor, no empate).
+    - indice_km: o de construir_indice_km
+    - selecao: restringe às posições já selecionadas (Visao.posicoes; None = todas)
+    Retorna (latitude, longitude, km encontrado) ou None se a BR não tiver coordenadas.
+    """
+    primeiro = np.searchsorted(indice_km['grupo_br'], br, side='left')
+    ultimo = np.searchsorted(indice_km['grupo_br'], br, side='right')
+    if primeiro == ultimo:
+        return None
+    alvo = np.floor(km)
+
+    if selecao is None:
+        # Medianas prontas: só o Km mais próximo entre os Km da BR (ordenados)
+        grupo = primeiro + int(np.argmin(np.abs(indice_km['grupo_km'][primeiro:ultimo] - alvo)))
+        return (float(indice_km['grupo_latitude'][grupo]), float(indice_km['grupo_longitude'][grupo]),
+                float(indice_km['grupo_km'][grupo]))
+
+    # Com seleção: só as linhas da BR passam pelo teste de pertencer à seleção
+    inicio, fim = indice_km['grupo_inicio'][primeiro], indice_km['grupo_inicio'][ultimo]
+    na_br = inicio + np.flatnonzero(_na_selecao(indice_km['posicoes'][inicio:fim], selecao))
+    if len(na_br) == 0:
+        return None
+    kms = indice_km['km'][na_br]
+    km_encontrado = kms[np.argmin(np.abs(kms - alvo))]
+    no_km = na_br[kms == km_encontrado]
+    return (float(np.median(indice_km['latitude'][no_km].astype('float64'))),
+            float(np.median(indice_km['longitude'][no_km].astype('float64'))), float(km_encontrado))
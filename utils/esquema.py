@@ -0,0 +1,100 @@
+import pandas as pd
+
+
+
+# ----------------------------
+# Ordem de calendário das colunas de texto
+# ----------------------------
+MESES = ["Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho",
+         "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"]
+
+DIAS_SEMANA = ["Domingo", "Segunda-Feira", "Terça-Feira", "Quarta-Feira",
+               "Quinta-Feira", "Sexta-Feira", "Sábado"]
+
+PARTES_DIA = ["Madrugada", "Manhã", "Tarde", "Noite"]
+
+ORDEM_CATEGORIAS = {
+    'Mês': MESES,
+    'Dia Semana': DIAS_SEMANA,
+    'Partes Dia': PARTES_DIA,
+}
+
+
+# ----------------------------
+# Tipos compactos de cada coluna
+# ----------------------------
+COLUNAS_CATEGORICAS = ['Região', 'Uf', 'Municipio', 'Mês', 'Dia Semana', 'Tipo Acidente', 'Causa Acidente',
+                       'Causa Grupo', 'Grupo Via', 'Tracado Via', 'Tipo Pista', 'Fase Dia', 'Partes Dia',
+                       'Condicao Metereologica', 'Condicao Climatica Grupo', 'Classificacao Acidente',
+                       'Sentido Via', 'Uso Solo']
+COLUNAS_INTEIRAS = ['Ano', 'Dia', 'Hora', 'Br', 'Pessoas', 'Mortos', 'Feridos', 'Ilesos', 'Ignorados', 'Veiculos']
+COLUNAS_DECIMAIS = ['Latitude', 'Longitude', 'Km']
+
+# Outras colunas de texto viram categoria quando repetem bastante (distintos <= 50% das linhas)
+LIMITE_CARDINALIDADE = 0.5
+
+
+def _categoria_ordenada(serie, coluna):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        presentes = list(serie.cat.categories)
+    else:
+        presentes = list(serie.dropna().unique())
+
+    # Ordem de calendário quando existir; valores desconhecidos vão para o fim, em ordem alfabética
+    ordem = ORDEM_CATEGORIAS.get(coluna, [])
+    extras = sorted((v for v in presentes if v not in ordem), key=str)
+    categorias = list(ordem) + extras
+
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.set_categories(categorias, ordered=True)
+    return pd.Series(pd.Categorical(serie, categories=categorias, ordered=True), index=serie.index)
+
+
+def _inteiro_compacto(serie):
+    serie = pd.to_numeric(serie, errors='coerce')
+    # Inteiros não aceitam NaN: nesse caso fica em float32
+    if serie.isna().any():
+        return serie.astype('float32')
+    return pd.to_numeric(serie, downcast='integer')
+
+
+def _decimal_compacto(serie):
+    if serie.dtype == object:
+        # Dados abertos da PRF usam vírgula como separador decimal
+        serie = serie.str.replace(',', '.', regex=False)
+    return pd.to_numeric(serie, errors='coerce').astype('float32')
+
+
+def compactar_tipos(df):
+    """
+    Converte o DataFrame para tipos compactos:
+    - Colunas de texto viram Categoricals ordenados (Mês e Dia Semana na ordem do calendário)
+    - Contagens (Mortos, Feridos, Veiculos...) viram int8/int16
+    - Coordenadas e Km viram float32
+    Retorna o DataFrame convertido e um relatório de bytes economizados por coluna.
+    """
+    tipos_antes = df.dtypes.astype(str)
+    bytes_antes = df.memory_usage(deep=True, index=False)
+
+    for coluna in df.columns:
+        serie = df[coluna]
+        if coluna in COLUNAS_CATEGORICAS:
+            df[coluna] = _categoria_ordenada(serie, coluna)
+        elif coluna in COLUNAS_INTEIRAS:
+            df[coluna] = _inteiro_compacto(serie)
+        elif coluna in COLUNAS_DECIMAIS:
+            df[coluna] = _decimal_compacto(serie)
+        elif serie.dtype == object and len(serie) and serie.nunique() <= LIMITE_CARDINALIDADE * len(serie):
+            df[coluna] = _categoria_ordenada(serie, coluna)
+
+    bytes_depois = df.memory_usage(deep=True, index=False)
+    relatorio = pd.DataFrame({
+        'Tipo Antes': tipos_antes,
+        'Tipo Depois': df.dtypes.astype(str),
+        'Bytes Antes': bytes_antes,
+        'Bytes Depois': bytes_depois,
+    })
+    relatorio['Bytes Economizados'] = relatorio['Bytes Antes'] - relatorio['Bytes Depois']
+    relatorio = relatorio.sort_values('Bytes Economizados', ascending=False)
+
+    return df, relatorio
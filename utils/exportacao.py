@@ -0,0 +1,273 @@
+import os
+import time
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+from utils.visao import Visao
+
+
+
+# ----------------------------
+# Exportação da seleção (página Dataframe)
+# ----------------------------
+# O arquivo só é gerado quando o usuário pede, numa thread à parte (o rerun não espera),
+# e é escrito em lotes de LINHAS_POR_LOTE linhas: só as colunas escolhidas, nas linhas filtradas.
+# A gravação nunca tem a exportação inteira em memória: o arquivo fica em PASTA_EXPORTACOES por
+# VALIDADE_EXPORTACAO segundos e a sessão guarda só o caminho. O botão de download precisa do conteúdo
+# em memória (o servidor de mídia do Streamlit serve bytes); ele é lido uma vez ao preparar o download e
+# solto no clique ou depois de VALIDADE_DOWNLOAD segundos. Depois disso, o download é preparado de novo
+# a partir do arquivo, se o usuário pedir.
+PASTA_EXPORTACOES = os.environ.get('PRF_DIR_EXPORTACOES', os.path.join(tempfile.gettempdir(), 'prf_exportacoes'))
+
+LINHAS_POR_LOTE = 100_000
+EXPORTACOES_SIMULTANEAS = 2     # threads para todas as sessões
+VALIDADE_EXPORTACAO = 3600      # segundos do arquivo em disco
+VALIDADE_DOWNLOAD = 300         # segundos do conteúdo em memória para o botão de download
+INTERVALO_PROGRESSO = 1         # segundos entre atualizações do progresso na página
+
+# Formato: (extensão, tipo MIME)
+FORMATOS = {
+    'CSV': ('csv', 'text/csv'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'Arrow IPC': ('arrow', 'application/vnd.apache.arrow.file'),
+}
+
+CHAVE_SESSAO = 'exportacao'
+
+
+def esquema(df, colunas):
+    """
+    Esquema Arrow das colunas pedidas, tirado das colunas inteiras (não de um lote):
+    todos os lotes são convertidos com ele, então um lote com uma coluna só de nulos
+    ou com outras categorias não muda o tipo no meio do arquivo.
+    """
+    base = df.base if isinstance(df, Visao) else df
+    campos = []
+    for coluna in dict.fromkeys(colunas):
+        if coluna not in base.columns:
+            continue
+        serie = base[coluna]
+        if serie.dtype == object:
+            # Tipo do primeiro valor preenchido da coluna; coluna toda vazia vira texto
+            preenchidos = np.flatnonzero(serie.notna().to_numpy())
+            tipo = pa.infer_type(serie.iloc[preenchidos[:1]].to_numpy()) if len(preenchidos) else pa.string()
+        else:
+            tipo = pa.Schema.from_pandas(serie.iloc[:0].to_frame(), preserve_index=False).field(coluna).type
+        campos.append(pa.field(coluna, tipo))
+    return pa.schema(campos)
+
+
+def lotes(df, colunas, linhas_por_lote=LINHAS_POR_LOTE):
+    """
+    DataFrames de até `linhas_por_lote` linhas com as colunas pedidas, na ordem da seleção.
+    - df: Visao ou DataFrame (colunas inexistentes são ignoradas)
+    """
+    if isinstance(df, Visao):
+        base, posicoes = df.base, df.posicoes
+    else:
+        base, posicoes = df, None
+    colunas = [c for c in dict.fromkeys(colunas) if c in base.columns]
+    total = len(base) if posicoes is None else len(posicoes)
+    for inicio in range(0, total, linhas_por_lote):
+        if posicoes is None:
+            fatia = slice(inicio, inicio + linhas_por_lote)
+            yield pd.DataFrame({c: base[c].iloc[fatia] for c in colunas}, copy=False)
+        else:
+            linhas = posicoes[inicio:inicio + linhas_por_lote]
+            yield pd.DataFrame({c: base[c].take(linhas) for c in colunas}, copy=False)
+
+
+def escrever(df, colunas, formato, caminho, progresso=None, linhas_por_lote=LINHAS_POR_LOTE):
+    """
+    Grava a seleção em `caminho`, lote a lote.
+    - formato: chave de FORMATOS
+    - progresso: dict atualizado com 'linhas' já gravadas (lido pela página)
+    O arquivo só aparece com o nome final depois de completo.
+    """
+    parcial = caminho + '.parcial'
+    escritor = None
+    try:
+        if formato == 'CSV':
+            # utf-8-sig: o Excel reconhece os acentos (o BOM vai só no começo do arquivo)
+            with open(parcial, 'w', encoding='utf-8-sig', newline='') as arquivo:
+                for numero, lote in enumerate(lotes(df, colunas, linhas_por_lote)):
+                    lote.to_csv(arquivo, index=False, header=numero == 0)
+                    _avancar(progresso, len(lote))
+        else:
+            esquema_arrow = esquema(df, colunas)
+            escritor = (pq.ParquetWriter(parcial, esquema_arrow) if formato == 'Parquet' else
+                        pa.ipc.new_file(parcial, esquema_arrow,
+                                        options=pa.ipc.IpcWriteOptions(unify_dictionaries=True)))
+            for lote in lotes(df, colunas, linhas_por_lote):
+                escritor.write_table(pa.Table.from_pandas(lote, schema=esquema_arrow, preserve_index=False))
+                _avancar(progresso, len(lote))
+            escritor.close()
+            escritor = None
+        os.replace(parcial, caminho)
+    finally:
+        if escritor is not None:
+            escritor.close()
+        if os.path.exists(parcial):
+            os.remove(parcial)
+    return caminho
+
+
+def _avancar(progresso, linhas):
+    if progresso is not None:
+        progresso['linhas'] = progresso.get('linhas', 0) + linhas
+
+
+@st.cache_resource
+def executor_exportacoes():
+    # Compartilhado pelas sessões: limita quantas exportações rodam ao mesmo tempo
+    return ThreadPoolExecutor(max_workers=EXPORTACOES_SIMULTANEAS, thread_name_prefix='exportacao')
+
+
+_limpeza = threading.Lock()
+
+
+def _apagar_antigas(pasta=PASTA_EXPORTACOES, validade=VALIDADE_EXPORTACAO):
+    limite = time.time() - validade
+    with _limpeza:
+        for nome in os.listdir(pasta):
+            caminho = os.path.join(pasta, nome)
+            try:
+                if os.path.getmtime(caminho) < limite:
+                    os.remove(caminho)
+            except OSError:
+                pass
+
+
+def _descartar(exportacao):
+    if exportacao is None:
+        return
+    exportacao['futuro'].cancel()
+    exportacao.pop('conteudo', None)
+    if exportacao['futuro'].done() and os.path.exists(exportacao['caminho']):
+        os.remove(exportacao['caminho'])
+
+
+def _preparar_download(exportacao):
+    """Lê o arquivo pronto para o botão de download; o conteúdo fica na sessão até o clique ou VALIDADE_DOWNLOAD."""
+    with open(exportacao['caminho'], 'rb') as arquivo:
+        exportacao['conteudo'] = arquivo.read()
+    exportacao['preparado_em'] = time.time()
+    exportacao['baixado'] = False
+
+
+def _soltar_download(exportacao):
+    exportacao.pop('conteudo', None)
+    exportacao.pop('preparado_em', None)
+
+
+def liberar_download():
+    """Solta o conteúdo do download preparado na sessão (chamado quando a página Dataframe sai da tela)."""
+    exportacao = st.session_state.get(CHAVE_SESSAO)
+    if exportacao is not None and 'conteudo' in exportacao:
+        _soltar_download(exportacao)
+
+
+def _baixado():
+    # Depois do clique o servidor de mídia ainda serve o arquivo por um rerun; a sessão já pode soltar
+    exportacao = st.session_state.get(CHAVE_SESSAO)
+    if exportacao is not None:
+        _soltar_download(exportacao)
+        exportacao['baixado'] = True
+
+
+def iniciar_exportacao(df, colunas, formato):
+    """
+    Agenda a gravação da seleção no formato pedido e guarda o trabalho na sessão.
+    A exportação anterior da sessão é descartada.
+    """
+    _descartar(st.session_state.get(CHAVE_SESSAO))
+    os.makedirs(PASTA_EXPORTACOES, exist_ok=True)
+    _apagar_antigas()
+
+    extensao, mime = FORMATOS[formato]
+    nome = f"PRF_acidentes_{datetime.now():%Y%m%d-%H%M%S}.{extensao}"
+    caminho = os.path.join(PASTA_EXPORTACOES, f"{os.urandom(8).hex()}-{nome}")
+    # As posições da seleção saem do cache de filtros aqui, na thread do rerun (ficam guardadas na visão)
+    assinatura = None
+    if isinstance(df, Visao):
+        df.posicoes
+        assinatura = df.assinatura
+    progresso = {'linhas': 0, 'total': len(df)}
+    futuro = executor_exportacoes().submit(escrever, df, colunas, formato, caminho, progresso)
+    st.session_state[CHAVE_SESSAO] = {
+        'futuro': futuro, 'caminho': caminho, 'nome': nome, 'mime': mime,
+        'escolha': (formato, list(colunas), assinatura), 'formato': formato, 'progresso': progresso,
+    }
+
+
+@st.fragment(run_every=INTERVALO_PROGRESSO)
+def _acompanhar():
+    exportacao = st.session_state.get(CHAVE_SESSAO)
+    if exportacao is None:
+        return
+    if exportacao['futuro'].done():
+        # Rerun completo: o painel troca o progresso pelo botão de download
+        st.rerun()
+    progresso = exportacao['progresso']
+    st.progress(progresso['linhas'] / max(progresso['total'], 1),
+                text=f"Gerando {exportacao['formato']}: {progresso['linhas']:,} de {progresso['total']:,} linhas"
+                .replace(',', '.'))
+
+
+@st.fragment(run_every=VALIDADE_DOWNLOAD / 10)
+def _expirar_download():
+    # Sem rerun da página o botão seguraria o conteúdo: passado o prazo, o painel volta sem ele
+    exportacao = st.session_state.get(CHAVE_SESSAO)
+    if exportacao is not None and 'conteudo' in exportacao \
+            and time.time() - exportacao['preparado_em'] > VALIDADE_DOWNLOAD:
+        _soltar_download(exportacao)
+        st.rerun()
+
+
+def painel_exportacao(df, colunas):
+    """
+    Escolha do formato, botão para gerar o arquivo e, quando pronto, o botão de download.
+    - df: seleção da página (Visao ou DataFrame); colunas: projeção escolhida pelo usuário
+    """
+    formato = st.radio('Formato do arquivo', list(FORMATOS), horizontal=True, key='exportacao_formato')
+    if st.button('📦 Gerar arquivo', disabled=not colunas):
+        iniciar_exportacao(df, colunas, formato)
+
+    exportacao = st.session_state.get(CHAVE_SESSAO)
+    if exportacao is None:
+        return
+    futuro = exportacao['futuro']
+    if not futuro.done():
+        _acompanhar()
+    elif futuro.cancelled() or futuro.exception() is not None:
+        st.error(f"Falha ao gerar o arquivo: {futuro.exception() if not futuro.cancelled() else 'cancelado'}")
+    elif not os.path.exists(exportacao['caminho']):
+        _soltar_download(exportacao)
+        st.warning('O arquivo expirou; gere de novo.')
+    else:
+        if 'conteudo' in exportacao and time.time() - exportacao['preparado_em'] > VALIDADE_DOWNLOAD:
+            _soltar_download(exportacao)
+        if 'conteudo' not in exportacao:
+            # Primeira vez: prepara direto; depois do download ou do prazo, só se o usuário pedir
+            if 'baixado' in exportacao:
+                st.caption(f"{exportacao['nome']} baixado." if exportacao['baixado'] else
+                           'O download saiu da memória do servidor; o arquivo continua pronto.')
+                st.button("🔄 Preparar o download de novo", on_click=_preparar_download, args=(exportacao,))
+                return
+            _preparar_download(exportacao)
+        if exportacao['escolha'] != (formato, list(colunas), getattr(df, 'assinatura', None)):
+            st.caption('O arquivo pronto é de uma escolha anterior de filtros, colunas ou formato.')
+        st.download_button(
+            label=f"⬇️ Baixar {exportacao['formato']}",
+            data=exportacao['conteudo'],
+            file_name=exportacao['nome'],
+            mime=exportacao['mime'],
+            on_click=_baixado,
+        )
+        _expirar_download()
@@ -1,24 +1,51 @@
 import pandas as pd
 import streamlit as st
+from utils.esquema import MESES
+from utils.indice_bitmap import selecionar, valores_presentes, posicoes, opcoes_hierarquia
+from utils.cache_lru import CacheLRU
 
 
 
+# ----------------------------
+# Chaves dos filtros da barra lateral no session_state
+# ----------------------------
+CHAVES_FILTROS = {
+    'Ano': 'main_filtro_Ano',
+    'Mês': 'main_filtro_mes',
+    'Região': 'main_filtro_Região',
+    'Uf': 'main_filtro_Uf',
+    'Municipio': 'main_filtro_Municipio',
+}
+
+
+def selecoes_sidebar():
+    """
+    Retorna as seleções atuais da barra lateral no formato {coluna: valores}.
+    """
+    return {coluna: list(st.session_state.get(chave, [])) for coluna, chave in CHAVES_FILTROS.items()}
+
+
 # ----------------------------
 # Funções de filtro
 # ----------------------------
 
+def opcoes_ordenadas(serie):
+    # Categoricals já trazem a ordem certa (calendário, alfabética); ordena pelos códigos
+    opcoes = serie.dropna().unique()
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return list(opcoes.sort_values())
+    return sorted(opcoes)
+
 def filtros_aplicados(df, nome_do_filtro):
     chave = f'main_filtro_{nome_do_filtro}'
     
-    # Inicializa o session_state caso ainda não exista
-    if chave not in st.session_state:
-        st.session_state[chave] = []
+    # Inicializa o session_state caso ainda não exista (o widget lê o valor pela key, sem default=)
+    st.session_state.setdefault(chave, [])
 
     # Widget Multiselect
     filtro_opcao = st.multiselect(
         f'Selecione {nome_do_filtro}',
-        options=sorted(df[nome_do_filtro].dropna().unique()),
-        default=st.session_state[chave],
+        options=opcoes_ordenadas(df[nome_do_filtro]),
         key=chave
     )
     
@@ -26,27 +53,104 @@ def filtros_aplicados(df, nome_do_filtro):
     # Apenas filtra os dados com base no valor atual
     return df[df[nome_do_filtro].isin(st.session_state[chave])] if st.session_state[chave] else df
 def filtro_mes_nome(df):
-    meses_ordenados = {
-        'Janeiro': 1, 'Fevereiro': 2, 'Março': 3, 'Abril': 4,
-        'Maio': 5, 'Junho': 6, 'Julho': 7, 'Agosto': 8,
-        'Setembro': 9, 'Outubro': 10, 'Novembro': 11, 'Dezembro': 12
-    }
-    
+    meses_ordenados = {mes: i for i, mes in enumerate(MESES, start=1)}
+
     chave = 'main_filtro_mes'
-    
-    if chave not in st.session_state:
-        st.session_state[chave] = []
+    st.session_state.setdefault(chave, [])
 
-    opcoes_disponiveis = sorted(
-        df['Mês'].dropna().unique(),
-        key=lambda x: meses_ordenados.get(x, 99)
-    )
+    if isinstance(df['Mês'].dtype, pd.CategoricalDtype):
+        opcoes_disponiveis = opcoes_ordenadas(df['Mês'])
+    else:
+        opcoes_disponiveis = sorted(
+            df['Mês'].dropna().unique(),
+            key=lambda x: meses_ordenados.get(x, 99)
+        )
 
     filtro_opcao = st.multiselect(
         'Selecione o Mês',
         options=opcoes_disponiveis,
-        default=st.session_state[chave],
         key=chave
     )
     
     return df[df['Mês'].isin(st.session_state[chave])] if st.session_state[chave] else df
+
+
+# ----------------------------
+# Resultado dos filtros memorizado (compartilhado entre sessões)
+# ----------------------------
+LIMITE_ENTRADAS_FILTROS = 256
+LIMITE_BYTES_FILTROS = 256 * 1024 ** 2
+
+
+@st.cache_resource
+def cache_filtros():
+    """
+    Cache LRU (utils/cache_lru.py) dos bitmaps e posições de cada seleção
+    (e do que deriva só da seleção: séries filtradas, agrupamentos e rankings dos gráficos).
+    Um rerun que não muda a barra lateral (troca de aba, de tipo de gráfico) só consulta o cache.
+    """
+    return CacheLRU(LIMITE_ENTRADAS_FILTROS, LIMITE_BYTES_FILTROS)
+
+
+def chave_selecoes(selecoes):
+    """
+    Chave canônica das seleções: colunas e valores ordenados, filtros vazios descartados.
+    """
+    return tuple(sorted((coluna, tuple(sorted(valores))) for coluna, valores in (selecoes or {}).items() if valores))
+
+
+def selecao_memorizada(indice, selecoes):
+    """
+    Bitmap das seleções no índice, ou None quando nenhum filtro está ativo.
+    Calculado a partir do bitmap memorizado das demais colunas (prefixo da chave canônica).
+    """
+    chave = chave_selecoes(selecoes)
+    if not chave:
+        return None
+
+    def calcular():
+        *anteriores, (coluna, valores) = chave
+        return selecionar(indice, {coluna: list(valores)}, selecao_memorizada(indice, dict(anteriores)))
+
+    return cache_filtros().obter(('selecao', indice['chave'], chave), calcular)
+
+
+def posicoes_memorizadas(indice, selecoes):
+    """
+    Posições das linhas selecionadas, ou None quando nenhum filtro está ativo.
+    """
+    chave = chave_selecoes(selecoes)
+    if not chave:
+        return None
+    return cache_filtros().obter(('posicoes', indice['chave'], chave),
+                                 lambda: posicoes(indice, selecao_memorizada(indice, selecoes)))
+
+
+def filtro_indexado(indice, nome_do_filtro, selecoes=None, opcoes=None):
+    """
+    Multiselect resolvido pelo índice bitmap (utils/indice_bitmap.py), sem copiar o DataFrame.
+    - selecoes: {coluna: valores} dos filtros anteriores (as opções mostram só valores presentes neles)
+    - opcoes: opções fixas no lugar das do índice (ex.: todos os anos, inclusive os que não foram lidos)
+    Retorna as seleções acrescidas deste filtro.
+    """
+    chave = CHAVES_FILTROS.get(nome_do_filtro, f'main_filtro_{nome_do_filtro}')
+
+    # O valor do widget vem só da sessão (key): passar default= também faria o Streamlit avisar
+    # que o valor foi definido pela API do Session State (ver graficos em utils/paines.py)
+    st.session_state.setdefault(chave, [])
+
+    # Filtros da cascata consultam a hierarquia de opções; os demais testam o bitmap da seleção
+    hierarquia = indice.get('hierarquia')
+    if opcoes is None:
+        if hierarquia and nome_do_filtro in hierarquia['niveis']:
+            opcoes = opcoes_hierarquia(hierarquia, nome_do_filtro, selecoes)
+        else:
+            opcoes = valores_presentes(indice, nome_do_filtro, selecao_memorizada(indice, selecoes))
+
+    st.multiselect(
+        'Selecione o Mês' if nome_do_filtro == 'Mês' else f'Selecione {nome_do_filtro}',
+        options=opcoes,
+        key=chave
+    )
+
+    return {**(selecoes or {}), nome_do_filtro: list(st.session_state[chave])}
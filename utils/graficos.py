@@ -1,46 +1,125 @@
+import os
 import streamlit as st
 import altair as alt
 import plotly.express as px
 import pandas as pd
 import numpy as np
-from utils.totalizadores import formatar_milhar
+import plotly.io as pio
+from utils.cubo import COLUNA_CONTAGEM
+from utils.agregacao import Pedido, ROTULO_OUTROS, agregar, agrupar, cruzar, cruzamento_longo
+from utils.visao import Visao
+from utils.cache_lru import CacheLRU
+from utils.medicao import medir
+from utils.serializacao import compactar_figura, tamanho_figura, RegistroPayload
+from utils.amostragem import lttb
 
 
 
-def grafico_barra(df, coluna_x, coluna_y=None, titulo=None, top_n=None):
+# Gráficos de linha: pontos enviados ao Plotly por série (acima disso, redução LTTB) e
+# tamanho máximo da série para ainda mostrar rótulos, marcadores e eixo por categoria
+PONTOS_MAXIMOS_LINHA = 1000
+LIMITE_ROTULOS_LINHA = 60
+
+# Formato das datas no eixo e no tooltip por frequência do agrupamento
+FORMATO_DATA = {'MS': '%b/%Y', 'W-MON': '%d/%m/%Y', 'D': '%d/%m/%Y', 'h': '%d/%m/%Y %H:%M', 'H': '%d/%m/%Y %H:%M'}
+
+
+def tema_plotly():
+    # Tema automático, acompanhando o tema do Streamlit
+    return 'plotly_white' if st.get_option("theme.base") == "light" else 'plotly_dark'
+
+
+# ----------------------------
+# Cache de figuras prontas (JSON do Plotly), compartilhado entre sessões
+# ----------------------------
+# Chave: (tipo do gráfico, parâmetros, tema) + assinatura da seleção (Visao.assinatura).
+# Voltar a uma combinação já vista (ex.: alternar Treemap/Barra/Pizza) pula a agregação e a
+# montagem da figura; só a leitura do JSON é refeita.
+LIMITE_ENTRADAS_FIGURAS = 512
+LIMITE_BYTES_FIGURAS = 64 * 1024 ** 2
+
+# Figuras compactadas antes de ir para o navegador (utils/serializacao.py); PRF_FIGURAS_COMPACTAS=0 desliga
+COMPACTAR_FIGURAS = os.environ.get('PRF_FIGURAS_COMPACTAS', '1') != '0'
+
+
+@st.cache_resource
+def cache_figuras():
+    return CacheLRU(LIMITE_ENTRADAS_FIGURAS, LIMITE_BYTES_FIGURAS)
+
+
+def figura_memorizada(df, chave, construir):
     """
-    Gráfico de barras Plotly estilo Power BI, limpo:
-    - Sem títulos nos eixos
-    - Rótulos acima das barras
-    - Tooltip com percentual
-    - Tema light/dark automático
+    Figura do cache ou construída por construir() (que pode devolver None), já compactada.
+    - df: dados do gráfico; só uma Visao tem assinatura, DataFrames avulsos não passam pelo cache
+    - chave: tupla com tudo o que define a figura além dos dados
+    Tempos (utils/medicao.py): 'figura' inclui o agrupamento; 'serializacao' é compactar e (de)serializar.
     """
+    grafico = chave[0]
+    assinatura = df.assinatura if isinstance(df, Visao) else None
+    if assinatura is None:
+        with medir('figura', grafico=grafico):
+            fig = construir()
+        with medir('serializacao', grafico=grafico):
+            return _compactar(fig)
 
-    # Subtítulo no Streamlit
-    if titulo:
-        st.subheader(titulo)
+    def serializar():
+        with medir('figura', grafico=grafico):
+            fig = construir()
+        with medir('serializacao', grafico=grafico):
+            fig = _compactar(fig)
+            return None if fig is None else fig.to_json()
 
-    # Preparação dos dados
-    if coluna_y is None:
-        total = df.groupby(coluna_x).size().reset_index(name='Total')
-    else:
-        total = df.groupby(coluna_x)[coluna_y].sum().reset_index(name='Total')
+    serializada = cache_figuras().obter((chave, assinatura), serializar)
+    with medir('serializacao', grafico=grafico, cache=True):
+        return None if serializada is None else pio.from_json(serializada)
 
-    # Limita categorias
-    if top_n is not None:
-        total = total.nlargest(top_n, 'Total')
 
-    # Ordena para exibir barras em ordem decrescente
-    total = total.sort_values('Total', ascending=False)
-    total['Total_str'] = formatar_milhar(total['Total'])
-    # Calcula percentual
-    soma_total = total['Total'].sum()
-    total['Percentual'] = (total['Total'] / soma_total * 100).round(1) if soma_total else 0
+def _compactar(fig):
+    return compactar_figura(fig) if COMPACTAR_FIGURAS and fig is not None else fig
 
-    # Tema automático
-    tema = 'plotly_white' if st.get_option("theme.base") == "light" else 'plotly_dark'
 
-    # Criação do gráfico
+@st.cache_resource
+def registro_payload():
+    return RegistroPayload()
+
+
+def exibir_figura(fig, tipo, compactar=True, **opcoes):
+    """
+    st.plotly_chart registrando os bytes enviados ao navegador por tipo de gráfico.
+    - compactar: False quando a figura já veio de figura_memorizada (já compactada)
+    - opcoes: repassadas ao st.plotly_chart (key, on_select...)
+    """
+    with medir('serializacao', grafico=tipo):
+        if compactar:
+            fig = _compactar(fig)
+        registro_payload().registrar(tipo, tamanho_figura(fig))
+    with medir('envio', grafico=tipo):
+        return st.plotly_chart(fig, use_container_width=True, **opcoes)
+
+
+def totais(df, coluna, coluna_valor=None, top_n=None, cubo=None, freq=None, outros=False, percentual_total=False):
+    """
+    Totais de um gráfico pelo motor de agregação (utils/agregacao.py).
+    - outros: com top_n, soma as demais categorias em uma última linha 'Outros'
+    - percentual_total: Percentual sobre todas as categorias, não só as do top_n
+    Retorna DataFrame com [coluna, 'Total', 'Percentual', 'Total_str'].
+    """
+    pedido = Pedido(coluna, coluna_valor, top_n, freq, outros, percentual_total)
+    return agregar(df, [pedido], cubo)[pedido]
+
+
+# ----------------------------
+# Construtores de figuras: recebem os totais prontos e só desenham (sem Streamlit)
+# ----------------------------
+def figura_barra(total, coluna_x, tema='plotly_white'):
+    """
+    Barras estilo Power BI, limpo:
+    - Sem títulos nos eixos
+    - Rótulos acima das barras
+    - Tooltip com percentual
+    - Linha 'Outros' (se houver) sempre por último
+    """
+    com_outros = (total[coluna_x] == ROTULO_OUTROS).any()
     fig = px.bar(
         total,
         x=coluna_x,
@@ -57,56 +136,17 @@ def grafico_barra(df, coluna_x, coluna_y=None, titulo=None, top_n=None):
     fig.update_layout(
         template=tema,
         yaxis=dict(title=None, showticklabels=False),
-        xaxis=dict(title=None, showticklabels=True, categoryorder='total descending'),
+        # Os totais já vêm em ordem decrescente, com 'Outros' no fim
+        xaxis=dict(title=None, showticklabels=True, categoryorder='trace' if com_outros else 'total descending'),
         showlegend=False
     )
-
-    st.plotly_chart(fig, use_container_width=True)
-
-
-
+    return fig
 
 
-# Grafico de pizza
-
-def grafico_pizza(df, coluna_categoria, coluna_valor=None, titulo=None, top_n=None):
+def figura_pizza(total, coluna_categoria, tema='plotly_white'):
     """
-    Cria gráfico de Pizza (torta) Plotly dinâmico, com rótulos de percentual.
-    - coluna_categoria: A fatia da pizza (Região, Tipo Acidente, etc.)
-    - coluna_valor: soma de valores (Mortos, Feridos) ou None para contar linhas
-    - top_n: para limitar categorias
-    - titulo: título do gráfico
+    Pizza (torta) com rótulos de percentual.
     """
-    if titulo:
-        st.subheader(titulo)
-
-    # 1. Agregação dos dados
-    if coluna_valor is None:
-        total = df.groupby(coluna_categoria).size().reset_index(name='Total')
-    else:
-        total = df.groupby(coluna_categoria)[coluna_valor].sum().reset_index(name='Total')
-
-    # 2. Limita as categorias
-    if top_n is not None:
-        total = total.nlargest(top_n, 'Total')
-
-    # 3. Tratamento de dataframe vazio
-    if total.empty:
-        st.warning(f"Não há dados para exibir no gráfico: {titulo or ''}")
-        return
-
-    # 4. Calcula colunas para o Tooltip
-    soma_geral = total['Total'].sum()
-    total['Percentual'] = (total['Total'] / soma_geral * 100) if soma_geral > 0 else 0
-    total['Total_str'] = total['Total'].apply(formatar_milhar)
-
-    # 5. Ordena
-    total = total.sort_values('Total', ascending=False)
-    
-    # 6. Tema
-    tema = 'plotly_white' if st.get_option("theme.base") == "light" else 'plotly_dark'
-
-    # --- 7. CORREÇÃO DO GRÁFICO DE PIZZA ---
     fig = px.pie(
         total,
         names=coluna_categoria,    # As fatias
@@ -115,9 +155,8 @@ def grafico_pizza(df, coluna_categoria, coluna_valor=None, titulo=None, top_n=No
         color_discrete_sequence=px.colors.sequential.Blues[2:], # Usa a paleta de azuis
         custom_data=['Total_str', 'Percentual']
     )
-    # --- FIM DA CORREÇÃO ---
 
-    # 8. Ajustes de Rótulos e Tooltip
+    # Ajustes de Rótulos e Tooltip
     fig.update_traces(
         # Rótulo externo: usa o %{percent} interno
         texttemplate="%{percent:.1%}",
@@ -133,55 +172,23 @@ def grafico_pizza(df, coluna_categoria, coluna_valor=None, titulo=None, top_n=No
         sort=True
     )
 
-    # 9. Ajustes de Layout
+    # Ajustes de Layout
     fig.update_layout(
         template=tema,
         margin=dict(t=25, l=0, r=0, b=0),
         font=dict(size=13),
         showlegend=True
-        # 'coloraxis_showscale=False' removido, pois não há eixo de cor
     )
-
-    # 10. Renderiza
-    return st.plotly_chart(fig, use_container_width=True)
-
-# Grafico de area
+    return fig
 
 
-def grafico_treemap(df, coluna_categoria, coluna_valor=None, titulo=None, top_n=None):
+def figura_treemap(total, coluna_categoria):
     """
-    Cria gráfico Treemap interativo com Plotly Express em tons de azul.
-    - coluna_categoria: As caixas do treemap (Região, Tipo Acidente, etc.)
-    - coluna_valor: O tamanho das caixas (Mortos, Feridos) ou None para contar linhas
-    - top_n: limita categorias
-    - titulo: título do gráfico
+    Treemap em tons de azul, com valor e percentual dentro de cada bloco.
     """
-    if titulo:
-        st.subheader(titulo)
+    # Texto dentro do bloco: valor + percentual
+    texto = total['Total_str'] + " (" + total['Percentual'].astype(str) + "%)"
 
-    # 1. Agregação dos dados
-    if coluna_valor is None:
-        total = df.groupby(coluna_categoria).size().reset_index(name='Total')
-    else:
-        total = df.groupby(coluna_categoria)[coluna_valor].sum().reset_index(name='Total')
-
-    # 2. Limita Top N categorias
-    if top_n is not None:
-        total = total.nlargest(top_n, 'Total')
-
-    # 3. Ordena do maior para o menor
-    total = total.sort_values('Total', ascending=False)
-
-    # 4. Calcula percentual
-    total['Percentual'] = (total['Total'] / total['Total'].sum() * 100).round(1)
-
-    # 5. Cria coluna formatada com ponto de milhar
-    total['Total_str'] = formatar_milhar(total['Total'])
-
-    # 6. Texto dentro do bloco: valor + percentual
-    total['Texto'] = total['Total_str'] + " (" + total['Percentual'].astype(str) + "%)"
-
-    # 7. Criação do Treemap
     fig = px.treemap(
         total,
         path=[coluna_categoria],
@@ -190,120 +197,225 @@ def grafico_treemap(df, coluna_categoria, coluna_valor=None, titulo=None, top_n=
         color_continuous_scale='Blues'
     )
 
-    # 8. Exibir o valor dentro do bloco e desativar tooltip
+    # Exibir o valor dentro do bloco e desativar tooltip
     fig.update_traces(
         texttemplate="%{label}<br>%{customdata[0]}",
         textinfo="label+text",
-        customdata=total[['Texto']],
+        customdata=texto.to_frame(),
         hoverinfo='skip',     # remove completamente o hover
         hovertemplate=None
     )
 
-    # 9. Ajustes de layout
+    # Ajustes de layout
     fig.update_layout(
         margin=dict(t=25, l=0, r=0, b=0),
         font=dict(size=14),
         coloraxis_colorbar=dict(title="Total")
     )
-
-    # 10. Renderiza no Streamlit
-    return st.plotly_chart(fig, use_container_width=True)
+    return fig
 
 
-def grafico_linha(df, coluna_x, coluna_y=None, titulo=None, top_n=None, freq=None):
+def figura_linha(total, coluna_x, tema='plotly_white', freq=None, max_pontos=PONTOS_MAXIMOS_LINHA):
     """
-    Gráfico de linha Plotly estilo Power BI.
-    - freq: frequência para preencher valores ausentes ('H', 'D', 'MS', 'M', etc).
-    - Adapta-se automaticamente ao tema do Streamlit.
-    - Exibe rótulos e tooltips.
+    Linha estilo Power BI, com rótulos e tooltip.
+    - freq: total agrupado por período de data; o eixo mostra Mês/Ano ou hora
+    - max_pontos: séries de data mais longas são reduzidas por LTTB (utils/amostragem.py),
+      mantendo o formato e os picos
+    Séries curtas (até LIMITE_ROTULOS_LINHA pontos) têm rótulos e eixo por categoria;
+    séries longas viram uma linha simples em eixo de datas.
     """
-
-    if titulo:
-        st.subheader(titulo)
-
-    # Verifica se coluna_x existe
-    if coluna_x not in df.columns:
-        st.error(f"Erro: Coluna '{coluna_x}' não encontrada.")
-        return
-
-    # Detecta tipo de coluna
-    is_date_column = pd.api.types.is_datetime64_any_dtype(df[coluna_x])
-    if is_date_column:
-        df[coluna_x] = pd.to_datetime(df[coluna_x])
-
-    # Agrupamento
-    if is_date_column:
-        freq = freq or 'MS'  # padrão mês
-        if coluna_y is None:
-            total = df.groupby(pd.Grouper(key=coluna_x, freq=freq)).size().reset_index(name='Total')
-        else:
-            total = df.groupby(pd.Grouper(key=coluna_x, freq=freq))[coluna_y].sum().reset_index(name='Total')
-
-        # Preenche todos os valores do eixo
-        todas_datas = pd.date_range(start=total[coluna_x].min(),
-                                    end=total[coluna_x].max(),
-                                    freq=freq)
-        total = pd.merge(pd.DataFrame({coluna_x: todas_datas}),
-                         total,
-                         on=coluna_x,
-                         how='left')
-        total['Total'] = total['Total'].fillna(0)
-        total['Percentual'] = (total['Total'] / total['Total'].sum() * 100).round(1) if total['Total'].sum() else 0
-        # Formatação Mês/Ano ou hora
-        if freq in ['H', 'h']:
-            total['Eixo'] = total[coluna_x].dt.strftime('%H:%M')
-        else:
-            total['Eixo'] = total[coluna_x].dt.strftime('%b/%Y')
-
-    else:
-        if coluna_y is None:
-            total = df.groupby(coluna_x).size().reset_index(name='Total')
-        else:
-            total = df.groupby(coluna_x)[coluna_y].sum().reset_index(name='Total')
-        total['Percentual'] = (total['Total'] / total['Total'].sum() * 100).round(1) if total['Total'].sum() else 0
-        if top_n:
-            total = total.nlargest(top_n, 'Total')
+    if freq is None:
+        # Categorias na ordem da coluna (calendário para Mês e Dia Semana)
         total = total.sort_values(coluna_x)
-        total['Eixo'] = total[coluna_x].astype(str)
+    elif len(total) > max_pontos:
+        total = total.iloc[lttb(total[coluna_x].to_numpy(), total['Total'].to_numpy(), max_pontos)]
+
+    curta = len(total) <= LIMITE_ROTULOS_LINHA
+    if freq is None:
+        eixo = total[coluna_x].astype(str)
+    elif not curta:
+        # Eixo de datas: sem texto por ponto
+        eixo = total[coluna_x]
+    elif freq in ['H', 'h']:
+        eixo = total[coluna_x].dt.strftime('%H:%M')
+    else:
+        eixo = total[coluna_x].dt.strftime('%b/%Y')
+    total = total.assign(Eixo=eixo)
 
-    # Tema Plotly automático
-    tema = 'plotly_white' if st.get_option("theme.base") == "light" else 'plotly_dark'
-    total['Total_str'] = formatar_milhar(total['Total'])
-    # Criação do gráfico
     fig = px.line(
         total,
         x='Eixo',
         y='Total',
-        markers=True,
-        text='Total_str',
+        markers=curta,
+        text='Total_str' if curta else None,
         labels={'Total': 'Total', 'Eixo': coluna_x}
-        #title=titulo
     )
 
-    fig.update_traces(textposition='top center')
+    if curta:
+        fig.update_traces(textposition='top center')
 
     # Ajustes do layout
     fig.update_layout(
         template=tema,
         hovermode='x unified',
-        #title_x=0.5,
         xaxis_title=coluna_x,
         yaxis_title=None
     )
 
-    # Força o eixo X como categórico para mostrar todos os itens
-    fig.update_xaxes(type='category')
+    if curta:
+        # Força o eixo X como categórico para mostrar todos os itens
+        fig.update_xaxes(type='category')
+    else:
+        fig.update_xaxes(type='date', hoverformat=FORMATO_DATA.get(freq, '%d/%m/%Y'))
+    return fig
+
+
+def figura_coluna(total, coluna_x, tema='plotly_white'):
+    """
+    Colunas (barras horizontais) estilo Power BI, com rótulos e tooltip de percentual.
+    """
+    # Ordem crescente: a maior categoria fica no topo ('Outros', se houver, embaixo de todas)
+    if (total[coluna_x] == ROTULO_OUTROS).any():
+        total = total.iloc[::-1]
+    else:
+        total = total.sort_values('Total', ascending=True)
+
+    fig = px.bar(
+        total,
+        x='Total',
+        y=coluna_x,
+        text='Total_str',
+        hover_data={'Percentual': True},
+    )
+
+    fig.update_traces(
+        marker_color='#1f77b4',  # cor fixa aqui
+        textposition='outside'
+    )
+
+    fig.update_layout(
+        template=tema,
+        yaxis=dict(title=None, showticklabels=True),
+        xaxis=dict(title=None, showticklabels=True, categoryorder='total descending'),
+        showlegend=False,
+        margin=dict(t=25, l=0, r=0, b=0),
+        font=dict(size=13),
+    )
+    return fig
 
-    st.plotly_chart(fig, use_container_width=True)
+
+# ----------------------------
+# Gráficos no Streamlit: agregam pelo motor, montam a figura e exibem
+# ----------------------------
+def grafico_barra(df, coluna_x, coluna_y=None, titulo=None, top_n=None, cubo=None, outros=False):
+    """
+    Gráfico de barras Plotly estilo Power BI (ver figura_barra).
+    - Tema light/dark automático
+    - cubo: cubo de agregados filtrado (opcional, ver utils/agregacao.py)
+    - outros: com top_n, mostra as demais categorias somadas em 'Outros'
+    """
+
+    # Subtítulo no Streamlit
+    if titulo:
+        st.subheader(titulo)
+
+    tema = tema_plotly()
+    fig = figura_memorizada(df, ('barra', coluna_x, coluna_y, top_n, outros, tema),
+                            lambda: figura_barra(totais(df, coluna_x, coluna_y, top_n, cubo, outros=outros),
+                                                 coluna_x, tema))
+    exibir_figura(fig, 'barra', compactar=False)
+
+
+# Grafico de pizza
+
+def grafico_pizza(df, coluna_categoria, coluna_valor=None, titulo=None, top_n=None, cubo=None):
+    """
+    Cria gráfico de Pizza (torta) Plotly dinâmico, com rótulos de percentual.
+    - coluna_categoria: A fatia da pizza (Região, Tipo Acidente, etc.)
+    - coluna_valor: soma de valores (Mortos, Feridos) ou None para contar linhas
+    - top_n: para limitar categorias
+    - titulo: título do gráfico
+    - cubo: cubo de agregados filtrado (opcional, ver utils/agregacao.py)
+    """
+    if titulo:
+        st.subheader(titulo)
+
+    tema = tema_plotly()
+
+    def construir():
+        total = totais(df, coluna_categoria, coluna_valor, top_n, cubo)
+        return None if total.empty else figura_pizza(total, coluna_categoria, tema)
+
+    fig = figura_memorizada(df, ('pizza', coluna_categoria, coluna_valor, top_n, tema), construir)
+
+    # Tratamento de dataframe vazio
+    if fig is None:
+        st.warning(f"Não há dados para exibir no gráfico: {titulo or ''}")
+        return
+
+    return exibir_figura(fig, 'pizza', compactar=False)
+
+# Grafico de area
+
+
+def grafico_treemap(df, coluna_categoria, coluna_valor=None, titulo=None, top_n=None, cubo=None, outros=False):
+    """
+    Cria gráfico Treemap interativo com Plotly Express em tons de azul.
+    - coluna_categoria: As caixas do treemap (Região, Tipo Acidente, etc.)
+    - coluna_valor: O tamanho das caixas (Mortos, Feridos) ou None para contar linhas
+    - top_n: limita categorias
+    - titulo: título do gráfico
+    - cubo: cubo de agregados filtrado (opcional, ver utils/agregacao.py)
+    - outros: com top_n, as demais categorias viram uma caixa 'Outros'
+    """
+    if titulo:
+        st.subheader(titulo)
+
+    fig = figura_memorizada(df, ('treemap', coluna_categoria, coluna_valor, top_n, outros, tema_plotly()),
+                            lambda: figura_treemap(totais(df, coluna_categoria, coluna_valor, top_n, cubo,
+                                                          outros=outros), coluna_categoria))
+    return exibir_figura(fig, 'treemap', compactar=False)
+
+
+def grafico_linha(df, coluna_x, coluna_y=None, titulo=None, top_n=None, freq=None, cubo=None,
+                  max_pontos=PONTOS_MAXIMOS_LINHA):
+    """
+    Gráfico de linha Plotly estilo Power BI.
+    - freq: frequência do agrupamento de colunas de data ('h', 'D', 'MS', etc); padrão mês
+    - max_pontos: limite de pontos desenhados em séries de data (ver figura_linha)
+    - Adapta-se automaticamente ao tema do Streamlit.
+    - Exibe rótulos e tooltips.
+    """
+
+    if titulo:
+        st.subheader(titulo)
+
+    # Verifica se coluna_x existe
+    if coluna_x not in df.columns:
+        st.error(f"Erro: Coluna '{coluna_x}' não encontrada.")
+        return
+
+    # Colunas de data são agrupadas por período (sem alterar o df, que é compartilhado)
+    if pd.api.types.is_datetime64_any_dtype(df.dtypes[coluna_x]):
+        freq = freq or 'MS'  # padrão mês
+    else:
+        freq = None
+
+    tema = tema_plotly()
+    fig = figura_memorizada(df, ('linha', coluna_x, coluna_y, top_n, freq, max_pontos, tema),
+                            lambda: figura_linha(totais(df, coluna_x, coluna_y, top_n, cubo, freq,
+                                                        percentual_total=True), coluna_x, tema, freq, max_pontos))
+    exibir_figura(fig, 'linha', compactar=False)
 
 # Gráfico de radar
 
-def grafico_radar(df, coluna_categoria, coluna_grupo, titulo):
+def grafico_radar(df, coluna_categoria, coluna_grupo, titulo, cubo=None):
     """
     Cria gráfico de radar (teia) interativo com Plotly.
     - coluna_categoria: eixo angular (ex: 'Grupo Via', 'Condicao Metereologica')
     - coluna_grupo: separação por cor (ex: 'Tipo Acidente')
     - titulo: título do gráfico
+    - cubo: cubo de agregados filtrado (opcional)
     """
 
     # Verifica se as colunas existem
@@ -314,36 +426,78 @@ def grafico_radar(df, coluna_categoria, coluna_grupo, titulo):
         st.error(f"Coluna '{coluna_grupo}' não encontrada no DataFrame.")
         return
 
-    # Agrupa os dados (conta registros)
-    if coluna_grupo:
-        df_agg = df.groupby([coluna_categoria, coluna_grupo]).size().reset_index(name='Total')
-    else:
-        df_agg = df.groupby(coluna_categoria).size().reset_index(name='Total')
-
-    # Calcula percentual sobre o total geral
-    total_geral = df_agg['Total'].sum()
-    df_agg['Percentual'] = (df_agg['Total'] / total_geral * 100).round(2)
-
-    # Cria gráfico radar
-    fig = px.line_polar(
-        df_agg,
-        r='Total',
-        theta=coluna_categoria,
-        color=coluna_grupo if coluna_grupo else None,
-        line_close=True,
-        hover_data={'Total': True, 'Percentual': True},
-        template='plotly_white'
-    )
+    def construir():
+        # Conta os acidentes por par (tabela de contingência, utils/agregacao.py), pelo cubo quando ele tem as duas
+        if coluna_grupo:
+            df_agg = cruzamento_longo(cruzar(df, coluna_categoria, coluna_grupo, cubo))
+        else:
+            df_agg = agrupar(df, coluna_categoria, cubo)
+        df_agg = df_agg[[c for c in (coluna_categoria, coluna_grupo) if c] + [COLUNA_CONTAGEM]]
+        df_agg = df_agg.rename(columns={COLUNA_CONTAGEM: 'Total'})
+
+        # Calcula percentual sobre o total geral
+        total_geral = df_agg['Total'].sum()
+        df_agg['Percentual'] = (df_agg['Total'] / total_geral * 100).round(2)
+
+        # Cria gráfico radar
+        fig = px.line_polar(
+            df_agg,
+            r='Total',
+            theta=coluna_categoria,
+            color=coluna_grupo if coluna_grupo else None,
+            line_close=True,
+            hover_data={'Total': True, 'Percentual': True},
+            template='plotly_white'
+        )
+
+        fig.update_traces(fill='toself', hovertemplate='%{theta}<br>Total: %{r}<br>%{customdata[1]}%<extra></extra>')
+        fig.update_layout(
+            title=titulo,
+            polar=dict(radialaxis=dict(visible=True, linewidth=1, gridcolor='lightgray')),
+            showlegend=True
+        )
+        return fig
+
+    fig = figura_memorizada(df, ('radar', coluna_categoria, coluna_grupo, titulo, tema_plotly()), construir)
+    exibir_figura(fig, 'radar', compactar=False)
+    
 
-    fig.update_traces(fill='toself', hovertemplate='%{theta}<br>Total: %{r}<br>%{customdata[1]}%<extra></extra>')
-    fig.update_layout(
-        title=titulo,
-        polar=dict(radialaxis=dict(visible=True, linewidth=1, gridcolor='lightgray')),
-        showlegend=True
+def figura_tabela_calor(cruzamento, medida=None, tema='plotly_white'):
+    """
+    Tabela de calor (linha x coluna) de um Cruzamento, com o valor escrito em cada célula.
+    - medida: matriz exibida (Mortos, Feridos, Veiculos) ou None para acidentes
+    """
+    matriz = cruzamento.matrizes[medida or COLUNA_CONTAGEM]
+    fig = px.imshow(
+        matriz,
+        x=[str(rotulo) for rotulo in cruzamento.rotulos_coluna],
+        y=[str(rotulo) for rotulo in cruzamento.rotulos_linha],
+        labels={'x': cruzamento.coluna, 'y': cruzamento.linha, 'color': medida or COLUNA_CONTAGEM},
+        color_continuous_scale='Blues',
+        text_auto=bool(matriz.size <= 600),  # texto só enquanto as células são legíveis
+        aspect='auto'
     )
+    fig.update_xaxes(type='category', side='top')
+    fig.update_yaxes(type='category')
+    fig.update_layout(template=tema, height=max(400, 28 * len(cruzamento.rotulos_linha)),
+                      margin=dict(t=60, l=0, r=0, b=0))
+    return fig
+
+
+def grafico_tabela_calor(df, coluna_linha, coluna_coluna, medida=None, titulo=None, cubo=None):
+    """
+    Tabela de calor entre duas dimensões (ex.: Tipo Acidente x Ano, Municipio x Hora).
+    - medida: soma de Mortos, Feridos, Veiculos ou None para contar acidentes
+    - cubo: cubo de agregados filtrado (opcional, ver utils/agregacao.py)
+    """
+    if titulo:
+        st.subheader(titulo)
+
+    tema = tema_plotly()
+    fig = figura_memorizada(df, ('tabela_calor', coluna_linha, coluna_coluna, medida, tema),
+                            lambda: figura_tabela_calor(cruzar(df, coluna_linha, coluna_coluna, cubo), medida, tema))
+    exibir_figura(fig, 'tabela de calor', compactar=False)
 
-    st.plotly_chart(fig, use_container_width=True)
-    
 
 def grafico_scater(df, coluna_x, coluna_y, tamanho_y, cor_bola, nome_bola, titulo, key=None):
     """
@@ -376,7 +530,7 @@ def grafico_scater(df, coluna_x, coluna_y, tamanho_y, cor_bola, nome_bola, titul
     if key is None:
         key = f"{coluna_x}_{coluna_y}_{cor_bola}"
 
-    return st.plotly_chart(fig, use_container_width=True, key=key)
+    return exibir_figura(fig, 'dispersao', key=key)
 
 
 
@@ -402,7 +556,8 @@ def grafico_heatmap(df, coluna_valor, titulo):
     df['Latitude'] = pd.to_numeric(df['Latitude'], errors='coerce')
     df['Longitude'] = pd.to_numeric(df['Longitude'], errors='coerce')
     df[coluna_valor] = pd.to_numeric(df[coluna_valor], errors='coerce')
-    df['Km'] = pd.to_numeric(df.get('Km', 0), errors='coerce')
+    # Km com uma casa (o tooltip mostra uma); float32 viraria 553.0999755859375 no JSON
+    df['Km'] = pd.to_numeric(df.get('Km', 0), errors='coerce').astype('float64').round(1)
     df = df.dropna(subset=['Latitude', 'Longitude', coluna_valor])
 
     if df.empty:
@@ -478,67 +633,75 @@ def grafico_heatmap(df, coluna_valor, titulo):
     return fig
 
 
-def grafico_coluna(df, coluna_x, coluna_y=None, titulo=None, top_n=None):
+def figura_heatmap_grade(celulas, coluna_valor, titulo, zoom):
     """
-    Gráfico de colunas Plotly estilo Power BI, limpo:
-    - Colunas verticais
-    - Rótulos acima das colunas (com ponto de milhar)
-    - Tooltip com percentual e valor
-    - Tema light/dark automático
+    Mapa de calor a partir das células da grade (utils/espacial.py), já agregadas no servidor.
+    - celulas: DataFrame com Latitude, Longitude, Acidentes e Peso (soma de coluna_valor)
+    - zoom: zoom inicial do mapa; a grade foi escolhida para esse zoom
+    O tamanho da figura depende do número de células, não do número de acidentes.
     """
+    if celulas is None or celulas.empty:
+        return None
 
-    # Subtítulo no Streamlit
-    if titulo:
-        st.subheader(titulo)
-
-    # Preparação dos dados
-    if coluna_y is None:
-        total = df.groupby(coluna_x).size().reset_index(name='Total')
-    else:
-        total = df.groupby(coluna_x)[coluna_y].sum().reset_index(name='Total')
-
-    # Limita categorias
-    if top_n is not None:
-        total = total.nlargest(top_n, 'Total')
-
-    # Ordena para exibir colunas em ordem decrescente
-    total = total.sort_values('Total', ascending=True)
-
-    # Formata valor e percentual
-    soma_total = total['Total'].sum()
-    total['Total_str'] = total['Total'].apply(formatar_milhar)
-    total['Percentual'] = (total['Total'] / soma_total * 100).round(1) if soma_total else 0
+    celulas = celulas.rename(columns={'Peso': coluna_valor})
 
-    # Tema automático
-    tema = 'plotly_white' if st.get_option("theme.base") == "light" else 'plotly_dark'
+    #  Ajuste de escala e saturação 
+    range_color = [0, np.percentile(celulas[coluna_valor], 95)]
 
-    # Criação do gráfico
-    fig = px.bar(
-        total,
-        x='Total',
-        y=coluna_x,
-        text='Total_str',
-        hover_data={'Percentual': True},
-    )
+    if coluna_valor == "Mortos":
+        escala = "Reds"
+    elif coluna_valor == "Feridos":
+        escala = "Purples"
+    else:
+        escala = "Blues"
 
-    fig.update_traces(
-        marker_color='#1f77b4',  # cor fixa aqui
-        textposition='outside'
+    fig = px.density_mapbox(
+        celulas,
+        lat='Latitude',
+        lon='Longitude',
+        z=coluna_valor,
+        radius=10,
+        hover_data={'Latitude': ':.2f', 'Longitude': ':.2f', 'Acidentes': True, coluna_valor: ':.0f'},
+        center=dict(lat=-14.2, lon=-54.0),  # foco no centro do Brasil
+        zoom=zoom,
+        mapbox_style="carto-positron",
+        color_continuous_scale=escala,
+        range_color=range_color,
+        title=titulo
     )
-    
 
     fig.update_layout(
-        template=tema,
-        yaxis=dict(title=None, showticklabels=True),
-        xaxis=dict(title=None, showticklabels=True, categoryorder='total descending'),
-        showlegend=False,
-        margin=dict(t=25, l=0, r=0, b=0),
-        font=dict(size=13),
+        height=650,
+        margin=dict(l=0, r=0, t=60, b=0),
+        coloraxis_colorbar=dict(
+            title=coluna_valor,
+            thicknessmode="pixels",
+            thickness=18,
+            lenmode="fraction",
+            len=0.7,
+        ),
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)"
     )
+    fig.update_traces(opacity=0.85)
 
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
 
+def grafico_coluna(df, coluna_x, coluna_y=None, titulo=None, top_n=None, cubo=None, outros=False):
+    """
+    Gráfico de colunas Plotly estilo Power BI (ver figura_coluna).
+    - Tema light/dark automático
+    - cubo: cubo de agregados filtrado (opcional, ver utils/agregacao.py)
+    - outros: com top_n, mostra as demais categorias somadas em 'Outros'
+    """
 
-    
-    
+    # Subtítulo no Streamlit
+    if titulo:
+        st.subheader(titulo)
+
+    tema = tema_plotly()
+    fig = figura_memorizada(df, ('coluna', coluna_x, coluna_y, top_n, outros, tema),
+                            lambda: figura_coluna(totais(df, coluna_x, coluna_y, top_n, cubo, outros=outros),
+                                                 coluna_x, tema))
+    exibir_figura(fig, 'coluna', compactar=False)
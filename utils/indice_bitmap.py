@@ -0,0 +1,180 @@
+import itertools
+import numpy as np
+import pandas as pd
+
+
+
+# ----------------------------
+# Índice bitmap por valor das colunas de filtro
+# ----------------------------
+# Cada valor guarda as linhas em que aparece:
+# - valores frequentes: bitmap compactado (np.packbits, 1 bit por linha)
+# - valores raros (ex.: um município): lista de posições int32, que ocupa menos que o bitmap
+# A seleção é resolvida como OU entre valores do mesmo filtro e E entre filtros.
+
+# Abaixo de 1 linha a cada 32 a lista de posições (32 bits por linha) é menor que o bitmap
+DENSIDADE_MINIMA_BITMAP = 1 / 32
+
+
+def _codigos(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy(), list(serie.cat.categories)
+    codigos, valores = pd.factorize(serie, sort=True)
+    return codigos, list(valores)
+
+
+def construir_indice(df, colunas):
+    """
+    Monta o índice para as colunas pedidas (as que não existem no df são ignoradas).
+    - Valores em ordem de categoria (calendário para Mês), como nos filtros
+    Retorna {'linhas': n, 'colunas': {coluna: {valor: bitmap ou posições}}}.
+    """
+    n = len(df)
+    indice = {'linhas': n, 'colunas': {}}
+    for coluna in colunas:
+        if coluna not in df.columns:
+            continue
+        codigos, valores = _codigos(df[coluna])
+
+        # Agrupa as posições por código com uma ordenação só (evita um scan por valor)
+        ordem = np.argsort(codigos, kind='stable').astype(np.int32)
+        contagens = np.bincount(codigos[codigos >= 0], minlength=len(valores))
+        inicio = np.count_nonzero(codigos < 0)  # NaN (código -1) fica fora do índice
+
+        por_valor = {}
+        for codigo, contagem in enumerate(contagens):
+            if contagem == 0:
+                continue
+            posicoes = ordem[inicio:inicio + contagem]
+            inicio += contagem
+            if contagem >= DENSIDADE_MINIMA_BITMAP * n:
+                mascara = np.zeros(n, dtype=bool)
+                mascara[posicoes] = True
+                por_valor[valores[codigo]] = np.packbits(mascara)
+            else:
+                por_valor[valores[codigo]] = np.sort(posicoes)
+        indice['colunas'][coluna] = por_valor
+    return indice
+
+
+def _bitmap_vazio(indice):
+    return np.zeros((indice['linhas'] + 7) // 8, dtype=np.uint8)
+
+
+def _ou(acumulado, bitmap):
+    if bitmap.dtype == np.uint8:
+        np.bitwise_or(acumulado, bitmap, out=acumulado)
+    else:
+        np.bitwise_or.at(acumulado, bitmap >> 3, (0x80 >> (bitmap & 7)).astype(np.uint8))
+    return acumulado
+
+
+def _intersecta(bitmap, selecao):
+    if bitmap.dtype == np.uint8:
+        return bool(np.bitwise_and(bitmap, selecao).any())
+    return bool((selecao[bitmap >> 3] & (0x80 >> (bitmap & 7))).any())
+
+
+def selecionar(indice, selecoes, selecao=None):
+    """
+    Resolve as seleções em um único bitmap.
+    - selecoes: {coluna: valores}; lista vazia = sem filtro naquela coluna
+    - selecao: bitmap anterior para combinar (E); None = todas as linhas
+    Retorna o bitmap compactado, ou None quando nenhum filtro está ativo.
+    """
+    for coluna, valores in selecoes.items():
+        if not valores or coluna not in indice['colunas']:
+            continue
+        por_valor = indice['colunas'][coluna]
+        filtro = _bitmap_vazio(indice)
+        for valor in valores:
+            if valor in por_valor:
+                _ou(filtro, por_valor[valor])
+        selecao = filtro if selecao is None else np.bitwise_and(selecao, filtro)
+    return selecao
+
+
+def valores_presentes(indice, coluna, selecao=None):
+    """
+    Valores da coluna que aparecem nas linhas selecionadas, na ordem do índice.
+    Usado para as opções dos filtros em cascata.
+    """
+    por_valor = indice['colunas'].get(coluna, {})
+    if selecao is None:
+        return list(por_valor)
+    return [valor for valor, bitmap in por_valor.items() if _intersecta(bitmap, selecao)]
+
+
+def posicoes(indice, selecao):
+    """
+    Converte o bitmap em posições de linha (para df.iloc / df.take).
+    """
+    return np.flatnonzero(np.unpackbits(selecao, count=indice['linhas']))
+
+
+# ----------------------------
+# Hierarquia de opções dos filtros em cascata
+# ----------------------------
+# Para cada nível (Ano -> Mês -> Região -> Uf -> Municipio) guarda, por prefixo dos níveis
+# anteriores, a lista ordenada de valores que aparecem. None no prefixo = filtro vazio (qualquer valor).
+# As opções de um multiselect saem de consultas ao dicionário, sem passar pelas linhas.
+
+
+def construir_hierarquia(df, niveis):
+    """
+    Monta a hierarquia de opções sobre as combinações distintas dos níveis.
+    - niveis: colunas na ordem da cascata (as que não existem no df são ignoradas)
+    Retorna {'niveis', 'valores': {coluna: valores}, 'codigos': {coluna: {valor: código}},
+             'filhos': {coluna: {prefixo de códigos: códigos ordenados}}}.
+    """
+    niveis = [coluna for coluna in niveis if coluna in df.columns]
+    codigos, valores = {}, {}
+    for coluna in niveis:
+        codigos[coluna], valores[coluna] = _codigos(df[coluna])
+    combinacoes = pd.DataFrame(codigos).drop_duplicates()
+
+    filhos = {}
+    for k, filho in enumerate(niveis):
+        anteriores = niveis[:k]
+        por_prefixo = {}
+        # Um agrupamento por padrão de prefixo (cada nível anterior fixo ou None)
+        for padrao in itertools.product([True, False], repeat=k):
+            usados = [coluna for coluna, fixo in zip(anteriores, padrao) if fixo]
+            validas = combinacoes[(combinacoes[usados + [filho]] >= 0).all(axis=1)]
+            if usados:
+                grupos = validas.groupby(usados)[filho].unique()
+            else:
+                grupos = pd.Series([validas[filho].unique()], index=[()])
+            for chave, presentes in grupos.items():
+                chave = iter(chave if isinstance(chave, tuple) else (chave,))
+                prefixo = tuple(int(next(chave)) if fixo else None for fixo in padrao)
+                por_prefixo[prefixo] = np.sort(presentes)
+        filhos[filho] = por_prefixo
+
+    return {
+        'niveis': niveis,
+        'valores': valores,
+        'codigos': {coluna: {valor: i for i, valor in enumerate(valores[coluna])} for coluna in niveis},
+        'filhos': filhos,
+    }
+
+
+def opcoes_hierarquia(hierarquia, coluna, selecoes=None):
+    """
+    Opções da coluna dadas as seleções dos níveis anteriores, na ordem do índice.
+    - selecoes: {coluna: valores}; níveis sem seleção valem como None (qualquer valor)
+    Com várias seleções num nível, junta as listas de cada prefixo.
+    """
+    niveis = hierarquia['niveis']
+    eixos = []
+    for anterior in niveis[:niveis.index(coluna)]:
+        escolhidos = (selecoes or {}).get(anterior) or []
+        codigos = hierarquia['codigos'][anterior]
+        eixos.append([codigos[v] for v in escolhidos if v in codigos] if escolhidos else [None])
+
+    por_prefixo = hierarquia['filhos'][coluna]
+    partes = [por_prefixo[prefixo] for prefixo in itertools.product(*eixos) if prefixo in por_prefixo]
+    if not partes:
+        return []
+    valores = hierarquia['valores'][coluna]
+    return [valores[codigo] for codigo in np.unique(np.concatenate(partes))]
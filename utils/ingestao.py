@@ -0,0 +1,333 @@
+import os
+import json
+import glob
+import argparse
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from utils.esquema import MESES
+from utils.cubo import atualizar_cubo
+from utils.series_temporais import atualizar_series
+from utils.carregamento import (CAMINHO_ARQUIVO, CAMINHO_DATASET, CAMINHO_ARROW, CAMINHO_VERSAO, COLUNAS_PARTICAO,
+                                particionar_arquivo, materializar_arrow, versao_dataset)
+
+
+
+# ----------------------------
+# Ingestão incremental dos CSVs de dados abertos da PRF (datatran)
+#   python -m utils.ingestao Dados/brutos/datatran2025.csv [outros.csv ...]
+# ----------------------------
+
+# Id, hash do conteúdo e partição de cada ocorrência já gravada
+CAMINHO_INDICE = "Dados/indice_ocorrencias.parquet"
+
+LINHAS_POR_LOTE = 200_000
+
+REGIOES = {
+    'Norte': ['AC', 'AP', 'AM', 'PA', 'RO', 'RR', 'TO'],
+    'Nordeste': ['AL', 'BA', 'CE', 'MA', 'PB', 'PE', 'PI', 'RN', 'SE'],
+    'Centro-Oeste': ['DF', 'GO', 'MT', 'MS'],
+    'Sudeste': ['ES', 'MG', 'RJ', 'SP'],
+    'Sul': ['PR', 'RS', 'SC'],
+}
+REGIAO_DA_UF = {uf: regiao for regiao, ufs in REGIOES.items() for uf in ufs}
+
+# Agrupamentos descritos na aba "Notas Explicativas" (primeira regra que casar vence)
+GRUPOS_CAUSA = [
+    ('Condutor - Fadiga / Álcool / Drogas / Saúde', ['dormindo', 'sono', 'fadiga', 'álcool', 'alcool', 'droga',
+                                                      'substâncias psicoativas', 'mal súbito']),
+    ('Pedestre', ['pedestre', 'passarela']),
+    ('Veículo - Falha mecânica', ['freio', 'suspensão', 'pneu', 'farol', 'faróis', 'mecânica', 'avarias',
+                                  'sistema de iluminação']),
+    ('Animais / Objetos / Obstáculos', ['animal', 'animais', 'objeto', 'obstáculo', 'obstrução']),
+    ('Clima / Ambiente', ['chuva', 'neblina', 'fumaça', 'óleo', 'areia', 'condições climáticas']),
+    ('Via / Infraestrutura', ['buraco', 'pista escorregadia', 'sinalização', 'iluminação', 'acostamento',
+                              'defeito na via', 'obras', 'deficiência', 'curva acentuada', 'declive']),
+    ('Condutor - Falha humana', ['reação tardia', 'contramão', 'ultrapassagem', 'velocidade', 'celular',
+                                 'distância de segurança', 'atenção', 'conversão', 'manobra', 'desrespeitar',
+                                 'preferência', 'condutor', 'transitar', 'acessar a via']),
+]
+GRUPOS_CLIMA = [
+    ('Bom', ['céu claro', 'sol', 'nublado']),
+    ('Chuva', ['chuva', 'garoa', 'chuvisco']),
+]
+GRUPOS_VIA = [
+    ('Viaduto', ['viaduto', 'ponte', 'elevado']),
+    ('Curva', ['curva']),
+    ('Aclive', ['aclive']),
+    ('Declive', ['declive']),
+    ('Reta', ['reta']),
+]
+
+COLUNAS_CONTAGEM = ['Pessoas', 'Mortos', 'Feridos', 'Ilesos', 'Ignorados', 'Veiculos']
+
+
+def _agrupar(serie, regras, padrao):
+    # Aplica as regras sobre os valores distintos e depois mapeia a coluna inteira
+    distintos = pd.Series(serie.dropna().unique())
+    mapa = {}
+    for valor in distintos:
+        texto = str(valor).lower()
+        mapa[valor] = next((grupo for grupo, chaves in regras if any(c in texto for c in chaves)), padrao)
+    return serie.map(mapa).fillna(padrao)
+
+
+def _partes_dia(hora):
+    return pd.cut(hora, bins=[-1, 5, 11, 17, 23], labels=['Madrugada', 'Manhã', 'Tarde', 'Noite']).astype(object)
+
+
+def derivar_colunas(bruto):
+    """
+    Aplica ao lote do CSV bruto os tratamentos da aba "Notas Explicativas":
+    - Nomes de coluna no padrão do app (data_inversa -> Data, dia_semana -> Dia Semana...)
+    - Feridos = Feridos Leves + Feridos Graves
+    - Ano, Mês, Dia, Hora e Partes Dia a partir da data e do horário
+    - Região a partir da Uf; Municipio no formato "Município - UF"
+    - Causa Grupo, Condicao Climatica Grupo e Grupo Via
+    Linhas sem data válida são descartadas; a quantidade fica em df.attrs['sem_data'].
+    """
+    df = bruto.rename(columns=lambda c: c.strip().replace('_', ' ').title())
+    df = df.rename(columns={'Data Inversa': 'Data'})
+
+    df['Id'] = pd.to_numeric(df['Id'], errors='coerce')
+    df = df.dropna(subset=['Id'])
+    df['Id'] = df['Id'].astype('int64')
+
+    # Formato da data (dd/mm/aaaa ou aaaa-mm-dd) pelo primeiro valor preenchido; o lote pode vir vazio
+    preenchidas = df['Data'].dropna()
+    dia_primeiro = len(preenchidas) > 0 and '/' in str(preenchidas.iloc[0])
+    df['Data'] = pd.to_datetime(df['Data'], errors='coerce', dayfirst=dia_primeiro)
+    # Sem data não há Ano (partição) nem Mês: a linha não entra no dataset
+    sem_data = int(df['Data'].isna().sum())
+    if sem_data:
+        df = df.dropna(subset=['Data'])
+    horario = pd.to_datetime(df['Horario'], format='%H:%M:%S', errors='coerce')
+    df['Ano'] = df['Data'].dt.year.astype('int32')
+    df['Mês'] = df['Data'].dt.month.map(lambda m: MESES[m - 1])
+    df['Dia'] = df['Data'].dt.day.astype('int8')
+    df['Hora'] = horario.dt.hour.fillna(0).astype('int8')
+    df['Partes Dia'] = _partes_dia(df['Hora'])
+    df['Dia Semana'] = df['Dia Semana'].str.title()
+
+    for coluna in ['Km', 'Latitude', 'Longitude']:
+        df[coluna] = pd.to_numeric(df[coluna].astype(str).str.replace(',', '.', regex=False), errors='coerce')
+    df['Br'] = pd.to_numeric(df['Br'], errors='coerce').astype('Int32')
+
+    if 'Feridos Leves' in df.columns and 'Feridos Graves' in df.columns:
+        df['Feridos'] = (pd.to_numeric(df['Feridos Leves'], errors='coerce').fillna(0)
+                         + pd.to_numeric(df['Feridos Graves'], errors='coerce').fillna(0))
+        df = df.drop(columns=['Feridos Leves', 'Feridos Graves'])
+    for coluna in COLUNAS_CONTAGEM:
+        if coluna in df.columns:
+            df[coluna] = pd.to_numeric(df[coluna], errors='coerce').fillna(0).astype('int32')
+
+    df['Uf'] = df['Uf'].str.strip().str.upper()
+    df['Região'] = df['Uf'].map(REGIAO_DA_UF)
+    df['Municipio'] = df['Municipio'].str.strip() + ' - ' + df['Uf']
+
+    df['Causa Grupo'] = _agrupar(df['Causa Acidente'], GRUPOS_CAUSA, 'Outros / Indefinidos')
+    df['Condicao Climatica Grupo'] = _agrupar(df['Condicao Metereologica'], GRUPOS_CLIMA, 'Outros')
+    df['Grupo Via'] = _agrupar(df['Tracado Via'], GRUPOS_VIA, 'Outros')
+
+    # Mantém a última versão de cada ocorrência dentro do lote
+    df = df.drop_duplicates(subset='Id', keep='last').reset_index(drop=True)
+    df.attrs['sem_data'] = sem_data
+    return df
+
+
+def hash_linhas(df):
+    # Hash do conteúdo (sem o Id) para detectar ocorrências alteradas pela PRF
+    colunas = sorted(c for c in df.columns if c != 'Id')
+    return pd.util.hash_pandas_object(df[colunas], index=False).to_numpy()
+
+
+# ----------------------------
+# Índice de ocorrências (Id -> hash e partição)
+# ----------------------------
+def carregar_indice():
+    if os.path.exists(CAMINHO_INDICE):
+        return pd.read_parquet(CAMINHO_INDICE)
+    if not os.path.isdir(CAMINHO_DATASET):
+        return pd.DataFrame({'Id': pd.Series(dtype='int64'), 'Hash': pd.Series(dtype='uint64'),
+                             'Ano': pd.Series(dtype='int32'), 'Uf': pd.Series(dtype=object)})
+
+    # Primeira ingestão sobre um dataset antigo: indexa o que já existe.
+    # Linhas gravadas com outros tipos terão hash diferente e serão regravadas uma vez
+    existente = ds.dataset(CAMINHO_DATASET, format='parquet', partitioning='hive').to_table().to_pandas()
+    if 'Id' not in existente.columns:
+        raise ValueError("O dataset existente não tem a coluna 'Id'; não é possível ingerir de forma incremental.")
+    return pd.DataFrame({'Id': existente['Id'].astype('int64'), 'Hash': hash_linhas(existente),
+                         'Ano': existente['Ano'].astype('int32'), 'Uf': existente['Uf'].astype(object)})
+
+
+def _padronizar(tabela, esquema):
+    # Garante o mesmo esquema em todos os arquivos do dataset (colunas ausentes viram nulas)
+    colunas = []
+    for campo in esquema:
+        if campo.name in tabela.column_names:
+            colunas.append(tabela[campo.name].cast(campo.type))
+        else:
+            colunas.append(pa.nulls(len(tabela), campo.type))
+    return pa.table(colunas, schema=esquema)
+
+
+def _remover_ids(arquivos, ids):
+    # Regrava (ou apaga) os arquivos antigos sem as ocorrências que foram alteradas
+    ids = pa.array(np.asarray(sorted(ids), dtype='int64'))
+    for arquivo in arquivos:
+        tabela = pq.read_table(arquivo)
+        manter = pc.invert(pc.is_in(tabela['Id'], value_set=ids))
+        restante = tabela.filter(manter)
+        if len(restante) == len(tabela):
+            continue
+        if len(restante) == 0:
+            os.remove(arquivo)
+        else:
+            temporario = arquivo + '.tmp'
+            pq.write_table(restante, temporario)
+            os.replace(temporario, arquivo)
+
+
+def _particoes(arquivos):
+    # Só estes arquivos do dataset, com Ano e Uf lidos do caminho como no dataset inteiro
+    return ds.dataset(arquivos, format='parquet', partitioning='hive', partition_base_dir=CAMINHO_DATASET)
+
+
+def _gravar_versao(versao, novas, alteradas, sem_data):
+    with open(CAMINHO_VERSAO, 'w', encoding='utf-8') as arquivo:
+        json.dump({
+            'versao': versao,
+            'atualizado_em': datetime.now().isoformat(timespec='seconds'),
+            'linhas_novas': int(novas),
+            'linhas_alteradas': int(alteradas),
+            'linhas_sem_data': int(sem_data),
+        }, arquivo, ensure_ascii=False, indent=2)
+
+
+def ingerir(caminhos_csv, linhas_por_lote=LINHAS_POR_LOTE, encoding='latin-1', separador=';'):
+    """
+    Acrescenta ao dataset particionado apenas as ocorrências novas ou alteradas.
+    - caminhos_csv: CSVs no formato dos dados abertos da PRF (datatran)
+    - Cada lote é tratado (derivar_colunas) e gravado como novos arquivos nas partições Ano/Uf
+    - Ocorrências alteradas (mesmo Id, conteúdo diferente) saem dos arquivos antigos
+    - Ao final o cubo de agregados e as séries temporais recebem só as linhas novas (e descontam as versões
+      antigas das alteradas), e a versão do dataset é incrementada; os caches do app usam essa versão
+    - Linhas sem data válida ficam de fora e são contadas
+    Retorna (linhas novas, linhas alteradas, linhas descartadas sem data).
+    """
+    if not os.path.isdir(CAMINHO_DATASET) and os.path.exists(CAMINHO_ARQUIVO):
+        particionar_arquivo()
+
+    versao = versao_dataset() + 1
+    indice = carregar_indice()
+    hash_por_id = pd.Series(indice['Hash'].to_numpy(), index=indice['Id'].to_numpy())
+    arquivos_antigos = glob.glob(os.path.join(CAMINHO_DATASET, '**', '*.parquet'), recursive=True)
+    esquema = None
+    if arquivos_antigos:
+        esquema = pq.read_schema(arquivos_antigos[0]).remove_metadata()
+
+    novos_indice = []
+    ids_alterados = set()
+    lote_do_id = {}  # Id -> lote desta execução em que ele foi gravado
+    total_novas = 0
+    total_sem_data = 0
+    lote_numero = 0
+
+    for caminho in caminhos_csv:
+        leitor = pd.read_csv(caminho, sep=separador, encoding=encoding, dtype=str, chunksize=linhas_por_lote)
+        for bruto in leitor:
+            lote = derivar_colunas(bruto)
+            total_sem_data += lote.attrs['sem_data']
+            if lote.empty:
+                continue
+            lote['Hash'] = hash_linhas(lote)
+
+            anterior = hash_por_id.reindex(lote['Id'].to_numpy()).to_numpy()
+            novo = pd.isna(anterior)
+            alterado = ~novo & (anterior != lote['Hash'].to_numpy())
+            lote = lote[novo | alterado]
+            if lote.empty:
+                continue
+
+            alterados_agora = lote.loc[alterado[novo | alterado], 'Id'].tolist()
+            ids_alterados.update(alterados_agora)
+
+            # Id já gravado por um lote anterior desta mesma execução: sai de lá também
+            regravar = {}
+            for id_ in alterados_agora:
+                if id_ in lote_do_id:
+                    regravar.setdefault(lote_do_id[id_], set()).add(id_)
+            for numero, ids in regravar.items():
+                padrao = os.path.join(CAMINHO_DATASET, '**', f'parte-v{versao}-l{numero}-*.parquet')
+                _remover_ids(glob.glob(padrao, recursive=True), ids)
+            lote_do_id.update(dict.fromkeys(lote['Id'].tolist(), lote_numero))
+
+            total_novas += int(novo.sum())
+            novos_indice.append(lote[['Id', 'Hash', 'Ano', 'Uf']])
+            hash_por_id = pd.concat([hash_por_id[~hash_por_id.index.isin(lote['Id'])],
+                                     pd.Series(lote['Hash'].to_numpy(), index=lote['Id'].to_numpy())])
+
+            tabela = pa.Table.from_pandas(lote.drop(columns=['Hash']), preserve_index=False)
+            if esquema is None:
+                esquema = tabela.drop_columns(COLUNAS_PARTICAO).schema.remove_metadata()
+                # Coluna toda vazia no primeiro lote não pode fixar o tipo nulo para sempre
+                esquema = pa.schema([pa.field(c.name, pa.string()) if pa.types.is_null(c.type) else c
+                                     for c in esquema])
+            particoes = tabela.select(COLUNAS_PARTICAO)
+            tabela = _padronizar(tabela, esquema)
+            for coluna in COLUNAS_PARTICAO:
+                tabela = tabela.append_column(coluna, particoes[coluna])
+
+            ds.write_dataset(
+                tabela,
+                CAMINHO_DATASET,
+                format='parquet',
+                partitioning=ds.partitioning(tabela.select(COLUNAS_PARTICAO).schema, flavor='hive'),
+                basename_template=f'parte-v{versao}-l{lote_numero}-{{i}}.parquet',
+                existing_data_behavior='overwrite_or_ignore'
+            )
+            lote_numero += 1
+
+    removidas = None
+    if ids_alterados:
+        # Versões antigas das alteradas: saem do cubo e das séries
+        removidas = ds.dataset(_particoes(arquivos_antigos).to_table(
+            filter=ds.field('Id').isin(np.asarray(sorted(ids_alterados), dtype='int64'))))
+        _remover_ids(arquivos_antigos, ids_alterados)
+
+    if novos_indice:
+        novos = pd.concat(novos_indice).drop_duplicates(subset='Id', keep='last')
+        indice = pd.concat([indice[~indice['Id'].isin(novos['Id'])], novos], ignore_index=True)
+        indice['Uf'] = indice['Uf'].astype(object)
+        indice.to_parquet(CAMINHO_INDICE, index=False)
+
+        # Arquivo Arrow desatualizado seria servido pelo memory-map; regrava se ele existir.
+        # A nova versão vai dentro dele: as leituras mapeadas usam essa, não a de versao.json (versao_leitura)
+        if os.path.exists(CAMINHO_ARROW):
+            materializar_arrow(versao=versao)
+        gravados = glob.glob(os.path.join(CAMINHO_DATASET, '**', f'parte-v{versao}-*.parquet'), recursive=True)
+        atualizar_cubo(_particoes(gravados), removidas)
+        atualizar_series(_particoes(gravados), removidas)
+        _gravar_versao(versao, total_novas, len(ids_alterados), total_sem_data)
+
+    return total_novas, len(ids_alterados), total_sem_data
+
+
+# ----------------------------
+# Linha de comando
+# ----------------------------
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ingestão incremental dos CSVs de acidentes da PRF.')
+    parser.add_argument('csv', nargs='+', help='arquivos datatran*.csv baixados dos dados abertos da PRF')
+    parser.add_argument('--lote', type=int, default=LINHAS_POR_LOTE, help='linhas lidas por vez')
+    parser.add_argument('--encoding', default='latin-1')
+    args = parser.parse_args()
+
+    novas, alteradas, sem_data = ingerir(args.csv, linhas_por_lote=args.lote, encoding=args.encoding)
+    print(f"{novas} ocorrências novas, {alteradas} alteradas. Versão do dataset: {versao_dataset()}")
+    if sem_data:
+        print(f"{sem_data} linhas descartadas por não terem data válida.")
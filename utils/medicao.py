@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import atexit
+import threading
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+
+
+# ----------------------------
+# Tempos das etapas de cada rerun
+# ----------------------------
+# Com PRF_MEDICAO=1 cada etapa do caminho quente vira um intervalo medido:
+# carregamento, filtros, kpi, agrupamento, figura, serializacao e envio (st.plotly_chart).
+# Cada intervalo leva as marcas do rerun (página, aba) e as do intervalo que o contém
+# (o gráfico): o agrupamento feito dentro da figura de barras sai com grafico='barra'.
+# Intervalos aninhados: 'duracao' inclui os de dentro, 'proprio' desconta.
+# Para onde vão:
+# - painel opcional na barra lateral (últimos intervalos da sessão e p50/p99 por etapa)
+# - tempos.jsonl: uma linha JSON por intervalo, acumuladas em memória e gravadas juntas
+# - tempos.prom: resumo no formato texto do Prometheus (p50, p99, soma e contagem por etapa)
+# Os dois arquivos são gravados no máximo a cada INTERVALO_GRAVACAO segundos (ou com
+# MAX_PENDENTES intervalos acumulados), fora do lock: os reruns não esperam pelo disco.
+MEDICAO_ATIVA = os.environ.get('PRF_MEDICAO') == '1'
+PASTA_METRICAS = os.environ.get('PRF_DIR_METRICAS', 'Dados/metricas')
+
+AMOSTRAS_POR_ETAPA = 2000      # últimas durações guardadas por etapa para os percentis
+INTERVALOS_SESSAO = 200        # últimos intervalos de cada sessão, para o painel
+INTERVALO_GRAVACAO = 15        # segundos
+MAX_PENDENTES = 5000           # intervalos acumulados que antecipam a gravação
+
+# Marcas que viram rótulos no Prometheus (as demais ficam só no JSON)
+ROTULOS_PROMETHEUS = ['etapa', 'pagina', 'aba', 'grafico']
+
+# Intervalo aberto no contexto atual (thread do rerun): marcas herdadas e tempo dos filhos
+_aberto = ContextVar('intervalo_aberto', default=None)
+
+
+class _Intervalo:
+    """Context manager de medir(): mede o bloco e registra ao sair."""
+
+    def __init__(self, etapa, marcas):
+        self.etapa = etapa
+        self.marcas = marcas
+        self.filhos = 0.0
+
+    def __enter__(self):
+        pai = _aberto.get()
+        if pai is not None:
+            self.marcas = {**pai.marcas, **self.marcas}
+        self._pai = pai
+        self._token = _aberto.set(self)
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *erro):
+        duracao = time.perf_counter() - self._inicio
+        _aberto.reset(self._token)
+        if self._pai is not None:
+            self._pai.filhos += duracao
+        _registrar(self.etapa, duracao, duracao - self.filhos, self.marcas)
+        return False
+
+
+class _Nulo:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *erro):
+        return False
+
+
+_NULO = _Nulo()
+
+
+def medir(etapa, **marcas):
+    """
+    Mede o bloco como uma etapa:  with medir('figura', grafico='barra'): ...
+    - marcas: valem para este intervalo e para os abertos dentro dele
+    Sem PRF_MEDICAO=1 não mede nada.
+    """
+    if not MEDICAO_ATIVA:
+        return _NULO
+    return _Intervalo(etapa, marcas)
+
+
+def marcar(**marcas):
+    """
+    Marcas do rerun (pagina, aba...), guardadas na sessão: valem também nos reruns de fragmento,
+    que não passam pelo código que as definiu. None apaga a marca.
+    """
+    if not MEDICAO_ATIVA:
+        return
+    atuais = st.session_state.setdefault('medicao_marcas', {})
+    for nome, valor in marcas.items():
+        if valor is None:
+            atuais.pop(nome, None)
+        else:
+            atuais[nome] = valor
+
+
+# ----------------------------
+# Registro (compartilhado entre sessões)
+# ----------------------------
+class RegistroTempos:
+    """
+    Últimas durações de cada etapa (por pagina/aba/grafico), soma e contagem, para p50/p99.
+    Uma instância fica em st.cache_resource (todas as sessões), por isso o lock.
+    Também grava o JSONL e o arquivo do Prometheus em `pasta` (None = não grava), periodicamente.
+    """
+
+    def __init__(self, pasta=None):
+        self.pasta = pasta
+        self._etapas = {}
+        self._pendentes = []
+        self._lock = threading.Lock()
+        # Uma gravação por vez; quem encontra outra em andamento segue sem esperar
+        self._gravando = threading.Lock()
+        self._exportado_em = time.monotonic()
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+            # O que ficou acumulado não se perde ao encerrar o servidor
+            atexit.register(self.gravar)
+
+    def registrar(self, intervalo):
+        chave = tuple(intervalo.get(rotulo) for rotulo in ROTULOS_PROMETHEUS)
+        with self._lock:
+            amostras, soma, contagem = self._etapas.get(chave, (None, 0.0, 0))
+            if amostras is None:
+                amostras = deque(maxlen=AMOSTRAS_POR_ETAPA)
+            amostras.append(intervalo['duracao_ms'])
+            self._etapas[chave] = (amostras, soma + intervalo['duracao_ms'], contagem + 1)
+            if not self.pasta:
+                return
+            self._pendentes.append(intervalo)
+            gravar = (time.monotonic() - self._exportado_em > INTERVALO_GRAVACAO
+                      or len(self._pendentes) >= MAX_PENDENTES)
+        if gravar:
+            self.gravar(esperar=False)
+
+    def gravar(self, esperar=True):
+        """Acrescenta os intervalos acumulados ao tempos.jsonl e regrava o tempos.prom."""
+        if not self.pasta or not self._gravando.acquire(blocking=esperar):
+            return
+        try:
+            with self._lock:
+                pendentes, self._pendentes = self._pendentes, []
+                self._exportado_em = time.monotonic()
+            if pendentes:
+                with open(os.path.join(self.pasta, 'tempos.jsonl'), 'a', encoding='utf-8') as arquivo:
+                    arquivo.writelines(json.dumps(intervalo, ensure_ascii=False, default=str) + '\n'
+                                       for intervalo in pendentes)
+            self.exportar_prometheus()
+        finally:
+            self._gravando.release()
+
+    def tabela(self):
+        """DataFrame com uma linha por etapa/pagina/aba/grafico: contagem, p50, p99, máximo e total (ms)."""
+        with self._lock:
+            itens = [(chave, np.asarray(amostras), soma, contagem)
+                     for chave, (amostras, soma, contagem) in self._etapas.items()]
+        linhas = [(*chave, contagem, np.percentile(amostras, 50), np.percentile(amostras, 99), amostras.max(), soma)
+                  for chave, amostras, soma, contagem in itens]
+        colunas = ROTULOS_PROMETHEUS + ['n', 'p50_ms', 'p99_ms', 'max_ms', 'total_ms']
+        return (pd.DataFrame(linhas, columns=colunas)
+                .sort_values('total_ms', ascending=False, ignore_index=True).round(2))
+
+    def exportar_prometheus(self):
+        """Regrava tempos.prom (summary prf_etapa_segundos) de forma atômica."""
+        tabela = self.tabela()
+        linhas = [
+            '# HELP prf_etapa_segundos Duração das etapas dos reruns do app (últimas amostras por etapa).',
+            '# TYPE prf_etapa_segundos summary',
+        ]
+        for linha in tabela.itertuples(index=False):
+            rotulos = ','.join(f'{nome}="{_escapar(getattr(linha, nome))}"'
+                               for nome in ROTULOS_PROMETHEUS if getattr(linha, nome) is not None)
+            separador = ',' if rotulos else ''
+            linhas.append(f'prf_etapa_segundos{{{rotulos}{separador}quantile="0.5"}} {linha.p50_ms / 1000:.6f}')
+            linhas.append(f'prf_etapa_segundos{{{rotulos}{separador}quantile="0.99"}} {linha.p99_ms / 1000:.6f}')
+            linhas.append(f'prf_etapa_segundos_sum{{{rotulos}}} {linha.total_ms / 1000:.6f}')
+            linhas.append(f'prf_etapa_segundos_count{{{rotulos}}} {linha.n}')
+
+        destino = os.path.join(self.pasta, 'tempos.prom')
+        with open(destino + '.tmp', 'w', encoding='utf-8') as arquivo:
+            arquivo.write('\n'.join(linhas) + '\n')
+        os.replace(destino + '.tmp', destino)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+@st.cache_resource
+def registro_tempos():
+    return RegistroTempos(PASTA_METRICAS)
+
+
+def _registrar(etapa, duracao, proprio, marcas):
+    intervalo = {
+        'momento': datetime.now().isoformat(timespec='milliseconds'),
+        'etapa': etapa,
+        'duracao_ms': round(duracao * 1000, 3),
+        'proprio_ms': round(proprio * 1000, 3),
+        **st.session_state.get('medicao_marcas', {}),
+        **marcas,
+    }
+    registro_tempos().registrar(intervalo)
+    st.session_state.setdefault('medicao_intervalos', deque(maxlen=INTERVALOS_SESSAO)).append(intervalo)
+
+
+# ----------------------------
+# Painel de depuração (barra lateral)
+# ----------------------------
+def painel_tempos():
+    """
+    Painel opcional na barra lateral: só aparece com PRF_MEDICAO=1 e fica fechado até o toggle.
+    Chamado no fim do rerun, para já incluir os intervalos dele.
+    """
+    if not MEDICAO_ATIVA:
+        return
+    with st.sidebar:
+        if not st.toggle("🐞 Tempos das etapas", key="painel_tempos"):
+            return
+        intervalos = list(st.session_state.get('medicao_intervalos', []))
+        st.caption("Últimos intervalos desta sessão (ms; 'próprio' sem os intervalos de dentro)")
+        if intervalos:
+            recentes = pd.DataFrame(intervalos[::-1]).drop(columns=['momento'])
+            st.dataframe(recentes, hide_index=True, use_container_width=True)
+        st.caption("Todas as sessões: p50/p99 por etapa (ms)")
+        st.dataframe(registro_tempos().tabela(), hide_index=True, use_container_width=True)
+        if registro_tempos().pasta:
+            st.caption(f"Gravado a cada {INTERVALO_GRAVACAO} s em {registro_tempos().pasta}/tempos.jsonl e tempos.prom")
@@ -1,672 +1,803 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 from streamlit_option_menu import option_menu
 from utils.marcadores import divisor
 from utils.graficos import (grafico_barra, grafico_pizza, grafico_scater,  grafico_linha,  
-                            grafico_heatmap, grafico_radar, grafico_treemap, grafico_coluna)
-from utils.filtros import filtros_aplicados
+                            grafico_heatmap, grafico_radar, grafico_treemap, grafico_coluna, figura_heatmap_grade,
+                            exibir_figura, grafico_tabela_calor)
+from utils.filtros import filtros_aplicados, filtro_indexado
+from utils.visao import projetar
+from utils.carregamento import carregar_piramide, carregar_indice_espacial, carregar_indice_km, colunas_pagina
+from utils.espacial import agregar_grade, nivel_do_zoom, localizar_km, consultar_raio, consultar_vizinhos
+from utils.agregacao import Pedido, agregar, agrupar, cruzar, cruzamento_longo
+from utils.medicao import marcar
 from utils.totalizadores import (total_acidentes,formatar_milhar, total_mortos, total_feridos, total_veiculos,
                                  calculo_tot_acidentes, calculo_tot_mortos, calculo_tot_feridos, calculo_tot_veiculos)
 
-def graficos(df):
+# Filtros extras da Distribuição Geográfica (resolvidos pelo índice bitmap)
+FILTROS_EXTRAS = ['Classificacao Acidente', 'Fase Dia', 'Condicao Metereologica']
+
+# Frequências do eixo de datas na Linha do Tempo
+GRANULARIDADES_DATA = {'Mês': 'MS', 'Semana': 'W-MON', 'Dia': 'D', 'Hora': 'h'}
+
+@st.fragment
+def aba_linha_do_tempo(df, cubo=None):
+    """Gráfico temporal com escala e grupo escolhidos."""
+    """
+    c1, c2 = st.columns([3,2], gap="large")
+    with c1:
+        grafico_linha(df, 'Data Inversa', None, titulo=f"**Total de acidentes no período:** {total_acidentes(df)}")
+    with c2:
+        grafico_barra_sem_ordenar(df, 'Ano', titulo="Acidentes")
+    
+    c3, c4 = st.columns([3,2], gap="large")
+    with c3:
+        grafico_linha(df, 'Data Inversa', 'Mortos', titulo=f"**Total de mortes no período:** {total_mortos(df)}")
+    with c4:
+        grafico_barra_sem_ordenar(df, 'Ano', 'Mortos', titulo="Mortos")
+
+    c5, c6 = st.columns([3,2], gap="large")
+    with c5:
+        grafico_linha(df, 'Data Inversa', 'Feridos', titulo=f"**Total de feridos no período:** {total_feridos(df)}")
+    with c6:
+        grafico_barra_sem_ordenar(df, 'Ano','Feridos', titulo="Feridos")
+    c7, c8 = st.columns([3,2], gap="large")
+    with c7:
+        grafico_linha(df, 'Data Inversa', 'Veiculos', titulo=f"**Total de veículos envolvidos no período:** {total_veiculos(df)}")
+    with c8:
+        grafico_barra_sem_ordenar(df,'Ano', 'Veiculos', titulo="Veículos")
+    
+    
+    grafico_linha(df, 'Dia Semana', 'Veiculos', titulo="**Total de veículos envolvidos pelos dias da semana no período:**")
+    """
+    
+    # Fazer gráficos dinâmicos
 
-    aba1, aba2, aba3, aba4, aba5, aba6, aba7 = st.tabs(["⏳ Linha do Tempo ","📉 Analise relacional", "🌍 Distribuição Geográfica", "⚠️ Características dos Acidentes",
-                                                  "⚡Fatores de Ocorrências",  "🗺️ Mapas", "🧹 Notas Explicativas" ])
-    divisor()
-    with aba1:
-        """
-        c1, c2 = st.columns([3,2], gap="large")
-        with c1:
-            grafico_linha(df, 'Data Inversa', None, titulo=f"**Total de acidentes no período:** {total_acidentes(df)}")
-        with c2:
-            grafico_barra_sem_ordenar(df, 'Ano', titulo="Acidentes")
-        
-        c3, c4 = st.columns([3,2], gap="large")
-        with c3:
-            grafico_linha(df, 'Data Inversa', 'Mortos', titulo=f"**Total de mortes no período:** {total_mortos(df)}")
-        with c4:
-            grafico_barra_sem_ordenar(df, 'Ano', 'Mortos', titulo="Mortos")
-
-        c5, c6 = st.columns([3,2], gap="large")
-        with c5:
-            grafico_linha(df, 'Data Inversa', 'Feridos', titulo=f"**Total de feridos no período:** {total_feridos(df)}")
-        with c6:
-            grafico_barra_sem_ordenar(df, 'Ano','Feridos', titulo="Feridos")
-        c7, c8 = st.columns([3,2], gap="large")
-        with c7:
-            grafico_linha(df, 'Data Inversa', 'Veiculos', titulo=f"**Total de veículos envolvidos no período:** {total_veiculos(df)}")
-        with c8:
-            grafico_barra_sem_ordenar(df,'Ano', 'Veiculos', titulo="Veículos")
-        
-        
-        grafico_linha(df, 'Dia Semana', 'Veiculos', titulo="**Total de veículos envolvidos pelos dias da semana no período:**")
-        """
-        
-        # Fazer gráficos dinâmicos
-
-        st.subheader("🎯 Selecione parâmetros abaixo para construção de um gráfico temporal para análise")
-
-        # --- Definição de colunas ---
-        colunas_categoricas = ['Data', 'Ano', 'Mês', 'Dia', 'Dia Semana', 'Hora']
-        colunas_numericas = ['Mortos', 'Feridos', 'Veiculos']
-
-        c1,c2 = st.columns(2, gap="large")
-        with c1:
-            # --- Selectbox para categoria (Eixo X) ---
-            coluna_categoria = st.selectbox(
-                "Selecione a escala de tempo disponivel do conjunto de dados para o Eixo X",
-                options=colunas_categoricas,
-                index=colunas_categoricas.index("Data"),
-                key="select_categoria"
-            )
-        with c2:
-            # --- Selectbox para grupo (Eixo Y) ---
-            # Mapeando None para "Total Acidentes"
-            grupo_display_map = [("Total Acidentes", None)] + [(col, col) for col in colunas_numericas]
-            grupo_options_display = [g[0] for g in grupo_display_map]
-
-            coluna_grupo_display = st.selectbox(
-                "Selecione o grupo disponivel do conjunto de dados para o Eixo Y)",
-                options=grupo_options_display,
-                index=0,
-                key="select_grupo"
-            )
+    st.subheader("🎯 Selecione parâmetros abaixo para construção de um gráfico temporal para análise")
 
-        # Recupera o valor real do selectbox
-        coluna_grupo = dict(grupo_display_map)[coluna_grupo_display]
+    # --- Definição de colunas ---
+    colunas_categoricas = ['Data', 'Ano', 'Mês', 'Dia', 'Dia Semana', 'Hora']
+    colunas_numericas = ['Mortos', 'Feridos', 'Veiculos']
 
-        # --- Validação de categoria e grupo iguais ---
-        if coluna_categoria == coluna_grupo:
-            st.warning("⚠️ As colunas de categoria e grupo não podem ser iguais. Escolha colunas diferentes.")
-            st.stop()
+    c1,c2 = st.columns(2, gap="large")
+    with c1:
+        # --- Selectbox para categoria (Eixo X) ---
+        coluna_categoria = st.selectbox(
+            "Selecione a escala de tempo disponivel do conjunto de dados para o Eixo X",
+            options=colunas_categoricas,
+            index=colunas_categoricas.index("Data"),
+            key="select_categoria"
+        )
+    with c2:
+        # --- Selectbox para grupo (Eixo Y) ---
+        # Mapeando None para "Total Acidentes"
+        grupo_display_map = [("Total Acidentes", None)] + [(col, col) for col in colunas_numericas]
+        grupo_options_display = [g[0] for g in grupo_display_map]
+
+        coluna_grupo_display = st.selectbox(
+            "Selecione o grupo disponivel do conjunto de dados para o Eixo Y)",
+            options=grupo_options_display,
+            index=0,
+            key="select_grupo"
+        )
 
-        # --- Preparação para gráfico ---
-        df_temp = df.copy()
+    # Recupera o valor real do selectbox
+    coluna_grupo = dict(grupo_display_map)[coluna_grupo_display]
+
+    # --- Granularidade do eixo de datas (séries longas são reduzidas no gráfico) ---
+    freq = None
+    if coluna_categoria == "Data":
+        granularidade = st.radio(
+            "Agrupar as datas por:",
+            list(GRANULARIDADES_DATA),
+            horizontal=True,
+            key="select_granularidade"
+        )
+        freq = GRANULARIDADES_DATA[granularidade]
 
-        # Ordenar mês corretamente, caso seja selecionado
-        if coluna_categoria == "Mês":
-            meses_pt = ["Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho",
-                        "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"]
-            df_temp['Mês'] = pd.Categorical(df_temp['Mês'], categories=meses_pt, ordered=True)
-        # Ordenar dia da semana corretamente, caso seja selecionado
-        if coluna_categoria == "Dia Semana":
-            dias_semana = ["Domingo", "Segunda-Feira", "Terça-Feira", "Quarta-Feira",
-                        "Quinta-Feira", "Sexta-Feira", "Sábado"]
-            df_temp['Dia Semana'] = pd.Categorical(df_temp['Dia Semana'], categories=dias_semana, ordered=True)
+    # --- Validação de categoria e grupo iguais ---
+    if coluna_categoria == coluna_grupo:
+        st.warning("⚠️ As colunas de categoria e grupo não podem ser iguais. Escolha colunas diferentes.")
+        return
 
-        # --- Título dinâmico ---
-        titulo = f"📊 {coluna_grupo_display} por {coluna_categoria}"
+    # Mês e Dia Semana já chegam como Categoricals na ordem do calendário (utils/esquema.py)
 
-        # --- Chamada do gráfico de linha ---
-        try:
-            grafico_linha(df_temp, coluna_categoria, coluna_grupo, titulo)
-        except Exception as e:
-            st.error(f"Erro ao gerar o gráfico de linha: {e}")
+    # --- Título dinâmico ---
+    titulo = f"📊 {coluna_grupo_display} por {coluna_categoria}"
 
-                
+    # --- Chamada do gráfico de linha ---
+    try:
+        grafico_linha(df, coluna_categoria, coluna_grupo, titulo, freq=freq, cubo=cubo)
+    except Exception as e:
+        st.error(f"Erro ao gerar o gráfico de linha: {e}")
 
-    with aba2:
-        divisor()
-        tot_mortos = calculo_tot_mortos(df)
-        tot_feridos = calculo_tot_feridos(df)
-        tot_veiculos = calculo_tot_veiculos(df)
-        tot_acidentes = calculo_tot_acidentes(df)
 
-        taxa_mortalidade = round((tot_mortos / tot_acidentes) * 100 if total_acidentes else 0,0)
-        taxa_mortalidade_feridos = round((tot_mortos / tot_feridos) * 100 if total_feridos else 0, 0)
-        media_veiculos_acidente = round(tot_veiculos / tot_acidentes if total_acidentes else 0, 0)
+@st.fragment
+def aba_analise_relacional(df, cubo=None):
+    """Estatísticas e dispersão entre duas medidas por um fator."""
+    divisor()
+    tot_mortos = calculo_tot_mortos(df)
+    tot_feridos = calculo_tot_feridos(df)
+    tot_veiculos = calculo_tot_veiculos(df)
+    tot_acidentes = calculo_tot_acidentes(df)
 
-        st.subheader("🔍 Estatísticas")
-        c2, c3, c4 = st.columns(3, gap="large")
-        
-        with c2.container(border=True):   
-            st.metric("⚖️ Mortalidade (Mortos/Acidentes)", f"{taxa_mortalidade:g}%")
-
-        with c3.container(border=True):
-            st.metric("🩸 Mortos / 100 Feridos", f"{taxa_mortalidade_feridos:g}%")
-
-        with c4.container(border=True):
-            st.metric("🚙 Veículos / Acidente", f"{media_veiculos_acidente:g}")  
-
-        divisor()
-
-        st.subheader('🚗💥 Causas x Consequências dos Acidentes')
-        st.write('🧭 Selecione as variáveis e o fator de análise (ex: Região, Tipo, Causa) para explorar suas relações.')
-
-
-        """
-        # Agrupar os dados por grupo de causa
-        df_grouped = df.groupby("Causa Grupo", as_index=False).agg({
-            "Feridos": "sum",
-            "Mortos": "sum"
-            
-        })
-        # === GRÁFICO ===
-        grafico_scater(
-            "### 📉 Relação entre Feridos e Mortos (agrupado por causa)",
-            df_grouped,
-            coluna_x="Feridos",
-            coluna_y="Mortos",
-            tamanho_y="Mortos",
-            cor_bola="Causa Grupo",
-            nome_bola="Causa Grupo",
-            titulo="Relação entre Feridos e Mortos por Grupo de Causa",
-            key="grafico_feridos_mortos_causa"
-        )
+    taxa_mortalidade = round((tot_mortos / tot_acidentes) * 100 if total_acidentes else 0,0)
+    taxa_mortalidade_feridos = round((tot_mortos / tot_feridos) * 100 if total_feridos else 0, 0)
+    media_veiculos_acidente = round(tot_veiculos / tot_acidentes if total_acidentes else 0, 0)
+
+    st.subheader("🔍 Estatísticas")
+    c2, c3, c4 = st.columns(3, gap="large")
+    
+    with c2.container(border=True):   
+        st.metric("⚖️ Mortalidade (Mortos/Acidentes)", f"{taxa_mortalidade:g}%")
+
+    with c3.container(border=True):
+        st.metric("🩸 Mortos / 100 Feridos", f"{taxa_mortalidade_feridos:g}%")
+
+    with c4.container(border=True):
+        st.metric("🚙 Veículos / Acidente", f"{media_veiculos_acidente:g}")  
+
+    divisor()
 
+    st.subheader('🚗💥 Causas x Consequências dos Acidentes')
+    st.write('🧭 Selecione as variáveis e o fator de análise (ex: Região, Tipo, Causa) para explorar suas relações.')
 
-        divisor()
-        # Agrupa os dados por tipo de acidente
-        df_grouped_tipo = df.groupby("Tipo Acidente", as_index=False).agg({
-            "Feridos": "sum",
-            "Mortos": "sum"
-        })
+
+    """
+    # Agrupar os dados por grupo de causa
+    df_grouped = df.groupby("Causa Grupo", as_index=False).agg({
+        "Feridos": "sum",
+        "Mortos": "sum"
         
-        grafico_scater(
-        "### 🚘 Relação entre Feridos e Mortos (agrupado por tipo de acidente)",
-        df_grouped_tipo,
+    })
+    # === GRÁFICO ===
+    grafico_scater(
+        "### 📉 Relação entre Feridos e Mortos (agrupado por causa)",
+        df_grouped,
         coluna_x="Feridos",
         coluna_y="Mortos",
         tamanho_y="Mortos",
-        cor_bola="Tipo Acidente",
-        nome_bola="Tipo Acidente",
-        titulo="Relação entre Feridos e Mortos por Tipo de Acidente",
-        key="grafico_veiculos_feridos_tipo"
+        cor_bola="Causa Grupo",
+        nome_bola="Causa Grupo",
+        titulo="Relação entre Feridos e Mortos por Grupo de Causa",
+        key="grafico_feridos_mortos_causa"
+    )
+
+
+    divisor()
+    # Agrupa os dados por tipo de acidente
+    df_grouped_tipo = df.groupby("Tipo Acidente", as_index=False).agg({
+        "Feridos": "sum",
+        "Mortos": "sum"
+    })
+    
+    grafico_scater(
+    "### 🚘 Relação entre Feridos e Mortos (agrupado por tipo de acidente)",
+    df_grouped_tipo,
+    coluna_x="Feridos",
+    coluna_y="Mortos",
+    tamanho_y="Mortos",
+    cor_bola="Tipo Acidente",
+    nome_bola="Tipo Acidente",
+    titulo="Relação entre Feridos e Mortos por Tipo de Acidente",
+    key="grafico_veiculos_feridos_tipo"
+    )
+
+    divisor()
+    # Agrupa os dados por tipo de acidente
+    df_grouped_tipo = df.groupby("Condicao Climatica Grupo", as_index=False).agg({
+        "Feridos": "sum",
+        "Mortos": "sum"
+    })
+    
+    grafico_scater(
+    "### 🚘 Relação entre Feridos e Mortos (agrupado por condição climática)",
+    df_grouped_tipo,
+    coluna_x="Feridos",
+    coluna_y="Mortos",
+    tamanho_y="Mortos",
+    cor_bola="Condicao Climatica Grupo",
+    nome_bola="Condicao Climatica Grupo",
+    titulo="Relação entre Feridos e Mortos por Condição Climática",
+    key="grafico_veiculos_mortos_Condicao_Climatica_Grupo"
+    )
+
+    divisor()
+    # Agrupa os dados por tipo de acidente
+    df_grouped_tipo = df.groupby("Grupo Via", as_index=False).agg({
+        "Feridos": "sum",
+        "Mortos": "sum"
+    })
+    
+    grafico_scater(
+    "### 🚘 Relação entre Veículos e Mortos (agrupado por Grupo Via)",
+    df_grouped_tipo,
+    coluna_x="Feridos",
+    coluna_y="Mortos",
+    tamanho_y="Mortos",
+    cor_bola="Grupo Via",
+    nome_bola="Grupo Via",
+    titulo="Relação entre Feridos e Mortos por Grupo de Via",
+    key="grafico_veiculos_mortos_Grupo_Via"
+    )
+    """
+
+    # --- Definição de colunas ---
+    colunas_x = ['Feridos', 'Mortos', 'Veiculos']
+    colunas_y = ['Mortos','Feridos',  'Veiculos']
+    coluna_causa = ['Grupo Via', 'Condicao Climatica Grupo', 'Tipo Acidente', 'Causa Grupo', 'Tipo Pista',
+                    'Dia Semana', 'Partes Dia', 'Ano', 'Mês', 'Dia','Hora']
+
+    c1, c2, c3, c4 = st.columns(4, gap="large")
+
+    with c1:
+        coluna_x = st.selectbox(
+            "📊 Selecione a primeira variável (Eixo X)",
+            options=colunas_x,
+            key="select_coluna_x"
         )
 
-        divisor()
-        # Agrupa os dados por tipo de acidente
-        df_grouped_tipo = df.groupby("Condicao Climatica Grupo", as_index=False).agg({
-            "Feridos": "sum",
-            "Mortos": "sum"
-        })
-        
-        grafico_scater(
-        "### 🚘 Relação entre Feridos e Mortos (agrupado por condição climática)",
-        df_grouped_tipo,
-        coluna_x="Feridos",
-        coluna_y="Mortos",
-        tamanho_y="Mortos",
-        cor_bola="Condicao Climatica Grupo",
-        nome_bola="Condicao Climatica Grupo",
-        titulo="Relação entre Feridos e Mortos por Condição Climática",
-        key="grafico_veiculos_mortos_Condicao_Climatica_Grupo"
+    with c2:
+        coluna_y = st.selectbox(
+            "📈 Selecione a segunda variável (Eixo Y)",
+            options=colunas_y,
+            key="select_coluna_y"
         )
 
-        divisor()
-        # Agrupa os dados por tipo de acidente
-        df_grouped_tipo = df.groupby("Grupo Via", as_index=False).agg({
-            "Feridos": "sum",
-            "Mortos": "sum"
-        })
-        
-        grafico_scater(
-        "### 🚘 Relação entre Veículos e Mortos (agrupado por Grupo Via)",
-        df_grouped_tipo,
-        coluna_x="Feridos",
-        coluna_y="Mortos",
-        tamanho_y="Mortos",
-        cor_bola="Grupo Via",
-        nome_bola="Grupo Via",
-        titulo="Relação entre Feridos e Mortos por Grupo de Via",
-        key="grafico_veiculos_mortos_Grupo_Via"
+    with c3:
+        causa = st.selectbox(
+            "🎯 Selecione o fator de análise (ex: Região, Tipo, Causa, etc.)",
+            options=coluna_causa,
+            key="select_causa"
         )
-        """
 
-        # --- Definição de colunas ---
-        colunas_x = ['Feridos', 'Mortos', 'Veiculos']
-        colunas_y = ['Mortos','Feridos',  'Veiculos']
-        coluna_causa = ['Grupo Via', 'Condicao Climatica Grupo', 'Tipo Acidente', 'Causa Grupo', 'Tipo Pista',
-                        'Dia Semana', 'Partes Dia', 'Ano', 'Mês', 'Dia','Hora']
+    with c4:
+        # Segunda dimensão opcional: uma bola por par (fator, detalhe)
+        detalhe = st.selectbox(
+            "🔎 Detalhar por (opcional)",
+            options=[None, 'Ano', 'Região', 'Partes Dia', 'Fase Dia', 'Dia Semana'],
+            key="select_detalhe"
+        )
 
-        c1, c2, c3 = st.columns(3, gap="large")
+    # --- Verificação de variáveis iguais ---
+    if coluna_x == coluna_y:
+        st.warning(f"⚠️ As variáveis selecionadas para os eixos **X** e **Y** são iguais: **{coluna_x}**. \
+    Por favor, selecione variáveis diferentes para visualizar a relação entre elas.")
+        return  # interrompe o painel até corrigir
 
-        with c1:
-            coluna_x = st.selectbox(
-                "📊 Selecione a primeira variável (Eixo X)",
-                options=colunas_x,
-                key="select_coluna_x"
-            )
 
-        with c2:
-            coluna_y = st.selectbox(
-                "📈 Selecione a segunda variável (Eixo Y)",
-                options=colunas_y,
-                key="select_coluna_y"
-            )
+    # --- Título dinâmico ---
+    titulo = f"📊 {coluna_x} por {coluna_y}"
 
-        with c3:
-            causa = st.selectbox(
-                "🎯 Selecione o fator de análise (ex: Região, Tipo, Causa, etc.)",
-                options=coluna_causa,
-                key="select_causa"
-            )
+    if detalhe == causa:
+        detalhe = None
 
-        # --- Verificação de variáveis iguais ---
-        if coluna_x == coluna_y:
-            st.warning(f"⚠️ As variáveis selecionadas para os eixos **X** e **Y** são iguais: **{coluna_x}**. \
-        Por favor, selecione variáveis diferentes para visualizar a relação entre elas.")
-            st.stop()  # interrompe a execução do restante do código até corrigir
+    # --- Agrupa os dados pela causa selecionada (motor de agregação: cubo ou uma passada nas linhas) ---
+    # Com detalhe, a tabela de contingência causa x detalhe dá as somas de cada par
+    if detalhe:
+        df_grouped_tipo = cruzamento_longo(cruzar(df, causa, detalhe, cubo))[[causa, detalhe, coluna_x, coluna_y]]
+    else:
+        df_grouped_tipo = agrupar(df, causa, cubo)[[causa, coluna_x, coluna_y]]
 
+    # --- Gera o gráfico ---
+    grafico_scater(
+        df_grouped_tipo,
+        coluna_x=coluna_x,
+        coluna_y=coluna_y,
+        tamanho_y=coluna_y,
+        cor_bola=causa,         # ✅ causa selecionada, não a lista
+        nome_bola=detalhe or causa,
+        titulo=f"Relação entre {coluna_x} e {coluna_y} por {causa}" + (f" e {detalhe}" if detalhe else ""),
+        key="grafico_mortos_feridos"
+    )
+
+
+@st.fragment
+def aba_distribuicao_geografica(df, cubo=None):
+    """Filtros extras e gráficos por Região, Uf, Municipio ou Br."""
+    st.subheader('🧩 Filtros Extras')                                            
+    # Os três filtros se somam à seleção da barra lateral no mesmo índice bitmap (sem cópia)
+    selecoes = df.selecoes
+    c1, c2, c3 = st.columns(3, gap="large")
+    with c1:
+        selecoes = filtro_indexado(df.indice, 'Classificacao Acidente', selecoes)
+    with c2:
+        selecoes = filtro_indexado(df.indice, 'Fase Dia', selecoes)
+    with c3:
+        selecoes = filtro_indexado(df.indice, 'Condicao Metereologica', selecoes)
+    df = df.restringir(selecoes)
+
+    # O cubo não tem esses filtros extras; com algum ativo, os gráficos deste painel e dos seguintes
+    # (ver aplicar_filtros_extras) agrupam as linhas
+    if any(st.session_state.get(f'main_filtro_{filtro}') for filtro in FILTROS_EXTRAS):
+        cubo = None
+    
+    
+    divisor()
+    """
+    grafico_barra(df, 'Região', coluna_y=None, titulo="Acidentes por Região")
 
-        # --- Preparação para gráfico ---
-        df_temp = df.copy()
+    top_n = st.slider("Top N Estados", min_value=5, max_value=27, value=10)
+    grafico_barra(df, 'Uf', titulo="Acidentes por Estados", top_n=top_n)
 
-        # --- Título dinâmico ---
-        titulo = f"📊 {coluna_x} por {coluna_y}"
-
-        # --- Agrupa os dados pela causa selecionada ---
-        df_grouped_tipo = df.groupby(causa, as_index=False).agg({
-            coluna_x: "sum",
-            coluna_y: "sum"
-        })
-
-        # --- Gera o gráfico ---
-        grafico_scater(
-            df_grouped_tipo,
-            coluna_x=coluna_x,
-            coluna_y=coluna_y,
-            tamanho_y=coluna_y,
-            cor_bola=causa,         # ✅ causa selecionada, não a lista
-            nome_bola=causa,        # ✅ causa selecionada, não a lista
-            titulo=f"Relação entre {coluna_x} e {coluna_y} por {causa}",
-            key="grafico_mortos_feridos"
-        )
+    top_n = st.slider("Top N Municípios", min_value=5, max_value=30, value=10)
+    grafico_barra(df, 'Municipio', titulo="Acidentes por Municípios - Top 20", top_n=top_n)
 
+    top_n = st.slider("Top N BR", min_value=5, max_value=30, value=5)
+    grafico_barra(df, 'Br', titulo="Top 20 BR mais acidentes", top_n=top_n)
+    """
+    st.subheader("🎯 Selecione o tipo e os parâmetros para construção dos visualizações")
+    # Seletor de tipo de gráfico
+    tipo_mapa = st.radio(
+        "Tipo de Gráficos",
+        ["Treemap", "Barra", "Coluna" ],
+        horizontal=True
+    )
 
-    with aba3:
-        st.subheader('🧩 Filtros Extras')                                            
-        c1, c2, c3 = st.columns(3, gap="large")
-        with c1:
-           df = filtros_aplicados(df, 'Classificacao Acidente') 
-        with c2:
-           df = filtros_aplicados(df, 'Fase Dia')
-        with c3:
-            df = filtros_aplicados(df, 'Condicao Metereologica')
-        
-        
-        divisor()
-        """
-        grafico_barra(df, 'Região', coluna_y=None, titulo="Acidentes por Região")
-
-        top_n = st.slider("Top N Estados", min_value=5, max_value=27, value=10)
-        grafico_barra(df, 'Uf', titulo="Acidentes por Estados", top_n=top_n)
-
-        top_n = st.slider("Top N Municípios", min_value=5, max_value=30, value=10)
-        grafico_barra(df, 'Municipio', titulo="Acidentes por Municípios - Top 20", top_n=top_n)
-
-        top_n = st.slider("Top N BR", min_value=5, max_value=30, value=5)
-        grafico_barra(df, 'Br', titulo="Top 20 BR mais acidentes", top_n=top_n)
-        """
-        st.subheader("🎯 Selecione o tipo e os parâmetros para construção dos visualizações")
-        # Seletor de tipo de gráfico
-        tipo_mapa = st.radio(
-            "Tipo de Gráficos",
-            ["Treemap", "Barra", "Coluna" ],
-            horizontal=True
-        )
+    # --- Definição de colunas ---
+    colunas_categoricas = ['Região', 'Uf', 'Municipio', 'Br']
+    colunas_numericas = ['Mortos', 'Feridos', 'Veiculos']
 
-        # --- Definição de colunas ---
-        colunas_categoricas = ['Região', 'Uf', 'Municipio', 'Br']
-        colunas_numericas = ['Mortos', 'Feridos', 'Veiculos']
+    c1, c2 = st.columns(2, gap="large")
+
+    with c1:
+        coluna_categoria = st.selectbox(
+            "Selecione a escala de tempo disponível do conjunto de dados para o Eixo X",
+            options=colunas_categoricas,
+            key="select_categoria_barra"  # 🔹 chave única
+        )
 
-        c1, c2 = st.columns(2, gap="large")
+    with c2:
+        grupo_display_map = [("Total Acidentes", None)] + [(col, col) for col in colunas_numericas]
+        grupo_options_display = [g[0] for g in grupo_display_map]
 
-        with c1:
-            coluna_categoria = st.selectbox(
-                "Selecione a escala de tempo disponível do conjunto de dados para o Eixo X",
-                options=colunas_categoricas,
-                key="select_categoria_barra"  # 🔹 chave única
-            )
+        coluna_grupo_display = st.selectbox(
+            "Selecione o grupo disponível do conjunto de dados para o Eixo Y",
+            options=grupo_options_display,
+            key="select_grupo_barra"  # 🔹 chave única
+        )
 
-        with c2:
-            grupo_display_map = [("Total Acidentes", None)] + [(col, col) for col in colunas_numericas]
-            grupo_options_display = [g[0] for g in grupo_display_map]
+            # --- Mapeia o nome exibido (display) para o valor real ---
+        mapa_display_para_valor = dict(grupo_display_map)
+        coluna_grupo = mapa_display_para_valor[coluna_grupo_display]
 
-            coluna_grupo_display = st.selectbox(
-                "Selecione o grupo disponível do conjunto de dados para o Eixo Y",
-                options=grupo_options_display,
-                key="select_grupo_barra"  # 🔹 chave única
-            )
+        # --- Título dinâmico ---
+        titulo = f"📊 {coluna_grupo_display} por {coluna_categoria}"
 
-                # --- Mapeia o nome exibido (display) para o valor real ---
-            mapa_display_para_valor = dict(grupo_display_map)
-            coluna_grupo = mapa_display_para_valor[coluna_grupo_display]
-
-            # --- Preparação para gráfico ---
-            df_temp = df.copy()
-
-            # --- Título dinâmico ---
-            titulo = f"📊 {coluna_grupo_display} por {coluna_categoria}"
-
-            
-
-        # --- Chamada do gráfico de barras ---
-        if tipo_mapa == "Treemap": 
-            try:
-                if coluna_categoria != "Região":
-                    top_n = st.slider(
-                    "Top N para Estados, Municípios e Brs - no máximo 30",
-                    min_value=5,
-                    max_value=30,
-                    value=5
-                )
-                else:
-                    top_n = 5  # só 5 regiões, não precisa do slider
-
-                grafico_treemap(df_temp, coluna_categoria, coluna_grupo, titulo, top_n=top_n)
-            except Exception as e:
-                st.error(f"Erro ao gerar o gráfico de barras: {e}")
-        elif  tipo_mapa == "Barra":
-            try:
-                if coluna_categoria != "Região":
-                    top_n = st.slider(
-                    "Top N para Estados, Municípios e Brs - no máximo 30",
-                    min_value=5,
-                    max_value=30,
-                    value=5
-                )
-                else:
-                    top_n = 5  # só 5 regiões, não precisa do slider
-
-                grafico_barra(df_temp, coluna_categoria, coluna_grupo, titulo, top_n=top_n)
-            except Exception as e:
-                st.error(f"Erro ao gerar o gráfico de barras: {e}")
-        else:
-            try:
-                if coluna_categoria != "Região":
-                    top_n = st.slider(
-                    "Top N para Estados, Municípios e Brs - no máximo 30",
-                    min_value=5,
-                    max_value=30,
-                    value=5
-                )
-                else:
-                    top_n = 5  # só 5 regiões, não precisa do slider
-
-                grafico_coluna(df_temp, coluna_categoria, coluna_grupo, titulo, top_n=top_n)
-            except Exception as e:
-                st.error(f"Erro ao gerar o gráfico de barras: {e}")
-        
-    with aba4:
-        
-        divisor()
         
-        st.subheader("🎯 Selecione o tipo e os parâmetros para construção dos gráficos")
-    
-        # Seletor de tipo de gráfico
-        tipo_mapa = st.radio(
-            "Tipo de Gráficos",
-            ["Treemap", "Pizza", "Coluna"],
-            horizontal=True
-        )
 
-        # As variáveis disponíveis
-        colunas_categoricas = ['Tipo Pista', 'Condicao Climatica Grupo', 'Fase Dia', 'Partes Dia']
-        colunas_numericas = ['Mortos', 'Feridos', 'Veiculos']
+    # --- Chamada do gráfico de barras ---
+    if tipo_mapa == "Treemap": 
+        try:
+            if coluna_categoria != "Região":
+                top_n = st.slider(
+                "Top N para Estados, Municípios e Brs - no máximo 30",
+                min_value=5,
+                max_value=30,
+                value=5
+            )
+                # As categorias fora do top N somadas em uma só (ranking em utils/agregacao.py)
+                outros = st.checkbox("Somar as demais em 'Outros'", key="top_n_outros")
+            else:
+                top_n = 5  # só 5 regiões, não precisa do slider
+                outros = False
 
-        c1, c2 = st.columns(2, gap="large")
+            grafico_treemap(df, coluna_categoria, coluna_grupo, titulo, top_n=top_n, cubo=cubo, outros=outros)
+        except Exception as e:
+            st.error(f"Erro ao gerar o gráfico de barras: {e}")
+    elif  tipo_mapa == "Barra":
+        try:
+            if coluna_categoria != "Região":
+                top_n = st.slider(
+                "Top N para Estados, Municípios e Brs - no máximo 30",
+                min_value=5,
+                max_value=30,
+                value=5
+            )
+                # As categorias fora do top N somadas em uma só (ranking em utils/agregacao.py)
+                outros = st.checkbox("Somar as demais em 'Outros'", key="top_n_outros")
+            else:
+                top_n = 5  # só 5 regiões, não precisa do slider
+                outros = False
 
-        # Receber as variáveis dos gráficos
-        with c1:
-            coluna_categoria = st.selectbox(
-                "Selecione a escala de tempo disponível do conjunto de dados para o Eixo X",
-                options=colunas_categoricas,
-                key="select_categoria_treemap"  # 🔹 chave única
+            grafico_barra(df, coluna_categoria, coluna_grupo, titulo, top_n=top_n, cubo=cubo, outros=outros)
+        except Exception as e:
+            st.error(f"Erro ao gerar o gráfico de barras: {e}")
+    else:
+        try:
+            if coluna_categoria != "Região":
+                top_n = st.slider(
+                "Top N para Estados, Municípios e Brs - no máximo 30",
+                min_value=5,
+                max_value=30,
+                value=5
             )
+                # As categorias fora do top N somadas em uma só (ranking em utils/agregacao.py)
+                outros = st.checkbox("Somar as demais em 'Outros'", key="top_n_outros")
+            else:
+                top_n = 5  # só 5 regiões, não precisa do slider
+                outros = False
 
-        with c2:
-            grupo_display_map = [("Total Acidentes", None)] + [(col, col) for col in colunas_numericas]
-            grupo_options_display = [g[0] for g in grupo_display_map]
+            grafico_coluna(df, coluna_categoria, coluna_grupo, titulo, top_n=top_n, cubo=cubo, outros=outros)
+        except Exception as e:
+            st.error(f"Erro ao gerar o gráfico de barras: {e}")
 
-            coluna_grupo_display = st.selectbox(
-                "Selecione o grupo disponível do conjunto de dados para o Eixo Y",
-                options=grupo_options_display,
-                key="select_grupo_treemap"  # 🔹 chave única
-            )
 
-                # Mapeia o nome exibido (display) para o valor real 
-            mapa_display_para_valor = dict(grupo_display_map)
-            coluna_grupo = mapa_display_para_valor[coluna_grupo_display]
+@st.fragment
+def aba_caracteristicas(df, cubo=None):
+    """Treemap, pizza ou colunas por características da via e do dia."""
+    
+    divisor()
+    
+    st.subheader("🎯 Selecione o tipo e os parâmetros para construção dos gráficos")
 
-            #  Preparação para gráfico 
-            df_temp = df.copy()
+    # Seletor de tipo de gráfico
+    tipo_mapa = st.radio(
+        "Tipo de Gráficos",
+        ["Treemap", "Pizza", "Coluna"],
+        horizontal=True
+    )
 
-            #  Título dinâmico 
-            titulo = f"📊 {coluna_grupo_display} por {coluna_categoria}"
-        
-        # Exibir os gráficos 
-        if tipo_mapa == "Treemap":
-            try:
-                grafico_treemap(df_temp, coluna_categoria, coluna_grupo, titulo, top_n=top_n)
-            except Exception as e:
-                st.error(f"Erro ao gerar o gráfico de treemap: {e}")
-        elif tipo_mapa == "Pizza":
-            try:
-                grafico_pizza(df_temp, coluna_categoria, coluna_grupo, titulo, top_n=top_n)
-            except Exception as e:
-                st.error(f"Erro ao gerar o gráfico de treemap: {e}")
-        else:
-            try:
-                grafico_coluna(df_temp, coluna_categoria, coluna_grupo, titulo, top_n=top_n)
-            except Exception as e:
-                st.error(f"Erro ao gerar o gráfico de treemap: {e}")
-        
-        
-        
+    # As variáveis disponíveis
+    colunas_categoricas = ['Tipo Pista', 'Condicao Climatica Grupo', 'Fase Dia', 'Partes Dia']
+    colunas_numericas = ['Mortos', 'Feridos', 'Veiculos']
 
-    with aba5:
-        """
-        c1, c2 = st.columns(2, gap="large")
-        with c1:
-            top_n = st.slider("Top N Tipo Acidente", min_value=5, max_value=16, value=5)
-            grafico_barra(df, 'Tipo Acidente', titulo="Tipos de Acidentes",  top_n=top_n)
-        with c2:
-            top_n = st.slider("Top N Causa Acidente", min_value=5, max_value=8, value=5)
-            grafico_barra(df, 'Causa Grupo', titulo="Causas de Acidentes",  top_n=top_n)
-        
-        divisor()
-        c3, c4 = st.columns(2, gap="large")
-        with c3:
-            grafico_treemap(df, 'Partes Dia', titulo="Partes do dia")
-        with c4:
-            
-            grafico_treemap(df, 'Fase Dia', titulo="Fase do Dia")
-        """
-        divisor()
-        st.subheader("🎯 Selecione parâmetros abaixo para construção de um gráfico de radar para analise")
-        # Grafico de radar interativo
-        # Dando opcoes para o usuario escolher
-        colunas_categoricas = ['Condicao Metereologica', 'Fase Dia', 'Tipo Acidente', 'Classificacao Acidente',
-                               'Grupo Via', 'Região', 'Uf', 'Partes Dia', 'Causa Grupo', 'Condicao Climatica Grupo']
-        colunas_numericas = ['Ano', 'Mês', 'Mortos', 'Feridos', 'Veiculos', 'Dia Semana']
-
-        # Filtro para categoria (eixo angular)
+    c1, c2 = st.columns(2, gap="large")
+
+    # Receber as variáveis dos gráficos
+    with c1:
         coluna_categoria = st.selectbox(
-            "Escolha a categoria (eixo angular)", 
-            options=colunas_categoricas, 
-            index=colunas_categoricas.index("Tipo Acidente") if "Tipo Acidente" in colunas_categoricas else 0
+            "Selecione a escala de tempo disponível do conjunto de dados para o Eixo X",
+            options=colunas_categoricas,
+            key="select_categoria_treemap"  # 🔹 chave única
         )
 
-        # Filtro para grupo (ex.: Ano)
-        coluna_grupo = st.selectbox(
-            "Escolha o grupo para comparar (cor)", 
-            options=[None] + colunas_numericas, 
-            index=colunas_numericas.index("Ano") + 1 if "Ano" in colunas_numericas else 0
+    with c2:
+        grupo_display_map = [("Total Acidentes", None)] + [(col, col) for col in colunas_numericas]
+        grupo_options_display = [g[0] for g in grupo_display_map]
+
+        coluna_grupo_display = st.selectbox(
+            "Selecione o grupo disponível do conjunto de dados para o Eixo Y",
+            options=grupo_options_display,
+            key="select_grupo_treemap"  # 🔹 chave única
         )
 
-        
-        # Validação e chamada do gráfico
-       
-        if coluna_categoria == coluna_grupo:
-            st.warning("⚠️ As colunas de categoria e grupo não podem ser iguais. Escolha colunas diferentes.")
-        else:
-            try:
-                titulo = f"📊 {coluna_categoria} por {coluna_grupo if coluna_grupo else ''}"
-                grafico_radar(df, coluna_categoria, coluna_grupo, titulo)
-            except Exception as e:
-                st.error(f"Erro ao gerar o gráfico de radar: {e}")
+            # Mapeia o nome exibido (display) para o valor real 
+        mapa_display_para_valor = dict(grupo_display_map)
+        coluna_grupo = mapa_display_para_valor[coluna_grupo_display]
 
+        #  Título dinâmico 
+        titulo = f"📊 {coluna_grupo_display} por {coluna_categoria}"
     
+    # Exibir os gráficos 
+    if tipo_mapa == "Treemap":
+        try:
+            grafico_treemap(df, coluna_categoria, coluna_grupo, titulo, cubo=cubo)
+        except Exception as e:
+            st.error(f"Erro ao gerar o gráfico de treemap: {e}")
+    elif tipo_mapa == "Pizza":
+        try:
+            grafico_pizza(df, coluna_categoria, coluna_grupo, titulo, cubo=cubo)
+        except Exception as e:
+            st.error(f"Erro ao gerar o gráfico de treemap: {e}")
+    else:
+        try:
+            grafico_coluna(df, coluna_categoria, coluna_grupo, titulo, cubo=cubo)
+        except Exception as e:
+            st.error(f"Erro ao gerar o gráfico de treemap: {e}")
+
+
+@st.fragment
+def aba_fatores(df, cubo=None):
+    """Gráfico de radar por categoria e grupo."""
+    """
+    c1, c2 = st.columns(2, gap="large")
+    with c1:
+        top_n = st.slider("Top N Tipo Acidente", min_value=5, max_value=16, value=5)
+        grafico_barra(df, 'Tipo Acidente', titulo="Tipos de Acidentes",  top_n=top_n)
+    with c2:
+        top_n = st.slider("Top N Causa Acidente", min_value=5, max_value=8, value=5)
+        grafico_barra(df, 'Causa Grupo', titulo="Causas de Acidentes",  top_n=top_n)
     
-    with aba6:
-        """
-        st.header("Análise Geográfica de Acidentes")
-
-        c1, c2 = st.columns(2, gap="large")
-        with c1:
-           df = filtros_aplicados(df, 'Br') 
-        with c2:
-           df = filtros_aplicados(df, 'Km')
+    divisor()
+    c3, c4 = st.columns(2, gap="large")
+    with c3:
+        grafico_treemap(df, 'Partes Dia', titulo="Partes do dia")
+    with c4:
         
+        grafico_treemap(df, 'Fase Dia', titulo="Fase do Dia")
+    """
+    divisor()
+    st.subheader("🎯 Selecione parâmetros abaixo para construção de um gráfico de radar para analise")
+
+    # --- Radar ou tabela de calor (mesma tabela de contingência) ---
+    visualizacao = st.radio(
+        "Visualização:",
+        ["Radar", "Tabela de calor"],
+        horizontal=True,
+        key="fatores_visualizacao"
+    )
+
+    # Grafico de radar interativo
+    # Dando opcoes para o usuario escolher
+    colunas_categoricas = ['Condicao Metereologica', 'Fase Dia', 'Tipo Acidente', 'Classificacao Acidente',
+                           'Grupo Via', 'Região', 'Uf', 'Partes Dia', 'Causa Grupo', 'Condicao Climatica Grupo']
+    colunas_numericas = ['Ano', 'Mês', 'Mortos', 'Feridos', 'Veiculos', 'Dia Semana', 'Hora']
+    if visualizacao == "Tabela de calor":
+        # Na tabela cabem dimensões com muitos valores
+        colunas_categoricas = colunas_categoricas + ['Municipio']
+
+    # Filtro para categoria (eixo angular)
+    coluna_categoria = st.selectbox(
+        "Escolha a categoria (eixo angular)", 
+        options=colunas_categoricas, 
+        index=colunas_categoricas.index("Tipo Acidente") if "Tipo Acidente" in colunas_categoricas else 0
+    )
+
+    # Filtro para grupo (ex.: Ano)
+    coluna_grupo = st.selectbox(
+        "Escolha o grupo para comparar (cor)", 
+        options=[None] + colunas_numericas, 
+        index=colunas_numericas.index("Ano") + 1 if "Ano" in colunas_numericas else 0
+    )
 
-        # Seletor de tipo de mapa
-        tipo_mapa = st.radio(
-            "Escolha o indicador para visualizar:",
-            ["Mortes", "Feridos", "Acidentes"],
-            horizontal=True
-        )
+    
+    # Validação e chamada do gráfico
+   
+    if coluna_categoria == coluna_grupo:
+        st.warning("⚠️ As colunas de categoria e grupo não podem ser iguais. Escolha colunas diferentes.")
+    elif visualizacao == "Tabela de calor":
+        if coluna_grupo is None:
+            st.info("Escolha um grupo para cruzar com a categoria.")
+            return
+        medidas = {"Acidentes": None, "Mortos": "Mortos", "Feridos": "Feridos", "Veículos": "Veiculos"}
+        medida = st.selectbox("Valor das células", options=list(medidas), key="fatores_medida")
+        try:
+            titulo = f"📊 {medida} por {coluna_categoria} e {coluna_grupo}"
+            grafico_tabela_calor(df, coluna_categoria, coluna_grupo, medidas[medida], titulo, cubo=cubo)
+        except Exception as e:
+            st.error(f"Erro ao gerar a tabela de calor: {e}")
+    else:
+        try:
+            titulo = f"📊 {coluna_categoria} por {coluna_grupo if coluna_grupo else ''}"
+            grafico_radar(df, coluna_categoria, coluna_grupo, titulo, cubo=cubo)
+        except Exception as e:
+            st.error(f"Erro ao gerar o gráfico de radar: {e}")
 
-        # Define qual coluna e título usar
-        if tipo_mapa == "Mortes":
-            coluna_valor = "Mortos"
-            titulo = "Mapa de Calor - Mortes em Rodovias Federais"
-        elif tipo_mapa == "Feridos":
-            coluna_valor = "Feridos"
-            titulo = "Mapa de Calor - Feridos em Rodovias Federais"
-        else:
-            coluna_valor = "Veiculos"
-            titulo = "Mapa de Calor - Total de Acidentes (por veículos envolvidos)"
-        
 
-        # Gera o gráfico
-        fig = grafico_heatmap(df, coluna_valor, titulo)
+@st.fragment
+def aba_mapas(df, cubo=None):
+    """Mapa de calor das BRs com mais ocorrências."""
+    """
+    st.header("Análise Geográfica de Acidentes")
 
-        if fig:
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.warning("Não foi possível gerar o mapa. Verifique se há dados válidos.")
-        """
-        st.subheader("🎯 Selecione parâmetros abaixo para construção de um mapa de calor dinâmico")
-
-        # --- Cópia temporária do dataframe ---
-        df_temp = df.copy()
-
-        # --- Seletor de tipo de mapa ---
-        tipo_mapa = st.radio(
-            "Escolha o indicador para visualizar:",
-            ["Mortes", "Feridos", "Acidentes"],
-            horizontal=True
-        )
+    c1, c2 = st.columns(2, gap="large")
+    with c1:
+       df = filtros_aplicados(df, 'Br') 
+    with c2:
+       df = filtros_aplicados(df, 'Km')
+    
 
-        # Define qual coluna e título usar
-        if tipo_mapa == "Mortes":
-            coluna_valor = "Mortos"
-            titulo = "Mapa de Calor - Mortes em Rodovias Federais"
-        elif tipo_mapa == "Feridos":
-            coluna_valor = "Feridos"
-            titulo = "Mapa de Calor - Feridos em Rodovias Federais"
-        else:
-            coluna_valor = "Veiculos"
-            titulo = "Mapa de Calor - Total de Acidentes (por veículos envolvidos)"
-
-        # --- Slider para reduzir a quantidade de pontos ---
-        top_n = st.slider(
-            "Selecione o número de BRs para exibir (5 a 15):",
-            min_value=5,
-            max_value=15,
-            value=10
-        )
+    # Seletor de tipo de mapa
+    tipo_mapa = st.radio(
+        "Escolha o indicador para visualizar:",
+        ["Mortes", "Feridos", "Acidentes"],
+        horizontal=True
+    )
+
+    # Define qual coluna e título usar
+    if tipo_mapa == "Mortes":
+        coluna_valor = "Mortos"
+        titulo = "Mapa de Calor - Mortes em Rodovias Federais"
+    elif tipo_mapa == "Feridos":
+        coluna_valor = "Feridos"
+        titulo = "Mapa de Calor - Feridos em Rodovias Federais"
+    else:
+        coluna_valor = "Veiculos"
+        titulo = "Mapa de Calor - Total de Acidentes (por veículos envolvidos)"
+    
 
-        try:
-            # --- Ordena e filtra as BRs com mais ocorrências ---
-            if "Br" in df_temp.columns and coluna_valor in df_temp.columns:
-                top_brs = (
-                    df_temp.groupby("Br")[coluna_valor]
-                    .sum()
-                    .nlargest(top_n)
-                    .index
-                )
+    # Gera o gráfico
+    fig = grafico_heatmap(df, coluna_valor, titulo)
+
+    if fig:
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.warning("Não foi possível gerar o mapa. Verifique se há dados válidos.")
+    """
+    st.subheader("🎯 Selecione parâmetros abaixo para construção de um mapa de calor dinâmico")
+
+    # --- Seletor de tipo de mapa ---
+    tipo_mapa = st.radio(
+        "Escolha o indicador para visualizar:",
+        ["Mortes", "Feridos", "Acidentes"],
+        horizontal=True
+    )
+
+    # Define qual coluna e título usar
+    if tipo_mapa == "Mortes":
+        coluna_valor = "Mortos"
+        titulo = "Mapa de Calor - Mortes em Rodovias Federais"
+    elif tipo_mapa == "Feridos":
+        coluna_valor = "Feridos"
+        titulo = "Mapa de Calor - Feridos em Rodovias Federais"
+    else:
+        coluna_valor = "Veiculos"
+        titulo = "Mapa de Calor - Total de Acidentes (por veículos envolvidos)"
+
+    # --- Slider para reduzir a quantidade de pontos ---
+    top_n = st.slider(
+        "Selecione o número de BRs para exibir (5 a 15):",
+        min_value=5,
+        max_value=15,
+        value=10
+    )
+
+    # --- Grade agregada no servidor (padrão) ou todos os pontos ---
+    modo_mapa = st.radio(
+        "Modo do mapa:",
+        ["Grade agregada", "Pontos"],
+        horizontal=True,
+        key="modo_mapa"
+    )
+    if modo_mapa == "Grade agregada":
+        zoom = st.slider("Zoom do mapa (define o tamanho das células):", min_value=3, max_value=10, value=4,
+                         key="zoom_mapa")
+
+    try:
+        # --- BRs com mais ocorrências (ranking memorizado por seleção, utils/agregacao.py) ---
+        top_brs = None
+        if "Br" in df.columns and coluna_valor in df.columns:
+            pedido = Pedido("Br", coluna_valor, top_n)
+            top_brs = agregar(df, [pedido], cubo)[pedido]["Br"]
+
+        if modo_mapa == "Grade agregada":
+            # Só Br e a medida são materializadas; as coordenadas já estão na pirâmide de grades
+            posicoes = df.posicoes if df.posicoes is not None else np.arange(len(df.base))
+            linhas = projetar(df, ['Br', coluna_valor])
+            if top_brs is not None:
+                nas_brs = linhas['Br'].isin(top_brs).to_numpy()
+                posicoes, linhas = posicoes[nas_brs], linhas[nas_brs]
+            celulas, nivel = agregar_grade(carregar_piramide(colunas_pagina("Painéis"), df.indice["anos"]), nivel_do_zoom(zoom),
+                                           posicoes, linhas[coluna_valor].to_numpy(dtype='float64', na_value=0))
+            fig = figura_heatmap_grade(celulas, coluna_valor, titulo, zoom)
+            st.caption(f"{formatar_milhar(len(posicoes))} acidentes em {formatar_milhar(len(celulas))} células "
+                       f"de {360 / 2 ** nivel:.3g}° de lado")
+        else:
+            # --- Só as colunas do mapa, nas linhas selecionadas ---
+            df_temp = projetar(df, ['Latitude', 'Longitude', 'Km', 'Br', 'Região', 'Uf', 'Municipio', coluna_valor])
+            if top_brs is not None:
                 df_temp = df_temp[df_temp["Br"].isin(top_brs)]
-
-            # --- Chama a função de mapa de calor ---
             fig = grafico_heatmap(df_temp, coluna_valor, titulo)
-            if fig is not None:
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.warning("Não há dados suficientes para gerar o mapa.")
-        except Exception as e:
-            st.error(f"Erro ao gerar o mapa de calor: {e}")
 
-    with aba7:
-        
-        # Fazer nota explicatoria da analise de dados e desenvolvimento do app
-
-        st.header("📘 Metodologia da Análise")
-        st.markdown("Abaixo estão os principais critérios e tratamentos aplicados aos dados utilizados neste painel:")
-
-        with st.expander("🧹 **Principais tratamentos aplicados aos dados/Enriquecimento da fonte de dados**"):
-            st.markdown("""
-            - Junção das colunas **Feridos Graves** e **Feridos Leves** em `Feridos`;  
-            - Criação das colunas ['Ano', 'Mês','Dia', 'Hora', 'Partes_Dia', 'Região'] para futura aplicação de machine learning;  
-            - Junção das colunas `Município` e `UF` → `Município - UF`.
-            """)
-
-        with st.expander("🧠 **Agrupamento da coluna 'Causas_Acidentes**"):
-            st.markdown("""
-            - 🚗 **Condutor - Falha humana:** Reação tardia, contramão, ultrapassagem, velocidade, celular, etc.  
-            - 💤 **Condutor - Fadiga / Álcool / Drogas / Saúde:** Sono, ingestão de álcool, mal súbito.  
-            - 🛣️ **Via / Infraestrutura:** Buracos, pista escorregadia, sinalização deficiente, iluminação ruim.  
-            - 🌧️ **Clima / Ambiente:** Chuva, neblina, fumaça, óleo, areia.  
-            - 🔧 **Veículo - Falha mecânica:** Freios, suspensão, pneus, faróis.  
-            - 🚶 **Pedestre:** Travessia fora da faixa, embriaguez, falta de passarela.  
-            - 🐄 **Animais / Objetos / Obstáculos:** Animais, objetos, obstruções.  
-            - ❓ **Outros / Indefinidos:** Causas não especificadas.  
-            """)
-
-        with st.expander("⏰ **Agrupamento da coluna 'Horario'**"):
-            st.markdown("""
-            - 🌅 **06:00 às 11:59 - Manhã**  
-            - 🌇 **12:00 às 17:59 - Tarde**  
-            - 🌙 **18:00 às 23:59 - Noite**  
-            - 🛌 **00:00 às 05:59 - Madrugada**  
-            """)
-
-        with st.expander("🧠 **Agrupamento da coluna 'condicao_metereologica'**"):
-            st.markdown("""
-            - ☀️ **Bom:** Céu claro, sol, nublado.   
-            - 🌧️ **Chuva:** Chuva, garoa, chuvisco.  
-            - 🌫️ **Outros:** Vento, nevoeiro, granizo, neve, ignorado.  
-            """)  
-
-        with st.expander("🛣️ **Agrupamento da coluna 'Grupo_via'**"):
-            st.markdown("""
-            - 🟢 **Reta:** Trechos retos da via.  
-            - ↗️ **Aclive:** Trechos com subida acentuada.  
-            - ↘️ **Declive:** Trechos com descida acentuada.  
-            - 🔄 **Curva:** Trechos curvos da via, incluindo curvas fechadas e leves.  
-            - 🏗️ **Viaduto:** Pontes, elevados ou viadutos.  
-            - ❓ **Outros:** Qualquer outro tipo de trecho não classificado acima.  
-            """)
-
-        with st.expander("📆 **Período e fonte dos dados**"):
-            st.markdown("""
-            - Dados públicos da **Polícia Rodoviária Federal (PRF)**.  
-            - Período analisado: **2021 a Ago/2025**.  
-            - Escopo: acidentes com vítimas (mortos e/ou feridos).  
-            """)
-
-        with st.expander("💡 **Objetivo da aplicação**"):
-            st.markdown("""
-            Este painel interativo foi desenvolvido para **explorar os padrões e fatores associados aos acidentes rodoviários**, 
-            permitindo identificar relações entre causas, condições climáticas, horários e gravidade dos eventos.
-            """)
-        
-        with st.expander("🛣️ Recomendações para Redução de Acidentes"):
-            st.markdown("""
+        if fig is not None:
+            exibir_figura(fig, "mapa " + modo_mapa.lower())
+        else:
+            st.warning("Não há dados suficientes para gerar o mapa.")
+    except Exception as e:
+        st.error(f"Erro ao gerar o mapa de calor: {e}")
+
+    divisor()
+    perto_do_km(df)
+
+
+def perto_do_km(df):
+    """Ocorrências num raio em torno de um Km de uma BR, pelo índice espacial (sem varrer as coordenadas)."""
+    st.subheader("📍 O que aconteceu perto deste Km")
+    if df.empty or not {"Br", "Km", "Latitude", "Longitude"}.issubset(df.columns):
+        st.info("Não há ocorrências com BR e Km na seleção atual.")
+        return
+
+    c1, c2, c3 = st.columns(3, gap="large")
+    with c1:
+        br = st.selectbox("BR:", sorted(pd.unique(df["Br"].dropna())), key="perto_br")
+    with c2:
+        km = st.number_input("Km:", min_value=0.0, value=0.0, step=1.0, key="perto_km")
+    with c3:
+        raio = st.slider("Raio (km):", min_value=1, max_value=50, value=10, key="perto_raio")
+
+    # Ponto de referência e consultas restritos às linhas já filtradas
+    ponto = localizar_km(carregar_indice_km(colunas_pagina("Painéis"), df.indice["anos"]), br, km, df.posicoes)
+    if ponto is None:
+        st.info("Não há ocorrências com coordenadas nessa BR.")
+        return
+    latitude, longitude, km_encontrado = ponto
+    indice = carregar_indice_espacial(colunas_pagina("Painéis"), df.indice["anos"])
+    posicoes, _ = consultar_raio(indice, latitude, longitude, raio, df.posicoes)
+    perto = df.recortar(posicoes)
+
+    st.caption(f"Referência: BR-{br}, Km {km_encontrado:.0f} ({latitude:.4f}, {longitude:.4f})")
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Acidentes no raio", total_acidentes(perto), border=True)
+    m2.metric("Mortos no raio", total_mortos(perto), border=True)
+    m3.metric("Feridos no raio", total_feridos(perto), border=True)
+    if perto.empty:
+        return
+
+    c4, c5 = st.columns([2, 3], gap="large")
+    with c4:
+        # A visão recortada não vale para o cubo: agrega as próprias linhas
+        grafico_barra(perto, "Tipo Acidente", titulo="Tipos de acidente no raio", top_n=10)
+    with c5:
+        vizinhos, distancias = consultar_vizinhos(indice, latitude, longitude, 10, df.posicoes)
+        colunas = ["Data", "Br", "Km", "Municipio", "Uf", "Tipo Acidente", "Mortos", "Feridos"]
+        tabela = projetar(df.base, colunas).take(vizinhos).reset_index(drop=True)
+        tabela.insert(0, "Distância (km)", distancias.round(2))
+        st.markdown("**10 ocorrências mais próximas**")
+        st.dataframe(tabela, hide_index=True, use_container_width=True)
+
+
+def aba_notas():
+    """Metodologia e notas da análise."""
+    
+    # Fazer nota explicatoria da analise de dados e desenvolvimento do app
+
+    st.header("📘 Metodologia da Análise")
+    st.markdown("Abaixo estão os principais critérios e tratamentos aplicados aos dados utilizados neste painel:")
+
+    with st.expander("🧹 **Principais tratamentos aplicados aos dados/Enriquecimento da fonte de dados**"):
+        st.markdown("""
+        - Junção das colunas **Feridos Graves** e **Feridos Leves** em `Feridos`;  
+        - Criação das colunas ['Ano', 'Mês','Dia', 'Hora', 'Partes_Dia', 'Região'] para futura aplicação de machine learning;  
+        - Junção das colunas `Município` e `UF` → `Município - UF`.
+        """)
+
+    with st.expander("🧠 **Agrupamento da coluna 'Causas_Acidentes**"):
+        st.markdown("""
+        - 🚗 **Condutor - Falha humana:** Reação tardia, contramão, ultrapassagem, velocidade, celular, etc.  
+        - 💤 **Condutor - Fadiga / Álcool / Drogas / Saúde:** Sono, ingestão de álcool, mal súbito.  
+        - 🛣️ **Via / Infraestrutura:** Buracos, pista escorregadia, sinalização deficiente, iluminação ruim.  
+        - 🌧️ **Clima / Ambiente:** Chuva, neblina, fumaça, óleo, areia.  
+        - 🔧 **Veículo - Falha mecânica:** Freios, suspensão, pneus, faróis.  
+        - 🚶 **Pedestre:** Travessia fora da faixa, embriaguez, falta de passarela.  
+        - 🐄 **Animais / Objetos / Obstáculos:** Animais, objetos, obstruções.  
+        - ❓ **Outros / Indefinidos:** Causas não especificadas.  
+        """)
+
+    with st.expander("⏰ **Agrupamento da coluna 'Horario'**"):
+        st.markdown("""
+        - 🌅 **06:00 às 11:59 - Manhã**  
+        - 🌇 **12:00 às 17:59 - Tarde**  
+        - 🌙 **18:00 às 23:59 - Noite**  
+        - 🛌 **00:00 às 05:59 - Madrugada**  
+        """)
+
+    with st.expander("🧠 **Agrupamento da coluna 'condicao_metereologica'**"):
+        st.markdown("""
+        - ☀️ **Bom:** Céu claro, sol, nublado.   
+        - 🌧️ **Chuva:** Chuva, garoa, chuvisco.  
+        - 🌫️ **Outros:** Vento, nevoeiro, granizo, neve, ignorado.  
+        """)  
+
+    with st.expander("🛣️ **Agrupamento da coluna 'Grupo_via'**"):
+        st.markdown("""
+        - 🟢 **Reta:** Trechos retos da via.  
+        - ↗️ **Aclive:** Trechos com subida acentuada.  
+        - ↘️ **Declive:** Trechos com descida acentuada.  
+        - 🔄 **Curva:** Trechos curvos da via, incluindo curvas fechadas e leves.  
+        - 🏗️ **Viaduto:** Pontes, elevados ou viadutos.  
+        - ❓ **Outros:** Qualquer outro tipo de trecho não classificado acima.  
+        """)
+
+    with st.expander("📆 **Período e fonte dos dados**"):
+        st.markdown("""
+        - Dados públicos da **Polícia Rodoviária Federal (PRF)**.  
+        - Período analisado: **2021 a Ago/2025**.  
+        - Escopo: acidentes com vítimas (mortos e/ou feridos).  
+        """)
+
+    with st.expander("💡 **Objetivo da aplicação**"):
+        st.markdown("""
+        Este painel interativo foi desenvolvido para **explorar os padrões e fatores associados aos acidentes rodoviários**, 
+        permitindo identificar relações entre causas, condições climáticas, horários e gravidade dos eventos.
+        """)
+    
+    with st.expander("🛣️ Recomendações para Redução de Acidentes"):
+        st.markdown("""
 
 
-                Para reduzir a ocorrência de acidentes nas rodovias federais, recomenda-se a adoção das seguintes medidas:
+            Para reduzir a ocorrência de acidentes nas rodovias federais, recomenda-se a adoção das seguintes medidas:
 
 - 🚗 Campanhas institucionais voltadas à direção responsável, promovendo conscientização sobre comportamentos seguros no trânsito.  
 - 👮 Intensificação da fiscalização durante os períodos e locais de maior risco, garantindo maior presença e atuação preventiva das autoridades.  
@@ -685,14 +816,63 @@ def graficos(df):
 
 A combinação dessas ações pode contribuir significativamente para reduzir o número de acidentes e aumentar a segurança viária nas rodovias federais.
 """, unsafe_allow_html=True)
-    
 
-        st.markdown("---")
-        st.caption("_Nosso objetivo garantir transparência e reprodutibilidade da análise._")
 
+    st.markdown("---")
+    st.caption("_Nosso objetivo garantir transparência e reprodutibilidade da análise._")
+
+
+# ----------------------------
+# Navegação entre os painéis
+# ----------------------------
+PAINEIS = {
+    "⏳ Linha do Tempo": aba_linha_do_tempo,
+    "📉 Analise relacional": aba_analise_relacional,
+    "🌍 Distribuição Geográfica": aba_distribuicao_geografica,
+    "⚠️ Características dos Acidentes": aba_caracteristicas,
+    "⚡Fatores de Ocorrências": aba_fatores,
+    "🗺️ Mapas": aba_mapas,
+    "🧹 Notas Explicativas": aba_notas,
+}
+
+# Painéis que vêm depois da Distribuição Geográfica também recebem os filtros extras dela
+PAINEIS_COM_FILTROS_EXTRAS = ["⚠️ Características dos Acidentes", "⚡Fatores de Ocorrências", "🗺️ Mapas"]
+
+
+def aplicar_filtros_extras(df, cubo=None):
+    """
+    Aplica os filtros extras guardados na sessão (sem os widgets, que ficam na Distribuição Geográfica).
+    Com algum ativo o cubo não serve mais (ele não tem essas dimensões).
+    """
+    extras = {filtro: list(st.session_state.get(f'main_filtro_{filtro}', [])) for filtro in FILTROS_EXTRAS}
+    if not any(extras.values()):
+        return df, cubo
+    return df.restringir({**df.selecoes, **extras}), None
+
+
+def graficos(df, cubo=None):
+    # Só o painel escolhido é executado (st.tabs rodaria os sete a cada rerun).
+    # Cada painel é um fragmento: mudar um widget dentro dele reexecuta só aquele painel
+    painel = st.radio("Painel", list(PAINEIS), horizontal=True, key="painel_ativo", label_visibility="collapsed")
+    marcar(aba=painel)
+    divisor()
+
+    # Widgets que não são desenhados perdem o valor; regravar na sessão mantém os filtros
+    # extras ao trocar de painel
+    for filtro in FILTROS_EXTRAS:
+        chave = f'main_filtro_{filtro}'
+        if chave in st.session_state:
+            st.session_state[chave] = st.session_state[chave]
+
+    if painel == "🧹 Notas Explicativas":
+        aba_notas()
+        return
+    if painel in PAINEIS_COM_FILTROS_EXTRAS:
+        df, cubo = aplicar_filtros_extras(df, cubo)
+    PAINEIS[painel](df, cubo)
 
 
-def mainGraficos(df):
+def mainGraficos(df, cubo=None):
     divisor()
-    graficos(df) 
+    graficos(df, cubo) 
    
\ No newline at end of file
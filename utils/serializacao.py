@@ -0,0 +1,167 @@
+import re
+import base64
+import threading
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+
+
+
+# ----------------------------
+# Figuras compactas para o navegador
+# ----------------------------
+# O que vai para o navegador é o JSON da figura. O Plotly já codifica arrays numpy como
+# typed arrays em base64; aqui a figura é preparada para aproveitar isso e para não levar
+# o que o gráfico não usa:
+# - template só com os tipos de trace presentes (o padrão traz ~40 tipos e pesa mais que os dados)
+# - customdata só com as colunas citadas em hovertemplate/texttemplate
+# - arrays numéricos como numpy, no menor tipo que guarda os valores (inteiros, float32)
+# - datas de eixos do tipo 'date' como milissegundos (número) em vez de texto
+# - scatter com muitos pontos vira scattergl (WebGL)
+
+LIMITE_PONTOS_WEBGL = 1000
+
+# Propriedades de trace com um valor por ponto
+ARRAYS_TRACE = ['x', 'y', 'z', 'r', 'lat', 'lon', 'values', 'customdata']
+
+_REFERENCIA_CUSTOMDATA = re.compile(r'customdata\[(\d+)\]')
+
+
+def _como_array(valores):
+    """Array numpy de uma lista, array ou typed array já codificado ({'dtype', 'bdata', 'shape'})."""
+    if isinstance(valores, dict):
+        if 'bdata' not in valores:
+            return None
+        array = np.frombuffer(base64.b64decode(valores['bdata']), dtype=np.dtype(valores['dtype']))
+        forma = valores.get('shape')
+        if forma:
+            array = array.reshape([int(n) for n in str(forma).split(',')])
+        return array
+    return np.asarray(valores)
+
+
+def _array_compacto(valores):
+    """
+    Array numpy no menor tipo que guarda os mesmos valores; None se não for numérico.
+    float64 só vira float32 quando a conversão é exata (senão o tooltip mostraria 22.2999992).
+    """
+    array = _como_array(valores)
+    if array is None or array.dtype.kind not in 'iuf' or array.size == 0:
+        return None
+    if array.dtype.kind == 'f':
+        finitos = array[np.isfinite(array)]
+        inteiros = len(finitos) == array.size and np.array_equal(finitos, np.round(finitos))
+        if inteiros and np.abs(finitos).max() < 2 ** 53:
+            array = array.astype(np.int64)
+        elif array.dtype == np.float64 and np.array_equal(array.astype(np.float32), array, equal_nan=True):
+            return array.astype(np.float32)
+        else:
+            return array
+    tipo = np.result_type(np.min_scalar_type(int(array.min())), np.min_scalar_type(int(array.max())))
+    # O navegador não lê typed arrays de 64 bits inteiros; float64 guarda inteiros até 2**53
+    return array.astype(np.float64 if tipo.itemsize == 8 else tipo)
+
+
+def _datas_em_ms(valores):
+    """Datas como milissegundos desde 1970 (float64), que o eixo de datas do Plotly aceita."""
+    array = _como_array(valores)
+    if array is None or array.dtype.kind != 'M':
+        return None
+    return array.astype('datetime64[ms]').astype(np.int64).astype(np.float64)
+
+
+def _colunas_citadas(trace):
+    """Colunas de customdata citadas nos templates; None se algum template não for um texto único."""
+    nomes = ['texttemplate'] if trace.get('hoverinfo') == 'skip' else ['hovertemplate', 'texttemplate']
+    textos = [trace[nome] for nome in nomes if trace.get(nome) is not None]
+    if not all(isinstance(texto, str) for texto in textos):
+        return None
+    return sorted({int(i) for texto in textos for i in _REFERENCIA_CUSTOMDATA.findall(texto)})
+
+
+def _remapear(texto, mapa):
+    return _REFERENCIA_CUSTOMDATA.sub(lambda m: f'customdata[{mapa[int(m.group(1))]}]', texto)
+
+
+def _enxugar_customdata(trace):
+    """Mantém só as colunas de customdata citadas nos templates, renumerando as citações."""
+    customdata = trace.get('customdata')
+    if customdata is None:
+        return
+    colunas = _colunas_citadas(trace)
+    if colunas is None:
+        return
+    tabela = pd.DataFrame(_como_array(customdata) if isinstance(customdata, dict) else customdata)
+    if not colunas:
+        trace.pop('customdata')
+        return
+    if max(colunas) >= tabela.shape[1] or colunas == list(range(tabela.shape[1])):
+        return
+    mapa = {antiga: nova for nova, antiga in enumerate(colunas)}
+    trace['customdata'] = tabela.iloc[:, colunas].to_numpy()
+    for nome in ('hovertemplate', 'texttemplate'):
+        if isinstance(trace.get(nome), str):
+            trace[nome] = _remapear(trace[nome], mapa)
+
+
+def compactar_figura(fig):
+    """
+    Nova figura com o mesmo desenho e um JSON menor (ver o início do módulo).
+    """
+    dados = fig.to_plotly_json()
+    layout = dados['layout']
+    traces = []
+    for trace in dados['data']:
+        _enxugar_customdata(trace)
+        # Eixo de datas explícito: datas como números em vez de texto ISO
+        for eixo in ('x', 'y'):
+            nome_eixo = eixo + 'axis' + str(trace.get(eixo + 'axis', eixo))[1:]
+            if eixo in trace and layout.get(nome_eixo, {}).get('type') == 'date':
+                em_ms = _datas_em_ms(trace[eixo])
+                if em_ms is not None:
+                    trace[eixo] = em_ms
+        for nome in ARRAYS_TRACE:
+            if nome in trace and not isinstance(trace[nome], str):
+                compacto = _array_compacto(trace[nome])
+                if compacto is not None:
+                    trace[nome] = compacto
+        if trace.get('type') == 'scatter' and len(trace.get('x', ())) > LIMITE_PONTOS_WEBGL:
+            trace['type'] = 'scattergl'
+            traces.append(go.Scattergl({k: v for k, v in trace.items() if k != 'type'}, skip_invalid=True))
+            continue
+        traces.append(trace)
+
+    template = layout.get('template')
+    if isinstance(template, dict) and 'data' in template:
+        tipos = {trace['type'] if isinstance(trace, dict) else trace.type for trace in traces}
+        template['data'] = {tipo: estilo for tipo, estilo in template['data'].items() if tipo in tipos}
+
+    return go.Figure({'data': traces, 'layout': layout}, skip_invalid=True)
+
+
+def tamanho_figura(fig):
+    """Bytes do JSON da figura, como o st.plotly_chart serializa."""
+    return len(pio.to_json(fig, validate=False).encode('utf-8'))
+
+
+class RegistroPayload:
+    """
+    Bytes enviados ao navegador por tipo de gráfico: quantidade, total, maior e último.
+    Uma instância fica em st.cache_resource (todas as sessões), por isso o lock.
+    """
+
+    def __init__(self):
+        self._tipos = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, tipo, tamanho):
+        with self._lock:
+            graficos, total, maior, _ = self._tipos.get(tipo, (0, 0, 0, 0))
+            self._tipos[tipo] = (graficos + 1, total + tamanho, max(maior, tamanho), tamanho)
+
+    def tabela(self):
+        with self._lock:
+            linhas = [(tipo, graficos, total, total // graficos, maior, ultimo)
+                      for tipo, (graficos, total, maior, ultimo) in sorted(self._tipos.items())]
+        return pd.DataFrame(linhas, columns=['Gráfico', 'Enviados', 'Bytes', 'Média', 'Maior', 'Último'])
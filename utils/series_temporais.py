@@ -0,0 +1,321 @@
+import os
+import numpy as np
+import pandas as pd
+import streamlit as st
+from pandas.tseries.frequencies import to_offset
+from utils.esquema import MESES
+from utils.carregamento import abrir_fonte, versao_dataset
+from utils.cubo import COLUNA_CONTAGEM, MEDIDAS_CUBO, blocos, somar_parciais, descontar
+from utils.filtros import cache_filtros, chave_selecoes
+
+
+
+# ----------------------------
+# Séries temporais densas (contagem e somas por dia e por hora)
+# ----------------------------
+# Gravadas na ingestão, como o cubo, e carregadas como arrays densos [chave, tempo, medida]:
+# um dia (ou hora) por posição, do primeiro ao último dia do dataset, com zero onde não há acidentes.
+# Os arrays densos vão só até Uf; por município (milhares de chaves, quase todos os dias vazios)
+# a série diária fica esparsa: só os dias com acidentes de cada município (CSR).
+# Região/Uf/Municipio escolhem as chaves somadas; Ano e Mês viram uma máscara sobre os dias.
+# Qualquer frequência (semana, mês, trimestre, ano) sai reamostrando a série somada, então o custo
+# depende do número de dias do período, não do número de acidentes.
+CAMINHO_SERIES = "Dados/series"
+
+COLUNA_DATA = 'Data'          # só o dia
+COLUNA_HORA = 'Hora'          # hora do dia (0-23)
+COLUNA_DATA_HORA = 'Data Hora'
+
+MEDIDAS_SERIES = [COLUNA_CONTAGEM] + MEDIDAS_CUBO
+
+# Chaves de cada nível geográfico. Municipio leva Região e Uf junto: há nomes repetidos entre UFs.
+# A série horária fica só até Uf (por município seria 24 vezes maior e quase toda vazia).
+CHAVES_DIARIA = ['Região', 'Uf', 'Municipio']
+CHAVES_HORARIA = ['Região', 'Uf']
+# Chaves da série diária densa; Municipio fica na esparsa
+CHAVES_DENSAS = ['Região', 'Uf']
+
+# Nomes das séries filtradas dentro do cubo (utils/cubo.py), ao lado dos cuboides
+SERIE_DIARIA = 'Serie Diaria'
+SERIE_HORARIA = 'Serie Horaria'
+
+# Filtros que as séries sabem aplicar
+FILTROS_SERIES = ['Ano', 'Mês'] + CHAVES_DIARIA
+
+
+def sub_diaria(freq):
+    """True para frequências menores que um dia ('h', '3h'...)."""
+    try:
+        return to_offset(freq).nanos < pd.Timedelta(days=1).value
+    except ValueError:
+        # Frequências de calendário (mês, ano) não têm duração fixa
+        return False
+
+
+# ----------------------------
+# Gravação (na ingestão)
+# ----------------------------
+def _somar(df, chaves, medidas):
+    agregacoes = {COLUNA_CONTAGEM: (chaves[0], 'size')}
+    agregacoes.update({medida: (medida, 'sum') for medida in medidas})
+    return df.groupby(chaves, observed=True, dropna=False).agg(**agregacoes).reset_index()
+
+
+def construir_series(dataset=None):
+    """
+    Totais por dia (Região, Uf, Municipio) e por hora (Região, Uf), em blocos sobre o dataset (como o cubo).
+    Retorna {'diaria': DataFrame, 'horaria': DataFrame}, só com as combinações que ocorreram.
+    """
+    if dataset is None:
+        dataset = abrir_fonte()
+    nomes = set(dataset.schema.names)
+    medidas = [m for m in MEDIDAS_CUBO if m in nomes]
+    chaves = {
+        'diaria': [c for c in CHAVES_DIARIA if c in nomes] + [COLUNA_DATA],
+        'horaria': [c for c in CHAVES_HORARIA if c in nomes] + [COLUNA_DATA, COLUNA_HORA],
+    }
+    if COLUNA_HORA not in nomes:
+        del chaves['horaria']
+
+    colunas = list(dict.fromkeys(CHAVES_DIARIA + [COLUNA_DATA, COLUNA_HORA]))
+    parciais = {nome: [] for nome in chaves}
+    for df in blocos(dataset, [c for c in colunas if c in nomes] + medidas):
+        df[COLUNA_DATA] = pd.to_datetime(df[COLUNA_DATA]).dt.normalize()
+        for nome, colunas_nome in chaves.items():
+            parciais[nome].append(_somar(df, colunas_nome, medidas))
+
+    return {nome: somar_parciais(parciais[nome]) for nome in chaves if parciais[nome]}
+
+
+def gravar_series(destino=CAMINHO_SERIES, series=None):
+    """
+    Grava um Parquet por série; sem `series`, recalcula a partir do dataset inteiro.
+    """
+    if series is None:
+        series = construir_series()
+    os.makedirs(destino, exist_ok=True)
+    for nome, df in series.items():
+        df.to_parquet(os.path.join(destino, f'{nome}.parquet'), index=False)
+
+
+def atualizar_series(novas, removidas=None, destino=CAMINHO_SERIES):
+    """
+    Como utils/cubo.py: atualizar_cubo. Soma às séries gravadas as linhas novas e desconta as removidas;
+    sem séries gravadas (ou com série nova), recalcula tudo. Chamado ao final de cada ingestão.
+    """
+    delta = construir_series(novas)
+    gravadas = {nome: pd.read_parquet(os.path.join(destino, f'{nome}.parquet')) for nome in delta
+                if os.path.exists(os.path.join(destino, f'{nome}.parquet'))}
+    if not delta or set(gravadas) != set(delta):
+        gravar_series(destino)
+        return
+    partes = [gravadas, delta]
+    if removidas is not None and removidas.count_rows():
+        partes.append(descontar(construir_series(removidas)))
+    gravar_series(destino, {nome: somar_parciais([parte[nome] for parte in partes if nome in parte])
+                            for nome in gravadas})
+
+
+# ----------------------------
+# Carga em arrays densos
+# ----------------------------
+def carregar_series():
+    """
+    Séries densas do dataset atual (None quando ainda não foram geradas).
+    Montadas uma vez por versão e compartilhadas entre sessões.
+    """
+    return _montar_series(versao_dataset())
+
+
+def _codificar(df, chaves):
+    # Chaves como texto: categorias vazias ficam fora e NaN vira 'nan' sem quebrar o agrupamento
+    codigos, unicos = pd.factorize(pd.MultiIndex.from_frame(df[chaves].astype(str)))
+    return codigos, unicos.to_frame(index=False, name=chaves)
+
+
+def _medidas(df):
+    """Matriz [linha, medida] de MEDIDAS_SERIES (zero para medidas ausentes)."""
+    valores = np.zeros((len(df), len(MEDIDAS_SERIES)), dtype=np.int32)
+    for i, medida in enumerate(MEDIDAS_SERIES):
+        if medida in df.columns:
+            valores[:, i] = df[medida].to_numpy(dtype=np.int64)
+    return valores
+
+
+def _densificar(df, chaves, tempos, posicao_tempo):
+    """Array [chave, tempo, medida] e a tabela das chaves (uma linha por posição do array)."""
+    codigos, tabela = _codificar(df, chaves)
+    denso = np.zeros((len(tabela), len(tempos), len(MEDIDAS_SERIES)), dtype=np.int32)
+    np.add.at(denso, (codigos, posicao_tempo), _medidas(df))
+    return tabela, denso
+
+
+def _esparsificar(df, chaves, posicao_tempo):
+    """
+    Série por chave só nos tempos com acidentes, em CSR: os tempos e as medidas da chave i
+    ficam nas linhas inicio[i]:inicio[i + 1] de (tempos, valores).
+    Retorna a tabela das chaves e (inicio, tempos, valores).
+    """
+    codigos, tabela = _codificar(df, chaves)
+    ordem = np.argsort(codigos, kind='stable')
+    inicio = np.searchsorted(codigos[ordem], np.arange(len(tabela) + 1))
+    return tabela, (inicio, posicao_tempo[ordem].astype(np.int32), _medidas(df)[ordem])
+
+
+@st.cache_resource(max_entries=2)
+def _montar_series(versao):
+    caminho_diaria = os.path.join(CAMINHO_SERIES, 'diaria.parquet')
+    if not os.path.exists(caminho_diaria):
+        return None
+
+    diaria = pd.read_parquet(caminho_diaria)
+    dias = pd.date_range(diaria[COLUNA_DATA].min(), diaria[COLUNA_DATA].max(), freq='D')
+    posicao_dia = ((diaria[COLUNA_DATA] - dias[0]) // pd.Timedelta(days=1)).to_numpy()
+    chaves_diaria, densa_diaria = _densificar(diaria, [c for c in CHAVES_DENSAS if c in diaria.columns],
+                                              dias, posicao_dia)
+    series = {
+        'versao': versao,
+        'dias': dias,
+        'ano': dias.year.to_numpy(),
+        'mes': np.asarray(MESES, dtype=object)[dias.month.to_numpy() - 1],
+        'diaria': (chaves_diaria, densa_diaria),
+        # Sem filtro geográfico: total já somado
+        'total_diaria': densa_diaria.sum(axis=0),
+    }
+    if 'Municipio' in diaria.columns:
+        series['diaria_municipio'] = _esparsificar(diaria, [c for c in CHAVES_DIARIA if c in diaria.columns],
+                                                   posicao_dia)
+
+    caminho_horaria = os.path.join(CAMINHO_SERIES, 'horaria.parquet')
+    if os.path.exists(caminho_horaria):
+        horaria = pd.read_parquet(caminho_horaria)
+        posicao_hora = (((horaria[COLUNA_DATA] - dias[0]) // pd.Timedelta(days=1)) * 24
+                        + horaria[COLUNA_HORA].astype('int64')).to_numpy()
+        chaves_horaria, densa_horaria = _densificar(horaria, [c for c in CHAVES_HORARIA if c in horaria.columns],
+                                                    np.arange(len(dias) * 24), posicao_hora)
+        series['horaria'] = (chaves_horaria, densa_horaria)
+        series['total_horaria'] = densa_horaria.sum(axis=0)
+    return series
+
+
+# ----------------------------
+# Seleções
+# ----------------------------
+def _mascara_chaves(chaves, selecoes):
+    """
+    Chaves que atendem aos filtros geográficos: máscara booleana, True (sem filtro)
+    ou None (algum filtro não é coluna das chaves).
+    """
+    ativos = {coluna: valores for coluna, valores in selecoes.items() if valores and coluna in CHAVES_DIARIA}
+    if not ativos:
+        return True
+    if not set(ativos).issubset(chaves.columns):
+        return None
+    mascara = np.ones(len(chaves), dtype=bool)
+    for coluna, valores in ativos.items():
+        mascara &= chaves[coluna].isin([str(v) for v in valores]).to_numpy()
+    return mascara
+
+
+def _somar_chaves(chaves, denso, total, selecoes):
+    """Soma as chaves que atendem aos filtros geográficos; None se algum filtro não é coluna das chaves."""
+    mascara = _mascara_chaves(chaves, selecoes)
+    if mascara is None:
+        return None
+    if mascara is True:
+        return total
+    return denso[mascara].sum(axis=0)
+
+
+def _somar_esparso(chaves, esparso, numero_tempos, selecoes):
+    """Como _somar_chaves, sobre a série esparsa: array [tempo, medida] das chaves escolhidas."""
+    mascara = _mascara_chaves(chaves, selecoes)
+    if mascara is None or mascara is True:
+        return None
+    inicio, tempos, valores = esparso
+    escolhidas = np.flatnonzero(mascara)
+    tamanhos = inicio[escolhidas + 1] - inicio[escolhidas]
+    # Linhas de todas as chaves escolhidas, sem laço por chave
+    deslocamento = np.repeat(inicio[escolhidas] - np.cumsum(tamanhos) + tamanhos, tamanhos)
+    linhas = deslocamento + np.arange(tamanhos.sum())
+    soma = np.zeros((numero_tempos, len(MEDIDAS_SERIES)), dtype=np.int64)
+    np.add.at(soma, tempos[linhas], valores[linhas])
+    return soma
+
+
+def _recortar(valores, tempos, coluna):
+    """DataFrame do primeiro ao último tempo com acidentes (como o agrupamento das linhas)."""
+    com_acidentes = np.flatnonzero(valores[:, 0])
+    if len(com_acidentes) == 0:
+        return pd.DataFrame(columns=[coluna] + MEDIDAS_SERIES)
+    inicio, fim = com_acidentes[0], com_acidentes[-1] + 1
+    df = pd.DataFrame(valores[inicio:fim], columns=MEDIDAS_SERIES)
+    df.insert(0, coluna, tempos[inicio:fim])
+    return df
+
+
+def filtrar_series(series, selecoes):
+    """
+    Séries diária e horária das seleções da barra lateral, prontas para entrar no cubo filtrado:
+    {SERIE_DIARIA: [Data, medidas...], SERIE_HORARIA: [Data Hora, medidas...]}.
+    Retorna {} se as séries não existem ou se há filtro que elas não cobrem.
+    Memorizado no cache dos filtros (compartilhado entre sessões).
+    """
+    if series is None:
+        return {}
+    if any(valores and coluna not in FILTROS_SERIES for coluna, valores in selecoes.items()):
+        return {}
+    chave = ('series', series['versao'], chave_selecoes(selecoes))
+    return cache_filtros().obter(chave, lambda: _filtrar_series(series, selecoes))
+
+
+def _filtrar_series(series, selecoes):
+    # Ano e Mês: máscara sobre os dias
+    dias_validos = np.ones(len(series['dias']), dtype=bool)
+    if selecoes.get('Ano'):
+        dias_validos &= np.isin(series['ano'], [int(ano) for ano in selecoes['Ano']])
+    if selecoes.get('Mês'):
+        dias_validos &= np.isin(series['mes'], list(selecoes['Mês']))
+
+    filtradas = {}
+    if selecoes.get('Municipio'):
+        diaria = (_somar_esparso(*series['diaria_municipio'], len(series['dias']), selecoes)
+                  if 'diaria_municipio' in series else None)
+    else:
+        diaria = _somar_chaves(*series['diaria'], series['total_diaria'], selecoes)
+    if diaria is None:
+        return {}
+    filtradas[SERIE_DIARIA] = _recortar(diaria * dias_validos[:, None], series['dias'], COLUNA_DATA)
+
+    if 'horaria' in series:
+        horaria = _somar_chaves(*series['horaria'], series['total_horaria'], selecoes)
+        if horaria is not None:
+            horas = series['dias'].repeat(24) + pd.to_timedelta(np.tile(np.arange(24), len(series['dias'])), unit='h')
+            filtradas[SERIE_HORARIA] = _recortar(horaria * np.repeat(dias_validos, 24)[:, None], horas,
+                                                 COLUNA_DATA_HORA)
+    return filtradas
+
+
+def serie_do_cubo(cubo, dimensao, freq):
+    """
+    Agrupamento da coluna de data por período a partir das séries do cubo filtrado.
+    Retorna DataFrame [dimensao, Acidentes, medidas...] com todos os períodos, ou None.
+    """
+    if not cubo or dimensao != COLUNA_DATA:
+        return None
+    horaria = sub_diaria(freq)
+    serie = cubo.get(SERIE_HORARIA if horaria else SERIE_DIARIA)
+    if serie is None:
+        return None
+
+    coluna = COLUNA_DATA_HORA if horaria else COLUNA_DATA
+    if serie.empty:
+        return serie.rename(columns={coluna: dimensao})
+    return serie.set_index(coluna).resample(freq).sum().rename_axis(dimensao).reset_index()
+
+
+# ----------------------------
+# Recalcula as séries a partir do dataset atual: python -m utils.series_temporais
+# ----------------------------
+if __name__ == '__main__':
+    gravar_series()
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 
@@ -17,12 +18,60 @@ def total_veiculos(df):
    # return f"{formatar_milhar(df['Ilesos'].sum())}"
 
 
+# ----------------------------
+# Separador de milhar (padrão brasileiro: 1.234.567)
+# ----------------------------
+# Tabelas prontas: inteiros pequenos (Mortos, Feridos, contagens por categoria) saem direto
+# da tabela; os maiores são montados em grupos de três dígitos, em arrays inteiros
+LIMITE_TABELA_MILHAR = 10_000
+_TABELA_MILHAR = np.array([f"{i:,}".replace(",", ".") for i in range(LIMITE_TABELA_MILHAR)], dtype=object)
+_TRES_DIGITOS = np.array([f"{i:03d}" for i in range(1000)], dtype=object)
+
+
+def _formatar_inteiros(inteiros):
+    # inteiros: array int64 (já truncado); devolve array de textos
+    negativos = inteiros < 0
+    absolutos = np.abs(inteiros)
+    textos = np.empty(len(inteiros), dtype=object)
+
+    pequenos = absolutos < LIMITE_TABELA_MILHAR
+    textos[pequenos] = _TABELA_MILHAR[absolutos[pequenos]]
+
+    grandes = ~pequenos
+    if grandes.any():
+        restante = absolutos[grandes]
+        parte = '.' + _TRES_DIGITOS[restante % 1000]
+        restante = restante // 1000
+        # A cada volta acrescenta um grupo à esquerda enquanto sobrarem mais de três dígitos
+        while (restante >= 1000).any():
+            longos = restante >= 1000
+            parte[longos] = '.' + _TRES_DIGITOS[restante[longos] % 1000] + parte[longos]
+            restante[longos] //= 1000
+        textos[grandes] = _TABELA_MILHAR[restante] + parte
+
+    if negativos.any():
+        textos[negativos] = '-' + textos[negativos]
+    return textos
+
+
 def formatar_milhar(valor):
-    if isinstance(valor, (pd.Series, list)):
-        return [formatar_milhar(v) for v in valor]
+    """
+    Formata com ponto de milhar (parte inteira, como int()).
+    - Escalar: devolve o texto (0 quando vazio/NaN)
+    - Series, lista ou array: devolve lista de textos, formatada de uma vez só
+    """
+    if isinstance(valor, (pd.Series, list, np.ndarray)):
+        numeros = pd.to_numeric(pd.Series(valor), errors='coerce').to_numpy(dtype='float64')
+        vazios = np.isnan(numeros)
+        textos = _formatar_inteiros(np.trunc(np.where(vazios, 0, numeros)).astype(np.int64))
+        textos[vazios] = 0
+        return textos.tolist()
     if pd.isna(valor):
         return 0
-    return f"{int(valor):,}".replace(",", ".")
+    inteiro = int(valor)
+    if 0 <= inteiro < LIMITE_TABELA_MILHAR:
+        return _TABELA_MILHAR[inteiro]
+    return f"{inteiro:,}".replace(",", ".")
 
 
 def calculo_tot_acidentes(df):
@@ -0,0 +1,114 @@
+import pandas as pd
+from utils.filtros import selecao_memorizada, posicoes_memorizadas, chave_selecoes
+
+
+
+# ----------------------------
+# Visão filtrada sobre o DataFrame compartilhado
+# ----------------------------
+# O DataFrame da página vem do cache (cache_resource) e é o mesmo para todas as sessões:
+# ele nunca é copiado nem alterado. Os filtros viram um bitmap do índice (utils/indice_bitmap.py),
+# memorizado por seleção (utils/filtros.py), e cada gráfico materializa só as colunas que usa,
+# já nas linhas selecionadas.
+
+
+class Visao:
+    """
+    Recorte somente leitura de um DataFrame compartilhado.
+    - base: DataFrame completo da página (não alterar)
+    - indice: índice bitmap montado sobre a base
+    - selecoes: {coluna: valores} aplicados sobre a base; vazio = todas as linhas
+    Aceita o básico que os totalizadores usam: len(), .columns, .dtypes, .empty, .shape e visao['Coluna'].
+    """
+
+    def __init__(self, base, indice=None, selecoes=None):
+        self.base = base
+        self.indice = indice
+        self.selecoes = dict(selecoes or {})
+        self._posicoes = None
+        self.recortada = False
+        # Agrupamentos já calculados sobre esta seleção (utils/agregacao.py), compartilhados pelos gráficos
+        self.agrupamentos = {}
+
+    def restringir(self, selecoes):
+        # selecoes já incluem as atuais, como devolve filtro_indexado
+        return Visao(self.base, self.indice, selecoes)
+
+    def recortar(self, posicoes):
+        """
+        Visão só com as posições pedidas (ordenadas, já dentro desta seleção),
+        como as devolvidas pelas consultas de utils/espacial.py.
+        O recorte não vale para o cubo de agregados: agregar a visão recortada sem cubo.
+        """
+        recorte = Visao(self.base, self.indice, self.selecoes)
+        recorte._posicoes = posicoes
+        recorte.recortada = True
+        return recorte
+
+    @property
+    def assinatura(self):
+        """
+        Identifica as linhas da visão nas chaves de cache: índice (arquivo, colunas, versão) + seleções.
+        None para visões recortadas, cujas linhas não saem só das seleções.
+        """
+        if self.recortada or self.indice is None:
+            return None
+        return (self.indice['chave'], chave_selecoes(self.selecoes))
+
+    @property
+    def selecao(self):
+        """Bitmap das linhas selecionadas (None = todas)."""
+        return selecao_memorizada(self.indice, self.selecoes)
+
+    @property
+    def posicoes(self):
+        """Posições das linhas selecionadas na base (None = todas; fixas depois de recortar)."""
+        if self._posicoes is None and self.selecoes:
+            self._posicoes = posicoes_memorizadas(self.indice, self.selecoes)
+        return self._posicoes
+
+    @property
+    def columns(self):
+        return self.base.columns
+
+    @property
+    def dtypes(self):
+        return self.base.dtypes
+
+    @property
+    def shape(self):
+        return (len(self), self.base.shape[1])
+
+    @property
+    def empty(self):
+        return len(self) == 0 or self.base.shape[1] == 0
+
+    def __len__(self):
+        posicoes = self.posicoes
+        return len(self.base) if posicoes is None else len(posicoes)
+
+    def __getitem__(self, colunas):
+        if isinstance(colunas, str):
+            serie = self.base[colunas]
+            posicoes = self.posicoes
+            return serie if posicoes is None else serie.take(posicoes)
+        return self.projetar(colunas)
+
+    def projetar(self, colunas):
+        """
+        DataFrame só com as colunas pedidas, nas linhas selecionadas.
+        Sem seleção, as colunas são as mesmas da base (sem cópia): não alterar o resultado.
+        """
+        colunas = [c for c in dict.fromkeys(colunas) if c is not None and c in self.base.columns]
+        return pd.DataFrame({coluna: self[coluna] for coluna in colunas}, copy=False)
+
+
+def projetar(df, colunas):
+    """
+    Colunas pedidas de uma Visao ou de um DataFrame, sem copiar as demais.
+    - colunas: lista de nomes; None e colunas inexistentes são ignorados
+    """
+    if isinstance(df, Visao):
+        return df.projetar(colunas)
+    colunas = [c for c in dict.fromkeys(colunas) if c is not None and c in df.columns]
+    return pd.DataFrame({coluna: df[coluna] for coluna in colunas}, copy=False)